@@ -0,0 +1,77 @@
+import datetime, os, sys, time
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import pomoengine, pomoindex, pomochart
+
+# Compares the old linear scan of the whole history with the day bucketed
+# index for today's chart, over a long synthetic history, and times the
+# heat map views over the minute bitmaps.
+
+COUNT = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+REPEAT = 100
+
+def makehist(count, now):
+    # ten 25 minute pomodoros a day, going back from today
+    hist = []
+    day = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    length = datetime.timedelta(minutes=25)
+    while len(hist) < count:
+        for i in range(10):
+            pomo = pomoengine.Pomodoro(day + datetime.timedelta(hours=8+i))
+            pomo.restore(pomo.started+length, 25*60*pomoengine.NSEC)
+            hist.append(pomo)
+        day -= datetime.timedelta(days=1)
+    hist.reverse()
+    return hist
+
+def linearscan(hist, now):
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    tomorrow = today+datetime.timedelta(days=1)
+    for pomo in hist:
+        start, stop = pomo.started, pomo.stopped
+        if not stop:
+            stop = now
+        if stop <= today:
+            continue
+        if start >= tomorrow:
+            continue
+
+        start = max(start, today)
+        stop = min(stop, tomorrow)
+
+        yield (start-today).seconds, (stop-today).seconds
+
+def timeit(f, repeat):
+    t = time.time()
+    for i in range(repeat):
+        list(f())
+    return (time.time()-t)/repeat*1000
+
+def main():
+    now = datetime.datetime.now().replace(hour=23)
+    hist = makehist(COUNT, now)
+
+    t = time.time()
+    index = pomoindex.IntervalIndex()
+    index.extend(hist)
+    print("history %d pomodoros, index built in %.1f msec" % (
+        len(hist), (time.time()-t)*1000))
+
+    scan = timeit(lambda: linearscan(hist, now), 3)
+    indexed = timeit(lambda: index.iterday(now.date(), now), REPEAT)
+    print("linear scan: %10.3f msec/paint" % scan)
+    print("index:       %10.3f msec/paint" % indexed)
+
+    t = time.time()
+    occupancy = pomoindex.Occupancy()
+    occupancy.extend(hist)
+    occupancy.minutes(0)
+    print("minute bitmaps built in %.1f msec" % ((time.time()-t)*1000))
+    lastday = pomoindex.dayno(now.date())
+    for view in ('week', 'month', 'year'):
+        f = pomochart.HEATVIEWS[view]
+        heat = timeit(lambda: f(300, 150, occupancy, lastday)[1], REPEAT)
+        print("%-12s %10.3f msec/paint" % (view + ':', heat))
+
+if __name__ == '__main__':
+    main()
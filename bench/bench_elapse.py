@@ -0,0 +1,36 @@
+import os, sys, time
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import pomoengine, pomosim
+
+# Runs many pause/resume cycles against a simulated clock, running
+# an odd number of nanoseconds between each, then checks the total is exact.
+
+STEP = 123456789
+CYCLES = 1000000
+BATCH = 100000
+
+def main():
+    clock = pomosim.SimClock()
+    pomo = pomoengine.Pomodoro(clock=clock)
+    expected = 0
+    for batch in range(CYCLES // BATCH):
+        t = time.time()
+        for i in range(BATCH):
+            clock.ns += STEP
+            pomo.pause(clock)
+            pomo.resume(clock)
+            pomo.getelapse(clock)
+        expected += BATCH*STEP
+        usec = (time.time()-t)*1000000/BATCH
+        print("cycles %8d: %.3f usec/cycle" % ((batch+1)*BATCH, usec))
+
+    clock.ns += STEP
+    pomo.stop(clock)
+    expected += STEP
+    drift = pomo.elapsens - expected
+    print("elapsed %d ns, drift %d ns" % (pomo.elapsens, drift))
+    return drift == 0
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
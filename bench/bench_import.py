@@ -0,0 +1,50 @@
+import os, subprocess, sys, time
+
+# Measures the cold import time of pomotimer and the terminal backend in a
+# fresh interpreter, over the interpreter's own startup, and fails if it
+# goes over BUDGET_MSEC or pulls in heavy modules eagerly. The command line
+# client has to stay within CLIENT_BUDGET_MSEC without importing the app.
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+BUDGET_MSEC = 50
+CLIENT_BUDGET_MSEC = 10
+REPEAT = 10
+HEAVY = ['pymfc', 'winsound', 'numpy', 'asyncio', 'pomomfc']
+
+def spawn(code):
+    t = time.time()
+    subprocess.check_call([sys.executable, '-c', code], cwd=ROOT)
+    return (time.time()-t)*1000
+
+def best(code):
+    return min(spawn(code) for i in range(REPEAT))
+
+def main():
+    base = best('pass')
+    ret = True
+    for module, budget in (('pomotimer', BUDGET_MSEC), ('pomoterm', BUDGET_MSEC),
+            ('pomoctl', CLIENT_BUDGET_MSEC)):
+        msec = best('import %s' % module) - base
+        over = msec > budget
+        print("import %-10s %6.1f msec%s" % (module, msec, ' OVER BUDGET' if over else ''))
+        ret = ret and not over
+
+    out = subprocess.check_output([sys.executable, '-c',
+        'import sys, pomoctl; print(" ".join(sorted(sys.modules)))'],
+        cwd=ROOT).decode().split()
+    loaded = [name for name in out if name.startswith('pomo') and name != 'pomoctl']
+    if loaded:
+        print("client imports the app: %s" % ' '.join(loaded))
+        ret = False
+
+    out = subprocess.check_output([sys.executable, '-c',
+        'import sys, pomotimer, pomoterm; print(" ".join(sorted(sys.modules)))'],
+        cwd=ROOT).decode().split()
+    loaded = [name for name in HEAVY if name in out]
+    if loaded:
+        print("eagerly imported: %s" % ' '.join(loaded))
+        ret = False
+    return ret
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
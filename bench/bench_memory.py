@@ -0,0 +1,64 @@
+import datetime, os, sys, tracemalloc
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import pomoengine, pomostore
+
+# Reports bytes per finished session for the old datetime based Pomodoro,
+# the __slots__ Pomodoro and the columnar SessionStore. Python 3 only.
+
+COUNT = 100000
+
+class OldPomodoro:
+    # attributes of a stopped pomodoro before the compact representation
+    def __init__(self, started, stopped):
+        self.started = started
+        self.stopped = stopped
+        self.resumed = None
+        self.paused = None
+        self.elapse = (stopped-started).seconds
+
+def sessions():
+    start = datetime.datetime(2010, 12, 28, 9)
+    length = datetime.timedelta(minutes=25)
+    for i in range(COUNT):
+        started = start + datetime.timedelta(hours=i)
+        yield started, started+length
+
+def measure(build):
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    result = build()
+    used = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    return result, float(used) / COUNT
+
+def oldlist():
+    return [OldPomodoro(started, stopped) for started, stopped in sessions()]
+
+def newlist():
+    hist = []
+    for started, stopped in sessions():
+        pomo = pomoengine.Pomodoro(started)
+        pomo.restore(stopped, 25*60*pomoengine.NSEC)
+        hist.append(pomo)
+    return hist
+
+def store():
+    # built from (start, stop) pairs directly as when streaming the log
+    hist = pomostore.SessionStore()
+    for started, stopped in sessions():
+        pomo = pomoengine.Pomodoro.fromcolumns(pomoengine.dt2usec(started),
+            pomoengine.dt2usec(stopped), 25*60*pomoengine.NSEC)
+        hist.append(pomo)
+    return hist
+
+def main():
+    for name, build in [('datetime Pomodoro', oldlist),
+                        ('__slots__ Pomodoro', newlist),
+                        ('SessionStore', store)]:
+        result, size = measure(build)
+        print("%-20s %7.1f bytes/session" % (name, size))
+        del result
+
+if __name__ == '__main__':
+    main()
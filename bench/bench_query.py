@@ -0,0 +1,69 @@
+import os, random, sys, time
+from array import array
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import pomoengine, pomostore, pomoquery
+
+# Times history queries over a large synthetic store: building the
+# indexes, a page of a time range, a page of a range filtered on duration
+# and on a task tag, and walking a range page by page with cursors.
+
+COUNT = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+REPEAT = 100
+
+# the task ID of every 1000th session
+RARE = 1
+
+def makestore(count):
+    # one session every 10 minutes to an hour, lasting 1 to 50 minutes
+    random.seed(0)
+    store = pomostore.SessionStore()
+    starts, stops, elapsed = [], [], []
+    t = pomoengine.dt2usec(pomoengine.EPOCH.replace(year=2000))
+    for i in range(count):
+        t += random.randint(600, 3600)*1000000
+        length = random.randint(60, 3000)
+        starts.append(t)
+        stops.append(t + length*1000000)
+        elapsed.append(length*pomoengine.NSEC)
+    store.startedusec = array(pomostore.TYPECODE, starts)
+    store.stoppedusec = array(pomostore.TYPECODE, stops)
+    store.elapsens = array(pomostore.TYPECODE, elapsed)
+    store.tasks = array(pomostore.TASKCODE, [0])*count
+    for row in range(0, count, 1000):
+        store.tasks[row] = RARE
+    return store
+
+def timeit(f, repeat):
+    t = time.time()
+    for i in range(repeat):
+        f()
+    return (time.time()-t)*1000/repeat
+
+def main():
+    store = makestore(COUNT)
+    index = pomoquery.QueryIndex(store)
+    t = time.time()
+    index.refresh()
+    print("%d sessions indexed in %.1f msec" % (COUNT, (time.time()-t)*1000))
+
+    mid = store.startedusec[COUNT//2]
+    end = store.startedusec[COUNT*3//4]
+    t = time.time()
+    index.query(first=mid, minsec=2990)
+    print("duration index built in %.1f msec" % ((time.time()-t)*1000))
+
+    print("range page:      %.3f msec" % timeit(lambda: index.query(mid, end), REPEAT))
+    print("long sessions:   %.3f msec" % timeit(lambda: index.query(mid, end, minsec=1800), REPEAT))
+    print("longest only:    %.3f msec" % timeit(lambda: index.query(mid, end, minsec=2990), REPEAT))
+    print("tagged:          %.3f msec" % timeit(lambda: index.query(mid, end, tag=RARE), REPEAT))
+
+    def walk():
+        pages, cursor = 0, None
+        while pages < 20:
+            pomos, cursor = index.query(mid, end, cursor=cursor)
+            pages += 1
+    print("20 pages:        %.3f msec" % timeit(walk, 10))
+
+if __name__ == '__main__':
+    main()
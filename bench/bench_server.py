@@ -0,0 +1,75 @@
+import asyncio, json, os, sys, tempfile, time
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import pomoserver
+
+# Load generator for the timer server. Python 3 only.
+#
+# 1. starts TIMERS timers with timeouts spread over a few seconds and
+#    reports how late the single deadline heap fires them.
+# 2. CLIENTS concurrent socket clients send REQUESTS commands each.
+
+TIMERS = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+CLIENTS = 50
+REQUESTS = 1000
+
+class Server(pomoserver.TimerServer):
+    def __init__(self, *args, **kw):
+        pomoserver.TimerServer.__init__(self, *args, **kw)
+        self.expected = {}
+        self.lateness = []
+
+    def _notify(self, name, engine):
+        self.lateness.append(self.loop.time() - self.expected[name])
+
+async def timers(server):
+    loop = asyncio.get_event_loop()
+    t = time.time()
+    for i in range(TIMERS):
+        name = 'timer%d' % i
+        # timeouts between 3 and 5 seconds, after all are started
+        seconds = 3 + 2.0*i/TIMERS
+        server.handle({'cmd': 'timeout', 'timer': name, 'minutes': seconds/60})
+        server.expected[name] = loop.time() + seconds
+        server.handle({'cmd': 'start', 'timer': name})
+    print("started %d timers in %.2f sec" % (TIMERS, time.time()-t))
+
+    cpu = time.process_time()
+    while server.timeouts < TIMERS:
+        await asyncio.sleep(0.1)
+    cpu = time.process_time()-cpu
+
+    late = sorted(server.lateness)
+    print("fired %d timeouts, cpu %.2f sec" % (server.timeouts, cpu))
+    print("lateness msec: median %.2f  p99 %.2f  max %.2f" % (
+        late[len(late)//2]*1000, late[len(late)*99//100]*1000, late[-1]*1000))
+
+async def client(path, n):
+    reader, writer = await asyncio.open_unix_connection(path)
+    for i in range(REQUESTS):
+        cmd = ('start', 'status', 'pause', 'resume', 'status', 'stop')[i % 6]
+        writer.write(json.dumps({'cmd': cmd, 'timer': 'client%d' % n}).encode() + b'\n')
+        resp = json.loads((await reader.readline()).decode())
+        assert resp['ok'], resp
+    writer.close()
+
+async def sockets(server):
+    path = os.path.join(tempfile.mkdtemp(), 'pomoserver.sock')
+    task = asyncio.ensure_future(server.serve(path=path))
+    while not os.path.exists(path):
+        await asyncio.sleep(0.01)
+
+    t = time.time()
+    await asyncio.gather(*[client(path, n) for n in range(CLIENTS)])
+    t = time.time()-t
+    print("%d clients x %d requests: %.0f requests/sec" % (
+        CLIENTS, REQUESTS, CLIENTS*REQUESTS/t))
+    task.cancel()
+
+async def main():
+    server = Server()
+    await timers(server)
+    await sockets(server)
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,44 @@
+import os, sys, tempfile, time
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import pomoengine, pomoindex, pomolog, pomosim, pomostats, pomostore
+
+# Simulates WEEKS of working days on a simulated clock, with the session
+# log, index and stats attached as in the app, then replays the log into
+# a fresh engine and checks both histories agree.
+
+WEEKS = int(sys.argv[1]) if len(sys.argv) > 1 else 52
+
+def main():
+    logname = os.path.join(tempfile.mkdtemp(), 'sim.log')
+    sim = pomosim.Simulation(hist=pomostore.SessionStore())
+    log = pomolog.SessionLog(logname)
+    log.attach(sim.engine)
+    index = pomoindex.IntervalIndex()
+    index.attach(sim.engine)
+    stats = pomostats.Stats()
+    stats.attach(sim.engine)
+
+    t = time.time()
+    sim.run(WEEKS*7, pausemin=3)
+    elapsed = time.time() - t
+    log.close()
+    sim.close()
+    hist = sim.engine.hist
+    print("simulated %d days, %d pomodoros in %.1f msec" % (
+        WEEKS*7, len(hist), elapsed*1000))
+
+    clock = pomosim.SimClock()
+    engine = pomoengine.PomoEngine(hist=pomostore.SessionStore(), clock=clock)
+    t = time.time()
+    pomosim.replaylog(logname, engine, clock)
+    print("replayed in %.1f msec" % ((time.time()-t)*1000))
+
+    ok = (list(hist.startedusec) == list(engine.hist.startedusec) and
+          list(hist.elapsens) == list(engine.hist.elapsens) and
+          stats.count == len(hist))
+    print("histories %s" % ('match' if ok else 'DIFFER'))
+    return ok
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,229 @@
+import json, os, sys, tempfile, time
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+# Keep the app's config and log out of the user's own directory, see
+# pomoctl._appdata(). Must be set before pomotimer is imported.
+TMPDIR = tempfile.mkdtemp(prefix='pomobench')
+os.environ['XDG_CONFIG_HOME'] = os.environ['APPDATA'] = TMPDIR
+
+import pomoengine, pomoindex, pomochart, pomostore, pomotimer, pomosim, pomofmt
+assert pomotimer.CONFIGFILEPATH.startswith(TMPDIR), pomotimer.CONFIGFILEPATH
+
+# Microbenchmarks of the timer state machine, formatting, chart math and
+# config handling. Runs headless with a fake clock, so results don't
+# depend on a display or the speed of the system clock.
+#
+#   bench_suite.py [name ...]          compare with the stored baseline
+#   bench_suite.py --save [name ...]   record the baseline
+#
+# Baselines are kept in baseline.json per Python version. A case slower
+# than its baseline by more than TOLERANCE fails the run. Baselines are
+# only comparable on the machine that recorded them.
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+TOLERANCE = 0.5
+REPEAT = 7
+MINTIME = 0.2
+HISTORY = 100000
+
+# CPU time of the process, less sensitive to a busy machine than wall time
+cputime = getattr(time, 'process_time', None) or time.clock
+
+class FakeClock(pomosim.SimClock):
+    # advances step ns on every reading, so elapsed times aren't all zero
+    def __init__(self, step=1000):
+        pomosim.SimClock.__init__(self)
+        self.step = step
+
+    def monotonic_ns(self):
+        self.ns += self.step
+        return self.ns
+
+    def install(self):
+        self._org = pomoengine.defaultclock
+        pomoengine.defaultclock = self
+
+    def uninstall(self):
+        pomoengine.defaultclock = self._org
+
+def makehist(count):
+    # ten 25 minute pomodoros a day, ending today
+    store = pomostore.SessionStore()
+    today = pomoindex.dayno(pomoengine.defaultclock.now().date())
+    length = 25*60*1000000
+    for i in range(count):
+        day, n = divmod(i, 10)
+        start = (today - count//10 + day)*pomoindex.DAYUSEC + (8+n)*3600*1000000
+        store.append(pomoengine.Pomodoro.fromcolumns(start, start+length, length*1000))
+    return store
+
+
+# Each case does its setup and returns the function to time.
+
+CASES = []
+
+def case(f):
+    CASES.append(f)
+    return f
+
+@case
+def pomodoro_cycle():
+    pomo = pomoengine.Pomodoro()
+    def run():
+        pomo.pause()
+        pomo.resume()
+        pomo.getelapse()
+    return run
+
+@case
+def engine_state():
+    engine = pomoengine.PomoEngine()
+    engine.start()
+    def run():
+        engine.state()
+        engine.getdisplaytext()
+        engine.check()
+    return run
+
+@case
+def sec_to_str():
+    values = list(range(0, 100000, 97))
+    def run():
+        for s in values:
+            pomoengine.sec_to_str(s)
+    return run
+
+@case
+def formatter_text():
+    formatter = pomofmt.Formatter()
+    values = list(range(0, 100000, 97))
+    def run():
+        for s in values:
+            formatter.text(s)
+    return run
+
+@case
+def chart_day():
+    store = makehist(HISTORY)
+    index = pomoindex.IntervalIndex()
+    index.extend(store)
+    day = pomoengine.usec2dt(store.startedusec[-1]).date()
+    dial = pomochart.Dial(300, 150)
+    def run():
+        dial.wedges(index.iterday(day, pomoengine.defaultclock.now()))
+    return run
+
+@case
+def dial_wedges():
+    dial = pomochart.Dial(300, 150)
+    intervals = [(s, s+1500) for s in range(0, 86400, 1800)]
+    def run():
+        dial.wedges(intervals)
+    return run
+
+@case
+def heat_year():
+    store = makehist(HISTORY)
+    occupancy = pomoindex.Occupancy()
+    occupancy.extend(store)
+    lastday = pomoindex.dayno(pomoengine.usec2dt(store.startedusec[-1]).date())
+    occupancy.minutes(lastday)
+    def run():
+        pomochart.yearview(300, 150, occupancy, lastday)
+    return run
+
+@case
+def config_save():
+    app = pomotimer.PomoTimerApp()
+    timeouts = [25, 30]
+    def run():
+        timeouts.reverse()
+        app.setconfig(timeouts[0], u'')
+    return run
+
+@case
+def config_reload():
+    app = pomotimer.PomoTimerApp()
+    app.setconfig(25, u'')
+    def run():
+        # forget the cached stat so that the file is parsed again
+        app.config._stat = None
+        app.reloadconfig()
+    return run
+
+@case
+def config_unchanged():
+    app = pomotimer.PomoTimerApp()
+    app.setconfig(25, u'')
+    def run():
+        app.reloadconfig()
+    return run
+
+
+def measure(f):
+    # best CPU time of REPEAT runs in usec per call
+    number = 1
+    while True:
+        t = cputime()
+        for i in range(number):
+            f()
+        elapsed = cputime() - t
+        if elapsed >= MINTIME:
+            break
+        number *= 2 if elapsed*10 > MINTIME else 10
+
+    best = elapsed
+    for i in range(REPEAT-1):
+        t = cputime()
+        for i in range(number):
+            f()
+        best = min(best, cputime() - t)
+    return best / number * 1000000
+
+def loadbaselines():
+    if not os.path.exists(BASELINE):
+        return {}
+    with open(BASELINE) as f:
+        return json.load(f)
+
+def main(args):
+    save = '--save' in args
+    names = [a for a in args if not a.startswith('--')]
+    cases = [f for f in CASES if not names or f.__name__ in names]
+
+    baselines = loadbaselines()
+    key = 'python%d.%d' % sys.version_info[:2]
+    baseline = baselines.setdefault(key, {})
+
+    clock = FakeClock()
+    clock.install()
+    ret = True
+    try:
+        for f in cases:
+            usec = measure(f())
+            name = f.__name__
+            base = baseline.get(name)
+            if save:
+                baseline[name] = round(usec, 3)
+                note = 'saved'
+            elif base is None:
+                note = 'no baseline'
+            else:
+                ratio = usec / base
+                note = '%+6.1f%%' % ((ratio-1)*100)
+                if ratio > 1 + TOLERANCE:
+                    note += ' REGRESSION'
+                    ret = False
+            print("%-18s %12.3f usec  %s" % (name, usec, note))
+    finally:
+        clock.uninstall()
+
+    if save:
+        with open(BASELINE, 'w') as f:
+            json.dump(baselines, f, indent=1, sort_keys=True, separators=(',', ': '))
+            f.write('\n')
+    return ret
+
+if __name__ == '__main__':
+    sys.exit(0 if main(sys.argv[1:]) else 1)
@@ -0,0 +1,106 @@
+import time
+
+# Event dispatch for the engine and the other models. Listeners are called
+# as listener(source, event), synchronously and in subscription order.
+#
+# Listeners that only redraw some state can subscribe with coalesce=True:
+# once the front end has installed a deferrer, events for them are held
+# back and delivered once, with the last event, from a deferred flush, so
+# a burst of changes causes a single update.
+#
+# The time spent in every listener is recorded, see stats().
+
+if hasattr(time, 'perf_counter_ns'):
+    _perfns = time.perf_counter_ns
+else:
+    _perf = getattr(time, 'perf_counter', None) or time.time
+    def _perfns():
+        return int(_perf()*1000000000)
+
+def _name(listener):
+    owner = getattr(listener, '__self__', None)
+    name = getattr(listener, '__name__', None) or repr(listener)
+    if owner is not None:
+        return '%s.%s' % (owner.__class__.__name__, name.lstrip('_'))
+    return name
+
+
+class Subscription(object):
+    __slots__ = ('listener', 'events', 'coalesce', 'name', 'pending',
+        'calls', 'totalns', 'maxns')
+
+    def __init__(self, listener, events, coalesce, name):
+        self.listener = listener
+        self.events = events
+        self.coalesce = coalesce
+        self.name = name or _name(listener)
+        self.pending = None
+        self.calls = self.totalns = self.maxns = 0
+
+
+class EventBus:
+    _scheduled = False
+
+    def __init__(self, deferrer=None):
+        self._subs = []
+        self._pending = []
+        self._deferrer = deferrer
+
+    def setdeferrer(self, deferrer):
+        # deferrer(f) must arrange for f() to be called soon from the front
+        # end's loop. None delivers everything synchronously.
+        self._deferrer = deferrer
+        if deferrer is None and self._pending:
+            self.flush()
+
+    def subscribe(self, listener, events=None, coalesce=False, name=None):
+        # events limits the events delivered to listener
+        sub = Subscription(listener,
+            None if events is None else frozenset(events), coalesce, name)
+        self._subs.append(sub)
+        return sub
+
+    def unsubscribe(self, listener):
+        self._subs = [sub for sub in self._subs if sub.listener != listener]
+
+    def publish(self, source, event):
+        for sub in list(self._subs):
+            if sub.events is not None and event not in sub.events:
+                continue
+            if sub.coalesce and self._deferrer is not None:
+                if sub.pending is None:
+                    self._pending.append(sub)
+                sub.pending = (source, event)
+            else:
+                self._call(sub, source, event)
+
+        if self._pending and not self._scheduled:
+            self._scheduled = True
+            self._deferrer(self.flush)
+
+    def flush(self):
+        self._scheduled = False
+        pending, self._pending = self._pending, []
+        for sub in pending:
+            args, sub.pending = sub.pending, None
+            if sub in self._subs:
+                self._call(sub, *args)
+
+    def _call(self, sub, source, event):
+        # real time, not the model's clock, which may be simulated
+        t = _perfns()
+        try:
+            sub.listener(source, event)
+        finally:
+            ns = _perfns() - t
+            sub.calls += 1
+            sub.totalns += ns
+            if ns > sub.maxns:
+                sub.maxns = ns
+
+    def stats(self):
+        # [(name, calls, total ns, max ns)] of current listeners, slowest
+        # first
+        ret = [(sub.name, sub.calls, sub.totalns, sub.maxns) for sub in self._subs]
+        ret.sort(key=lambda r: r[3], reverse=True)
+        return ret
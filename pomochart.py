@@ -0,0 +1,122 @@
+import math
+
+# Geometry of the day dial drawn by the chart, independent of the drawing
+# backend. Seconds since midnight map to angles going clockwise from 9
+# o'clock, one turn a day: 6:00 is at the top, noon at 3 o'clock.
+
+# half a turn
+DIALSEC = 3600*12
+
+def sec2rad(sec):
+    return math.pi - math.pi*(float(sec)/DIALSEC)
+
+
+class Dial:
+    def __init__(self, w, h):
+        self.size = (w, h)
+        self.r = r = (min(w, h)-5)/2.0
+        self.cx = cx = w//2
+        self.cy = cy = h//2
+        self.circle = (cx-r, cy-r, cx+r, cy+r)
+
+    def pos(self, sec):
+        rad = sec2rad(sec)
+        return (int(self.cx+math.cos(rad)*self.r),
+                int(self.cy-math.sin(rad)*self.r))
+
+    def wedge(self, f, t):
+        # returns ('pie', (circle, tpos, fpos)) for a wedge from f to t
+        # seconds, or ('line', (center, tpos)) if it's too thin to fill.
+        fpos = self.pos(f)
+        tpos = self.pos(t)
+        if fpos != tpos:
+            return 'pie', (self.circle, tpos, fpos)
+        return 'line', ((self.cx, self.cy), tpos)
+
+    def wedges(self, intervals):
+        return [self.wedge(f, t) for f, t in intervals]
+
+
+def shade(value, maximum, low, high):
+    # blends COLORREF low towards high by value/maximum
+    if maximum <= 0 or value <= 0:
+        return low
+    f = min(float(value)/maximum, 1.0)
+    color = 0
+    for shift in (0, 8, 16):
+        l = (low >> shift) & 0xff
+        h = (high >> shift) & 0xff
+        color |= int(l + (h-l)*f + 0.5) << shift
+    return color
+
+
+class Grid:
+    # rows x cols cells filling a w x h area
+    def __init__(self, w, h, rows, cols, gap=1):
+        self.rows = rows
+        self.cols = cols
+        self.gap = gap
+        self.cw = float(w) / cols
+        self.ch = float(h) / rows
+
+    def cell(self, row, col):
+        l = int(col*self.cw)
+        t = int(row*self.ch)
+        return (l, t, max(l+1, int((col+1)*self.cw) - self.gap),
+                max(t+1, int((row+1)*self.ch) - self.gap))
+
+
+# Heat map views. Each returns (Grid, [(rect, value)], maximum) from the
+# minute bitmaps of a pomoindex.Occupancy; lastday is a dayno.
+
+def weekview(w, h, occupancy, lastday):
+    # a row per day of the last week, a column per hour
+    grid = Grid(w, h, 7, 24)
+    cells = []
+    for row, day in enumerate(range(lastday-6, lastday+1)):
+        for col, minutes in enumerate(occupancy.hourly(day)):
+            cells.append((grid.cell(row, col), minutes))
+    return grid, cells, 60
+
+def calendarview(w, h, occupancy, lastday, weeks):
+    # a column per week ending with the one of lastday, a row per weekday
+    # starting on Monday. 1970-01-01 was a Thursday.
+    lastweek = (lastday+3) // 7
+    first = (lastweek-weeks+1)*7 - 3
+    grid = Grid(w, h, 7, weeks)
+    minutes = occupancy.daily(first, lastday)
+    cells = [(grid.cell(i % 7, i // 7), m) for i, m in enumerate(minutes)]
+    return grid, cells, max(max(minutes), 1)
+
+def monthview(w, h, occupancy, lastday):
+    return calendarview(w, h, occupancy, lastday, 5)
+
+def yearview(w, h, occupancy, lastday):
+    return calendarview(w, h, occupancy, lastday, 53)
+
+VIEWS = ('day', 'week', 'month', 'year')
+HEATVIEWS = {'week': weekview, 'month': monthview, 'year': yearview}
+
+
+class LayerCache:
+    # Holds a rendered layer until its key changes. make(key, *args) builds
+    # the new layer, release(layer) is called with a layer being replaced.
+
+    key = layer = None
+
+    def __init__(self, make, release=None):
+        self._make = make
+        self._release = release
+
+    def get(self, key, *args):
+        if self.layer is None or key != self.key:
+            if self.layer is not None and self._release:
+                self._release(self.layer)
+            self.layer = self._make(key, *args)
+            self.key = key
+        return self.layer
+
+    def clear(self):
+        if self.layer is not None and self._release:
+            self._release(self.layer)
+        self.key = self.layer = None
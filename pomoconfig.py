@@ -0,0 +1,278 @@
+import os, sys
+import pomofmt
+
+try:
+    import ConfigParser as configparser
+    from StringIO import StringIO
+except ImportError:
+    import configparser
+    from io import StringIO
+
+try:
+    _integers = (int, long)
+except NameError:
+    _integers = (int,)
+
+# The parser works on native strings: utf-8 encoded bytes on Python 2,
+# text on Python 3.
+
+CONFIG = """
+[CONFIG]
+minutes = 25
+soundfile =
+format = hh:mm:ss
+countdown = no
+shortbreak = 5
+longbreak = 15
+longevery = 4
+autocycle = no
+syncdir =
+"""
+
+SECTION = 'CONFIG'
+
+class ConfigError(ValueError):
+    pass
+
+def checkpositive(option, value):
+    if not isinstance(value, _integers) or value < 1:
+        raise ConfigError('%s must be a positive integer: %r' % (option, value))
+
+def checktimeout(timeout):
+    checkpositive('minutes', timeout)
+
+def checksoundfile(soundfile):
+    if soundfile and not os.path.isfile(soundfile):
+        raise ConfigError('sound file not found: %r' % (soundfile,))
+
+def checkformat(timeformat):
+    if timeformat not in pomofmt.FORMATS:
+        raise ConfigError('format must be one of %s: %r' % (
+            ', '.join(sorted(pomofmt.FORMATS)), timeformat))
+
+
+# positive integer options other than minutes, named as their attribute
+INTOPTIONS = ('shortbreak', 'longbreak', 'longevery')
+
+class Config(object):
+    # Validated settings. Instances are treated as immutable, use copy()
+    # to derive a changed one.
+
+    __slots__ = ('timeout', 'soundfile', 'timeformat', 'countdown',
+        'shortbreak', 'longbreak', 'longevery', 'autocycle', 'syncdir')
+
+    def __init__(self, timeout=25, soundfile=u'', timeformat=pomofmt.DEFAULT_FORMAT,
+            countdown=False, shortbreak=5, longbreak=15, longevery=4, autocycle=False,
+            syncdir=u''):
+        self.timeout = timeout
+        self.soundfile = soundfile
+        self.timeformat = timeformat
+        self.countdown = countdown
+        self.shortbreak = shortbreak
+        self.longbreak = longbreak
+        self.longevery = longevery
+        self.autocycle = autocycle
+        self.syncdir = syncdir
+
+    def copy(self, **kw):
+        values = dict((name, getattr(self, name)) for name in self.__slots__)
+        values.update(kw)
+        return Config(**values)
+
+    def validate(self):
+        checktimeout(self.timeout)
+        checksoundfile(self.soundfile)
+        checkformat(self.timeformat)
+        for option in INTOPTIONS:
+            checkpositive(option, getattr(self, option))
+
+    def __eq__(self, other):
+        return isinstance(other, Config) and all(
+            getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __ne__(self, other):
+        return not self == other
+
+
+def _newparser(text=CONFIG):
+    parser = configparser.RawConfigParser()
+    _read(parser, text)
+    return parser
+
+def _read(parser, text):
+    read = getattr(parser, 'read_file', None) or parser.readfp
+    read(StringIO(text))
+
+def _readfile(filename):
+    with open(filename, 'rb') as f:
+        data = f.read()
+    if bytes is str:
+        return data
+    return data.decode('utf-8', 'replace')
+
+def _getvalue(parser, option):
+    value = parser.get(SECTION, option)
+    if isinstance(value, bytes):
+        value = value.decode('utf-8', 'replace')
+    return value.strip()
+
+def _getint(parser, option):
+    value = _getvalue(parser, option)
+    try:
+        return int(value)
+    except ValueError:
+        raise ConfigError('%s must be an integer: %r' % (option, value))
+
+def parse(text, previous=None):
+    # returns (Config, [error messages]). Invalid values keep the previous
+    # value, or the default if there is none.
+    config = previous.copy() if previous else Config()
+    errors = []
+    parser = _newparser()
+    try:
+        _read(parser, text)
+    except configparser.Error as e:
+        return config, [str(e)]
+
+    try:
+        timeout = _getint(parser, 'minutes')
+        checktimeout(timeout)
+        config.timeout = timeout
+    except (ValueError, configparser.Error) as e:
+        errors.append(str(e))
+
+    try:
+        soundfile = _getvalue(parser, 'soundfile')
+        checksoundfile(soundfile)
+        config.soundfile = soundfile
+    except (ValueError, configparser.Error) as e:
+        errors.append(str(e))
+
+    try:
+        timeformat = str(_getvalue(parser, 'format'))
+        checkformat(timeformat)
+        config.timeformat = timeformat
+    except (ValueError, configparser.Error) as e:
+        errors.append(str(e))
+
+    try:
+        # a directory shared with other instances, empty to not sync
+        config.syncdir = _getvalue(parser, 'syncdir')
+    except (ValueError, configparser.Error) as e:
+        errors.append(str(e))
+
+    for option in ('countdown', 'autocycle'):
+        try:
+            setattr(config, option, parser.getboolean(SECTION, option))
+        except (ValueError, configparser.Error) as e:
+            errors.append('%s: %s' % (option, e))
+
+    for option in INTOPTIONS:
+        try:
+            value = _getint(parser, option)
+            checkpositive(option, value)
+            setattr(config, option, value)
+        except (ValueError, configparser.Error) as e:
+            errors.append(str(e))
+
+    return config, errors
+
+if hasattr(os, 'replace'):
+    _replace = os.replace
+elif sys.platform == 'win32':
+    import ctypes
+    def _replace(src, dst):
+        # MOVEFILE_REPLACE_EXISTING | MOVEFILE_WRITE_THROUGH
+        if not ctypes.windll.kernel32.MoveFileExW(unicode(src), unicode(dst), 1 | 8):
+            raise ctypes.WinError()
+else:
+    _replace = os.rename
+
+
+class ConfigFile:
+    # Config file with its parsed contents cached. The file is only parsed
+    # again when its mtime or size changes, and written atomically by
+    # renaming a fully written temporary file over it.
+
+    _stat = None
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.config = Config()
+        self.errors = []
+
+    def __getstat(self):
+        try:
+            st = os.stat(self.filename)
+        except OSError:
+            return None
+        return st.st_mtime, st.st_size
+
+    def get(self):
+        return self.config
+
+    def reload(self):
+        # re-reads the file if it changed since last time. Returns True if
+        # the settings changed.
+        stat = self.__getstat()
+        if stat == self._stat:
+            return False
+        self._stat = stat
+
+        text = ''
+        if stat is not None:
+            text = _readfile(self.filename)
+
+        config, self.errors = parse(text, self.config)
+        if config == self.config:
+            return False
+        self.config = config
+        return True
+
+    def save(self, config):
+        # the sound file is picked from a file dialog and checked on load
+        checktimeout(config.timeout)
+
+        # keep options we don't know about
+        parser = _newparser()
+        if os.path.exists(self.filename):
+            try:
+                _read(parser, _readfile(self.filename))
+            except configparser.Error:
+                parser = _newparser()
+
+        parser.set(SECTION, 'minutes', str(config.timeout))
+        soundfile = config.soundfile
+        if not isinstance(soundfile, str):
+            # Python 2, RawConfigParser writes str
+            soundfile = soundfile.encode('utf-8')
+        parser.set(SECTION, 'soundfile', soundfile)
+        syncdir = config.syncdir
+        if not isinstance(syncdir, str):
+            syncdir = syncdir.encode('utf-8')
+        parser.set(SECTION, 'syncdir', syncdir)
+        parser.set(SECTION, 'format', config.timeformat)
+        for option in ('countdown', 'autocycle'):
+            parser.set(SECTION, option, 'yes' if getattr(config, option) else 'no')
+        for option in INTOPTIONS:
+            parser.set(SECTION, option, str(getattr(config, option)))
+
+        out = StringIO()
+        parser.write(out)
+        data = out.getvalue()
+        if not isinstance(data, bytes):
+            data = data.encode('utf-8')
+
+        dirname = os.path.dirname(self.filename)
+        if dirname and not os.path.exists(dirname):
+            os.makedirs(dirname)
+        tmpname = self.filename + u'.tmp'
+        with open(tmpname, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        _replace(tmpname, self.filename)
+
+        self.config = config
+        self.errors = []
+        self._stat = self.__getstat()
@@ -0,0 +1,349 @@
+import os, sys
+# the C module, socket.py pulls in enum and selectors
+import _socket
+
+# Control channel of a running instance, and the command line client:
+#
+#   pomoctl.py start|pause|resume|stop|skip|status|stats|tasks|quit
+#   pomoctl.py task [NAME | --none]
+#   pomoctl.py history [--from DATE] [--to DATE] [--min MINUTES]
+#       [--max MINUTES] [--tag TAG] [--limit N] [--cursor CURSOR]
+#
+# The client side only imports os, sys and _socket, so that status queries
+# from shell prompts and editor plugins return in a few milliseconds. If
+# no instance is running, start, stats and the task commands launch a
+# headless one.
+#
+# Requests are one command per line, its arguments separated by tabs, the
+# reply is 'ok' or 'error' on the first line followed by text, then the
+# connection is closed. The channel
+# is a Unix socket in the config directory, or where there are none, a
+# localhost TCP port written to a file there.
+
+APPNAME = u"PomoTimer"
+
+def _appdata():
+    if sys.platform == 'win32':
+        path = os.environ.get('APPDATA')
+    else:
+        path = os.environ.get('XDG_CONFIG_HOME') or os.path.expanduser('~/.config')
+    if isinstance(path, bytes):
+        path = path.decode(sys.getfilesystemencoding() or 'utf-8')
+    return path
+
+CONFIGFILEPATH = os.path.join(_appdata(), u'pomotimer')
+
+SOCKETNAME = u'control.sock'
+PORTNAME = u'control.port'
+TIMEOUT = 2.0
+# requests are read on the UI thread, a client that sends nothing
+# mustn't hold it up for long
+READTIMEOUT = 0.2
+
+# commands that launch an instance when none is running
+DAEMONCOMMANDS = ('start', 'stats', 'task', 'tasks', 'export', 'import')
+DAEMONWAIT = 5.0
+
+HAVEUNIX = hasattr(_socket, 'AF_UNIX')
+
+class ControlError(Exception):
+    pass
+
+def _connect(dirname, timeout=TIMEOUT):
+    if HAVEUNIX:
+        sock = _socket.socket(_socket.AF_UNIX, _socket.SOCK_STREAM)
+        address = os.path.join(dirname, SOCKETNAME)
+    else:
+        try:
+            with open(os.path.join(dirname, PORTNAME)) as f:
+                port = int(f.read())
+        except (IOError, OSError, ValueError):
+            raise _socket.error('not running')
+        sock = _socket.socket(_socket.AF_INET, _socket.SOCK_STREAM)
+        address = ('127.0.0.1', port)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(address)
+    except Exception:
+        sock.close()
+        raise
+    return sock
+
+def request(cmd, dirname=None, timeout=TIMEOUT):
+    # sends cmd to the running instance and returns (ok, text). Raises
+    # socket.error if there is none.
+    sock = _connect(dirname or CONFIGFILEPATH, timeout)
+    try:
+        sock.sendall(cmd.encode('utf-8') + b'\n')
+        chunks = []
+        while True:
+            data = sock.recv(4096)
+            if not data:
+                break
+            chunks.append(data)
+    finally:
+        sock.close()
+    reply = b''.join(chunks).decode('utf-8', 'replace')
+    status, _, text = reply.partition(u'\n')
+    return status == u'ok', text
+
+def spawndaemon():
+    # starts a headless instance detached from this terminal
+    import subprocess, time
+    if getattr(sys, 'frozen', False):
+        # py2exe build, pomotimer.exe is next to us
+        args = [os.path.join(os.path.dirname(sys.executable), 'pomotimer.exe')]
+    else:
+        args = [sys.executable, os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), 'pomotimer.py')]
+    env = dict(os.environ, POMOTIMER_BACKEND='headless')
+    kw = {}
+    if sys.platform == 'win32':
+        kw['creationflags'] = 0x00000008   # DETACHED_PROCESS
+    else:
+        kw['preexec_fn'] = os.setsid
+    with open(os.devnull, 'r+b') as null:
+        subprocess.Popen(args, env=env, stdin=null,
+            stdout=null, stderr=null, close_fds=True, **kw)
+    deadline = time.time() + DAEMONWAIT
+    while time.time() < deadline:
+        try:
+            _connect(CONFIGFILEPATH).close()
+            return True
+        except (_socket.error, OSError):
+            time.sleep(0.02)
+    return False
+
+USAGE = '''usage: pomoctl.py start|pause|resume|stop|skip|status|stats|tasks|quit
+       pomoctl.py task [NAME | --none]
+       pomoctl.py history [--from DATE] [--to DATE] [--min MINUTES]
+           [--max MINUTES] [--tag TAG] [--limit N] [--cursor CURSOR]
+       pomoctl.py export|import FILE [--format FORMAT]
+'''
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        sys.stderr.write(USAGE)
+        return 2
+    if isinstance(argv[0], bytes):
+        argv = [arg.decode(sys.getfilesystemencoding() or 'utf-8') for arg in argv]
+    cmd = argv[0].lower()
+    if cmd in ('export', 'import') and len(argv) > 1 and not argv[1].startswith(u'--'):
+        # the instance has a working directory of its own
+        argv = [argv[0], os.path.abspath(argv[1])] + argv[2:]
+    try:
+        ok, text = request(u'\t'.join([cmd] + argv[1:]))
+    except (_socket.error, OSError):
+        if cmd not in DAEMONCOMMANDS:
+            sys.stderr.write('%s is not running\n' % APPNAME)
+            return 3
+        if not spawndaemon():
+            sys.stderr.write('failed to start %s\n' % APPNAME)
+            return 1
+        ok, text = request(u'\t'.join([cmd] + argv[1:]))
+    if text:
+        if not text.endswith(u'\n'):
+            text += u'\n'
+        stream = sys.stdout if ok else sys.stderr
+        if sys.version_info[0] < 3:
+            text = text.encode(getattr(stream, 'encoding', None) or 'utf-8', 'replace')
+        stream.write(text)
+    return 0 if ok else 1
+
+
+class ControlServer:
+    # Serves requests for a PomoTimerApp. Front ends poll() when sock is
+    # readable. Requests are short, each is handled to completion.
+
+    sock = None
+    onquit = None
+    _hwnd = None
+
+    def __init__(self, app, dirname=None):
+        self.app = app
+        self.dirname = dirname or CONFIGFILEPATH
+
+    def open(self):
+        # False if another instance already serves the channel
+        import socket
+        if not os.path.isdir(self.dirname):
+            os.makedirs(self.dirname)
+        try:
+            _connect(self.dirname, 0.2).close()
+            return False
+        except (_socket.error, OSError):
+            pass
+
+        if HAVEUNIX:
+            path = os.path.join(self.dirname, SOCKETNAME)
+            if os.path.exists(path):
+                # left behind by an instance that crashed
+                os.remove(path)
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            umask = os.umask(0o077)
+            try:
+                sock.bind(path)
+            finally:
+                os.umask(umask)
+        else:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.bind(('127.0.0.1', 0))
+            with open(os.path.join(self.dirname, PORTNAME), 'w') as f:
+                f.write(str(sock.getsockname()[1]))
+        sock.listen(8)
+        sock.setblocking(False)
+        self.sock = sock
+        return True
+
+    def close(self):
+        if self.sock is None:
+            return
+        self.sock.close()
+        self.sock = None
+        name = SOCKETNAME if HAVEUNIX else PORTNAME
+        try:
+            os.remove(os.path.join(self.dirname, name))
+        except OSError:
+            pass
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def asyncselect(self, hwnd, msg):
+        # Windows: posts msg to hwnd when a connection is waiting, for
+        # front ends that can't wait on sockets
+        import ctypes
+        self._hwnd = hwnd
+        FD_ACCEPT = 8
+        if ctypes.windll.ws2_32.WSAAsyncSelect(self.fileno(), hwnd, msg, FD_ACCEPT):
+            raise _socket.error('WSAAsyncSelect failed')
+
+    def poll(self):
+        # handles the connections waiting to be accepted
+        while self.sock is not None:
+            try:
+                conn = self.sock.accept()[0]
+            except (_socket.error, OSError):
+                return
+            try:
+                if self._hwnd is not None:
+                    # accepted sockets inherit the selection, which has to
+                    # be cleared before they can block
+                    import ctypes
+                    ctypes.windll.ws2_32.WSAAsyncSelect(conn.fileno(), self._hwnd, 0, 0)
+                conn.settimeout(READTIMEOUT)
+                self.handle(conn)
+            except (_socket.error, OSError):
+                pass
+            finally:
+                conn.close()
+
+    def handle(self, conn):
+        data = b''
+        while b'\n' not in data and len(data) < 4096:
+            chunk = conn.recv(4096)
+            if not chunk:
+                break
+            data += chunk
+        args = data.split(b'\n', 1)[0].decode('utf-8', 'replace').split(u'\t')
+        cmd = args[0].strip().lower()
+        try:
+            text = self.execute(cmd, args[1:])
+            reply = u'ok\n' + text
+        except ControlError as e:
+            reply = u'error\n%s' % e
+        conn.sendall(reply.encode('utf-8'))
+
+    def execute(self, cmd, args=()):
+        # returns the reply text, raises ControlError
+        app = self.app
+        if cmd == 'history':
+            return self.history(args)
+        if cmd == 'task':
+            return self.task(args)
+        if cmd in ('export', 'import'):
+            return self.transfer(cmd, args)
+        if args:
+            raise ControlError('%s takes no arguments' % cmd)
+        if cmd in ('start', 'pause', 'resume', 'stop'):
+            getattr(app.engine, cmd)()
+        elif cmd == 'skip':
+            app.cycle.skip()
+        elif cmd == 'stats':
+            return app.statstext()
+        elif cmd == 'tasks':
+            return app.taskstext()
+        elif cmd == 'quit':
+            if self.onquit is None:
+                raise ControlError('quit is not supported')
+            self.onquit()
+            return u''
+        elif cmd != 'status':
+            raise ControlError('unknown command: %s' % cmd)
+        return app.statustext()
+
+    def task(self, args):
+        # sets the task with a name, shows the current one without
+        app = self.app
+        if args:
+            try:
+                app.settask(u'' if args == [u'--none'] else u' '.join(args))
+            except ValueError as e:
+                raise ControlError(str(e))
+        name = app.tasks.name(app.engine.task)
+        return name + u'\n' if name else u''
+
+    def transfer(self, cmd, args):
+        # exports the history to a file or merges sessions from one, the
+        # format guessed from the extension unless given
+        import getopt, pomoexport
+        try:
+            opts, rest = getopt.gnu_getopt(args, '', ['format='])
+        except getopt.GetoptError as e:
+            raise ControlError(str(e))
+        if len(rest) != 1:
+            raise ControlError('%s takes one file name' % cmd)
+        format = dict(opts).get('--format')
+        try:
+            if cmd == 'export':
+                count = self.app.exporthistory(rest[0], format)
+                return u'exported %d sessions\n' % count
+            count = self.app.importhistory(rest[0], format)
+            return u'imported %d new sessions\n' % count
+        except pomoexport.ExportError as e:
+            raise ControlError(str(e))
+        except EnvironmentError as e:
+            raise ControlError('%s: %s' % (rest[0], e.strerror or e))
+
+    def history(self, args):
+        import datetime, getopt
+        try:
+            opts, rest = getopt.getopt(args, '',
+                ['from=', 'to=', 'min=', 'max=', 'tag=', 'limit=', 'cursor='])
+            if rest:
+                raise ValueError('unexpected argument: %s' % rest[0])
+            kw = {}
+            for opt, value in opts:
+                name = opt[2:]
+                if name in ('from', 'to'):
+                    day = datetime.datetime.strptime(value, '%Y-%m-%d')
+                    if name == 'to':
+                        # inclusive
+                        day += datetime.timedelta(days=1)
+                    kw['first' if name == 'from' else 'last'] = day
+                elif name in ('min', 'max'):
+                    kw[name + 'sec'] = float(value)*60
+                elif name == 'limit':
+                    kw['limit'] = int(value)
+                    if kw['limit'] < 1:
+                        raise ValueError('limit must be at least 1')
+                else:
+                    kw[name] = value
+            return self.app.historytext(**kw)
+        except (getopt.GetoptError, ValueError) as e:
+            raise ControlError(str(e))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
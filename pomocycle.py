@@ -0,0 +1,189 @@
+import pomoengine, pomobus
+
+# Work/break cycles on top of a PomoEngine: work, short break, work, ...,
+# work, long break, then around again. Work phases are the engine's
+# pomodoros; breaks are timed here. When a phase begins, the deadlines of
+# the rest of the cycle are computed from it, so a scheduler only has to
+# sleep until the next one: getdeadlinein() reads the first of them.
+
+IDLE = 'idle'
+WORK = 'work'
+SHORTBREAK = 'shortbreak'
+LONGBREAK = 'longbreak'
+
+BREAKS = (SHORTBREAK, LONGBREAK)
+
+def makeplan(work, shortbreak, longbreak, longevery):
+    # [(phase, minutes)] of one cycle
+    plan = []
+    for i in range(longevery):
+        plan.append((WORK, work))
+        if i == longevery-1:
+            plan.append((LONGBREAK, longbreak))
+        else:
+            plan.append((SHORTBREAK, shortbreak))
+    return plan
+
+
+class CycleEngine:
+    # Listeners are called as listener(cycle, 'phase') after every phase
+    # change, with the phase before it in previous. expired is True if the
+    # change is the end of a break that ran its full length. configure()
+    # fires 'config', the deadlines may have moved.
+    #
+    # A work phase completes when its pomodoro is stopped after timing out;
+    # stopping it earlier abandons it and the cycle waits for the next
+    # start. With auto, pomodoros are stopped at their timeout and the next
+    # one started when a break ends. Starting a pomodoro during a break
+    # skips the rest of it.
+
+    phase = previous = IDLE
+    position = 0
+    expired = False
+    _breakstart = None
+    _expiring = False
+    _autostop = False
+
+    def __init__(self, engine, shortbreak=5, longbreak=15, longevery=4, auto=False):
+        self.engine = engine
+        self.clock = engine.clock
+        self.deadlines = []
+        self.bus = pomobus.EventBus()
+        self.configure(shortbreak, longbreak, longevery, auto)
+        engine.subscribe(self.__onEngine)
+
+    def close(self):
+        self.engine.unsubscribe(self.__onEngine)
+
+    def configure(self, shortbreak, longbreak, longevery, auto=False):
+        self.shortbreak = shortbreak
+        self.longbreak = longbreak
+        self.longevery = longevery
+        self.auto = auto
+        self.plan = makeplan(self.engine.timeout, shortbreak, longbreak, longevery)
+        if self.position >= len(self.plan):
+            self.position = 0
+            if self.phase in BREAKS:
+                self.__setphase(IDLE)
+        if self.phase != IDLE:
+            self.__makedeadlines(self.__phasestartns())
+        self._fire('config')
+
+    def subscribe(self, listener, **kw):
+        return self.bus.subscribe(listener, **kw)
+
+    def unsubscribe(self, listener):
+        self.bus.unsubscribe(listener)
+
+    def _fire(self, event):
+        self.bus.publish(self, event)
+
+    def __phasestartns(self):
+        if self.phase == WORK:
+            # as if the pomodoro had run without pauses
+            cur = self.engine.cur
+            return self.clock.monotonic_ns() - cur.getelapsens(self.clock)
+        if self.phase in BREAKS:
+            return self._breakstart
+        return self.clock.monotonic_ns()
+
+    def __makedeadlines(self, startns):
+        # monotonic deadlines of the current phase and the rest of the cycle
+        self.deadlines = []
+        t = startns
+        for phase, minutes in self.plan[self.position:]:
+            t += int(minutes*60*pomoengine.NSEC)
+            self.deadlines.append((phase, t))
+
+    def __setphase(self, phase):
+        self.previous, self.phase = self.phase, phase
+        self.expired = self._expiring
+        self._breakstart = None
+        if phase == IDLE:
+            self.deadlines = []
+        else:
+            now = self.clock.monotonic_ns()
+            self.__makedeadlines(now)
+            if phase in BREAKS:
+                self._breakstart = now
+        self._fire('phase')
+
+    def __onEngine(self, engine, event):
+        if event == 'config':
+            self.configure(self.shortbreak, self.longbreak, self.longevery, self.auto)
+        elif event == 'start':
+            self._autostop = False
+            if self.phase in BREAKS:
+                self.position = (self.position+1) % len(self.plan)
+            self.__setphase(WORK)
+        elif event == 'resume':
+            # the pause moved the remaining deadlines
+            self.__makedeadlines(self.__phasestartns())
+        elif event == 'timeout':
+            if self.auto:
+                # stopped from check(), once all listeners have seen the
+                # timeout
+                self._autostop = True
+        elif event == 'stop' and self.phase == WORK:
+            if engine.cur.elapsens >= int(engine.timeout*60*pomoengine.NSEC):
+                self.position += 1
+                self.__setphase(self.plan[self.position][0])
+            else:
+                self.__setphase(IDLE)
+
+    def __breakend(self):
+        # work deadlines are the engine's timeout, only breaks end here
+        if self.phase not in BREAKS:
+            return None
+        return self.deadlines[0][1]
+
+    def getdeadlinein(self):
+        # seconds until the current break ends, or until check() stops a
+        # pomodoro that timed out
+        if self._autostop:
+            return 0.0
+        breakend = self.__breakend()
+        if breakend is None:
+            return None
+        rest = breakend - self.clock.monotonic_ns()
+        return float(max(rest, 0)) / pomoengine.NSEC
+
+    def getremainingsec(self):
+        # seconds left in the current break, None outside breaks
+        breakend = self.__breakend()
+        if breakend is None:
+            return None
+        return -(-(breakend - self.clock.monotonic_ns()) // pomoengine.NSEC)
+
+    def check(self):
+        if self._autostop:
+            self._autostop = False
+            if self.auto and self.engine.isrunning():
+                self.engine.stop()
+                return True
+        breakend = self.__breakend()
+        if breakend is None or self.clock.monotonic_ns() < breakend:
+            return False
+        self._expiring = True
+        try:
+            self.skip()
+        finally:
+            self._expiring = False
+        return True
+
+    def skip(self):
+        # ends the current break now
+        if self.phase not in BREAKS:
+            return False
+        if self.auto and self.engine.start():
+            # the start moved on to the next work phase
+            return True
+        self.position = (self.position+1) % len(self.plan)
+        self.__setphase(IDLE)
+        return True
+
+    def reset(self):
+        # back to the first pomodoro of a cycle
+        self.position = 0
+        if self.phase in BREAKS:
+            self.__setphase(IDLE)
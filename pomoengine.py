@@ -0,0 +1,365 @@
+import bisect, datetime, sys, time
+from array import array
+import pomobus
+
+STOPPED = 'stopped'
+RUNNING = 'running'
+PAUSED = 'paused'
+TIMEOUT = 'timeout'
+
+NSEC = 1000000000
+
+if hasattr(time, 'monotonic_ns'):
+    monotonic_ns = time.monotonic_ns
+else:
+    if hasattr(time, 'monotonic'):
+        _monotonic = time.monotonic
+    elif sys.platform == 'win32':
+        # QueryPerformanceCounter based, never goes backwards
+        _monotonic = time.clock
+    else:
+        _monotonic = time.time
+
+    def monotonic_ns():
+        return int(_monotonic()*NSEC)
+
+try:
+    array('q')
+    TYPECODE = 'q'
+except ValueError:
+    # no 64bit integer arrays on Python 2, doubles hold usec timestamps
+    # and elapsed nanoseconds of any realistic pomodoro exactly
+    TYPECODE = 'd'
+
+EPOCH = datetime.datetime(1970, 1, 1)
+
+def dt2usec(dt):
+    # naive local datetime to microseconds since 1970-01-01
+    d = dt - EPOCH
+    return (d.days*86400 + d.seconds)*1000000 + d.microseconds
+
+def usec2dt(usec):
+    return EPOCH + datetime.timedelta(microseconds=usec)
+
+def nowusec():
+    return dt2usec(datetime.datetime.now())
+
+
+class SystemClock:
+    # The clock everything reads time from. Wall clock times come from
+    # nowusec()/now(), elapsed time from monotonic_ns(). Replaced by a
+    # pomosim.SimClock to run faster than real time.
+
+    def monotonic_ns(self):
+        return monotonic_ns()
+
+    def nowusec(self):
+        return nowusec()
+
+    def now(self):
+        return datetime.datetime.now()
+
+defaultclock = SystemClock()
+
+def sec_to_str(s):
+    h = s//3600
+    m = (s-h*3600)//60
+    sec = s % 60
+
+    return u"%02d:%02d:%02d" % (h, m, sec)
+
+def _dtproperty(name):
+    def get(self):
+        usec = getattr(self, name)
+        if usec is not None:
+            return usec2dt(usec)
+    return property(get)
+
+def _prefix(segments):
+    # running usec before each run of segments, one more than closed runs
+    focused = array(TYPECODE, [0])
+    for i in range(1, len(segments), 2):
+        focused.append(focused[-1] + segments[i] - segments[i-1])
+    return focused
+
+class Pomodoro(object):
+    # Wall clock times are kept as integer microseconds (see dt2usec) for
+    # display, but elapsed time is accounted in integer nanoseconds of the
+    # monotonic clock so it is not affected by clock adjustments and never
+    # loses sub-second remainders.
+    #
+    # Methods reading the time take the clock to read, the default clock
+    # if None. A clock isn't kept per instance to keep them small.
+    #
+    # Once paused, the wall clock usec where runs start and end are kept in
+    # segments, [start, end, start, end, ...] with the open run's end
+    # missing, and _focused holds the running time before each run. Until
+    # then both are None and the session is a single run. They become
+    # arrays when the session stops.
+    #
+    # task is the ID of what was worked on, see pomotask, 0 for none.
+
+    __slots__ = ('startedusec', 'stoppedusec', 'resumedusec', 'pausedusec',
+        'elapsens', 'stoppedns', '_resumedns', 'segments', '_focused', 'task')
+
+    started = _dtproperty('startedusec')
+    stopped = _dtproperty('stoppedusec')
+    resumed = _dtproperty('resumedusec')
+    paused = _dtproperty('pausedusec')
+
+    def __init__(self, started=None, clock=None, task=0):
+        clock = clock or defaultclock
+        if started is None:
+            self.startedusec = clock.nowusec()
+        else:
+            self.startedusec = dt2usec(started)
+        self.resumedusec = self.startedusec
+        self.stoppedusec = self.pausedusec = self.stoppedns = None
+        self.segments = self._focused = None
+        self.task = task
+        self.elapsens = 0
+        self._resumedns = clock.monotonic_ns()
+
+    @property
+    def elapse(self):
+        return self.elapsens // NSEC
+
+    def pause(self, clock=None):
+        if self.pausedusec is not None or self.stoppedusec is not None:
+            return
+        clock = clock or defaultclock
+        self.pausedusec = clock.nowusec()
+        self.__addrun(clock.monotonic_ns())
+        self.__endsegment(self.pausedusec)
+        self.resumedusec = None
+
+    def resume(self, clock=None):
+        if self.pausedusec is None or self.stoppedusec is not None:
+            return
+
+        clock = clock or defaultclock
+        self.pausedusec = None
+        self.resumedusec = clock.nowusec()
+        self._resumedns = clock.monotonic_ns()
+        # a pause created segments
+        self.segments.append(self.resumedusec)
+
+    def __addrun(self, ns):
+        self.elapsens += ns - self._resumedns
+        self._resumedns = None
+
+    def __endsegment(self, usec):
+        segments = self.segments
+        if segments is None:
+            # lists while running, appending to them is cheaper
+            segments = self.segments = [self.startedusec]
+            self._focused = [0]
+        focused = self._focused
+        focused.append(focused[-1] + usec - segments[-1])
+        segments.append(usec)
+
+    def getelapsens(self, clock=None):
+        # O(1), the running time is kept up to date at every pause
+        if self.pausedusec is not None or self.stoppedusec is not None:
+            return self.elapsens
+        else:
+            return self.elapsens + (clock or defaultclock).monotonic_ns() - self._resumedns
+
+    def getelapse(self, clock=None):
+        return self.getelapsens(clock) // NSEC
+
+    def stop(self, clock=None):
+        clock = clock or defaultclock
+        self.stoppedusec = clock.nowusec()
+        self.stoppedns = clock.monotonic_ns()
+        if self.resumedusec is not None:
+            self.__addrun(self.stoppedns)
+            if self.segments is not None:
+                self.__endsegment(self.stoppedusec)
+        if self.segments is not None:
+            self.segments = array(TYPECODE, self.segments)
+            self._focused = array(TYPECODE, self._focused)
+        self.pausedusec = None
+
+    def restore(self, stopped, elapsens):
+        # marks a session rebuilt from a saved history as finished
+        self.stoppedusec = dt2usec(stopped)
+        self.resumedusec = self.pausedusec = self._resumedns = None
+        self.elapsens = elapsens
+
+    def runs(self, nowusec=None):
+        # [(start, end)] wall clock usec of the time actually run. The open
+        # run of a running session ends at nowusec.
+        segments = self.segments
+        if segments is None:
+            stop = self.stoppedusec
+            return [(self.startedusec, nowusec if stop is None else stop)]
+        ret = [(int(segments[i]), int(segments[i+1]))
+            for i in range(0, len(segments)-1, 2)]
+        if len(segments) % 2:
+            ret.append((int(segments[-1]), nowusec))
+        return ret
+
+    def focusedat(self, usec):
+        # running time in usec from the start up to wall clock usec, which
+        # for a running session must not be in the future. O(log pauses).
+        segments = self.segments
+        if segments is None:
+            stop = self.stoppedusec
+            if stop is not None and usec > stop:
+                usec = stop
+            return max(usec - self.startedusec, 0)
+        i = bisect.bisect_right(segments, usec)
+        if i % 2:
+            return int(self._focused[i // 2] + usec - segments[i-1])
+        return int(self._focused[i // 2])
+
+    def focusedusec(self, t1, t2):
+        # running time between wall clock usec t1 and t2
+        return self.focusedat(t2) - self.focusedat(t1)
+
+    @classmethod
+    def fromcolumns(cls, startedusec, stoppedusec, elapsens, segments=None, task=0):
+        pomo = cls.__new__(cls)
+        pomo.startedusec = startedusec
+        pomo.stoppedusec = stoppedusec
+        pomo.elapsens = elapsens
+        pomo.resumedusec = pomo.pausedusec = pomo.stoppedns = None
+        pomo._resumedns = None
+        pomo.segments = segments
+        pomo._focused = None if segments is None else _prefix(segments)
+        pomo.task = task
+        return pomo
+
+
+class PomoEngine:
+    # GUI independent timer state. Front ends call start/pause/resume/stop
+    # and check() periodically, and subscribe() to be told about changes.
+    # Listeners are called as listener(engine, event) where event is one of
+    # 'start', 'pause', 'resume', 'stop', 'config', 'task' or 'timeout'.
+    # All time is read from clock.
+
+    cur = None
+    task = 0
+    _notified = False
+
+    def __init__(self, timeout=25, hist=None, clock=None):
+        if hist is None:
+            hist = []
+        self.hist = hist
+        self.timeout = timeout
+        self.clock = clock = clock or defaultclock
+        self.started = clock.now()
+        self._startedns = clock.monotonic_ns()
+        self.bus = pomobus.EventBus()
+
+    def subscribe(self, listener, **kw):
+        # see pomobus.EventBus.subscribe
+        return self.bus.subscribe(listener, **kw)
+
+    def unsubscribe(self, listener):
+        self.bus.unsubscribe(listener)
+
+    def _fire(self, event):
+        self.bus.publish(self, event)
+
+    def isrunning(self):
+        return self.cur is not None and not self.cur.stopped
+
+    def start(self):
+        if self.isrunning():
+            return False
+        self.cur = Pomodoro(clock=self.clock, task=self.task)
+        self.hist.append(self.cur)
+        self._notified = False
+        self._fire('start')
+        return True
+
+    def pause(self):
+        if not self.isrunning() or self.cur.paused:
+            return False
+        self.cur.pause(self.clock)
+        self._fire('pause')
+        return True
+
+    def resume(self):
+        if not self.isrunning() or not self.cur.paused:
+            return False
+        self.cur.resume(self.clock)
+        self._fire('resume')
+        return True
+
+    def togglepause(self):
+        if self.isrunning() and self.cur.paused:
+            return self.resume()
+        return self.pause()
+
+    def stop(self):
+        if not self.isrunning():
+            return False
+        self.cur.stop(self.clock)
+        self._fire('stop')
+        return True
+
+    def settimeout(self, minutes):
+        self.timeout = minutes
+        self._fire('config')
+
+    def settask(self, task):
+        # the task of the next pomodoro, and of the running one if any
+        self.task = task
+        if self.isrunning():
+            self.cur.task = task
+        self._fire('task')
+
+    def istimeout(self):
+        return self.isrunning() and \
+            self.cur.getelapsens(self.clock) >= int(self.timeout*60*NSEC)
+
+    def state(self):
+        if not self.isrunning():
+            return STOPPED
+        if self.cur.paused:
+            return PAUSED
+        if self.istimeout():
+            return TIMEOUT
+        return RUNNING
+
+    def __idlesince(self):
+        if self.cur:
+            return self.cur.stoppedns
+        return self._startedns
+
+    def getdisplaysec(self):
+        # running/paused: time spent on the current pomodoro.
+        # otherwise: time since the last pomodoro (or the app) was stopped.
+        if self.isrunning():
+            return self.cur.getelapse(self.clock)
+        return (self.clock.monotonic_ns() - self.__idlesince()) // NSEC
+
+    def getnexttickin(self):
+        # seconds until the displayed value changes, None while paused.
+        if self.isrunning():
+            if self.cur.paused:
+                return None
+            passed = self.cur.getelapsens(self.clock)
+        else:
+            passed = self.clock.monotonic_ns() - self.__idlesince()
+        return float(NSEC - passed % NSEC) / NSEC
+
+    def gettimeoutin(self):
+        # seconds until the current pomodoro times out, if still pending.
+        if self._notified or not self.isrunning() or self.cur.paused:
+            return None
+        rest = int(self.timeout*60*NSEC) - self.cur.getelapsens(self.clock)
+        return float(max(rest, 0)) / NSEC
+
+    def getdisplaytext(self):
+        return sec_to_str(self.getdisplaysec())
+
+    def check(self):
+        if self._notified or not self.istimeout():
+            return False
+        self._notified = True
+        self._fire('timeout')
+        return True
@@ -0,0 +1,257 @@
+import csv, io, json, os, struct
+import pomoengine
+
+# Bulk export/import of session history. Sessions are exported straight
+# from the SessionStore columns in chunks, so memory use doesn't grow with
+# the history. Every format carries the same three integer columns:
+#
+#   started_usec  local wall clock start, microseconds (pomoengine.dt2usec)
+#   stopped_usec  local wall clock stop
+#   elapsed_ns    focused time in nanoseconds
+#
+# Formats: csv, jsonl, npy (structured array, written without numpy) and,
+# when pyarrow is installed, arrow (IPC stream) and parquet.
+
+FIELDS = ('started_usec', 'stopped_usec', 'elapsed_ns')
+CHUNK = 65536
+
+FORMATS = {
+    '.csv': 'csv',
+    '.jsonl': 'jsonl',
+    '.npy': 'npy',
+    '.arrow': 'arrow',
+    '.parquet': 'parquet',
+}
+
+class ExportError(Exception):
+    pass
+
+def guessformat(filename, format=None):
+    if format:
+        return format
+    ext = os.path.splitext(filename)[1].lower()
+    if ext not in FORMATS:
+        raise ExportError('unknown format: %s' % filename)
+    return FORMATS[ext]
+
+def _pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ExportError('pyarrow is required for arrow and parquet')
+    return pyarrow
+
+def iterchunks(store, chunk=CHUNK):
+    # yields (started, stopped, elapsed) column slices of finished sessions
+    store.settle()
+    for first in range(0, len(store), chunk):
+        last = first + chunk
+        started = store.startedusec[first:last]
+        stopped = store.stoppedusec[first:last]
+        elapsed = store.elapsens[first:last]
+        if min(stopped) < 0:
+            # drop sessions still running
+            rows = [i for i, v in enumerate(stopped) if v >= 0]
+            started = [started[i] for i in rows]
+            stopped = [stopped[i] for i in rows]
+            elapsed = [elapsed[i] for i in rows]
+        yield ([int(v) for v in started], [int(v) for v in stopped],
+               [int(v) for v in elapsed])
+
+def _opentext(filename):
+    # csv on Python 2 wants a binary file
+    if bytes is str:
+        return open(filename, 'wb')
+    return io.open(filename, 'w', encoding='ascii', newline='')
+
+def export(store, filename, format=None):
+    # returns the number of sessions written
+    format = guessformat(filename, format)
+    writer = globals().get('_export' + format)
+    if writer is None:
+        raise ExportError('unknown format: %s' % format)
+    return writer(store, filename)
+
+def _exportcsv(store, filename):
+    count = 0
+    with _opentext(filename) as f:
+        writer = csv.writer(f, lineterminator='\n')
+        writer.writerow(FIELDS)
+        for cols in iterchunks(store):
+            writer.writerows(zip(*cols))
+            count += len(cols[0])
+    return count
+
+def _exportjsonl(store, filename):
+    count = 0
+    fmt = '{"started_usec": %d, "stopped_usec": %d, "elapsed_ns": %d}\n'
+    with _opentext(filename) as f:
+        for cols in iterchunks(store):
+            f.write(u''.join([fmt % row for row in zip(*cols)]))
+            count += len(cols[0])
+    return count
+
+NPYROW = struct.Struct('<qqq')
+
+def _npyheader(count):
+    header = ("{'descr': [('started_usec', '<i8'), ('stopped_usec', '<i8'), "
+              "('elapsed_ns', '<i8')], 'fortran_order': False, 'shape': (%d,), }" % count)
+    # magic(6) + version(2) + length(2) + header + newline, padded to 64
+    pad = 64 - (10 + len(header) + 1) % 64
+    header = header + ' '*pad + '\n'
+    return b'\x93NUMPY\x01\x00' + struct.pack('<H', len(header)) + header.encode('ascii')
+
+def _exportnpy(store, filename):
+    count = 0
+    with open(filename, 'wb') as f:
+        # the row count isn't known until running sessions are skipped,
+        # reserve a header for the upper bound and rewrite it at the end
+        f.write(_npyheader(len(store)))
+        for cols in iterchunks(store):
+            f.write(b''.join([NPYROW.pack(*row) for row in zip(*cols)]))
+            count += len(cols[0])
+        header = _npyheader(count)
+        if len(header) != len(_npyheader(len(store))):
+            raise ExportError('npy header size changed')
+        f.seek(0)
+        f.write(header)
+    return count
+
+def _arrowbatches(pyarrow, store):
+    schema = pyarrow.schema([(name, pyarrow.int64()) for name in FIELDS])
+    def batches():
+        for cols in iterchunks(store):
+            yield pyarrow.record_batch([pyarrow.array(c, pyarrow.int64()) for c in cols],
+                schema=schema)
+    return schema, batches()
+
+def _exportarrow(store, filename):
+    pyarrow = _pyarrow()
+    schema, batches = _arrowbatches(pyarrow, store)
+    count = 0
+    with pyarrow.OSFile(filename, 'wb') as sink:
+        with pyarrow.ipc.new_stream(sink, schema) as writer:
+            for batch in batches:
+                writer.write_batch(batch)
+                count += batch.num_rows
+    return count
+
+def _exportparquet(store, filename):
+    pyarrow = _pyarrow()
+    import pyarrow.parquet
+    schema, batches = _arrowbatches(pyarrow, store)
+    count = 0
+    with pyarrow.parquet.ParquetWriter(filename, schema) as writer:
+        for batch in batches:
+            writer.write_table(pyarrow.Table.from_batches([batch], schema))
+            count += batch.num_rows
+    return count
+
+
+def iterimport(filename, format=None):
+    # streams (started_usec, stopped_usec, elapsed_ns) tuples from a file
+    format = guessformat(filename, format)
+    reader = globals().get('_import' + format)
+    if reader is None:
+        raise ExportError('unknown format: %s' % format)
+    return reader(filename)
+
+def _importcsv(filename):
+    if bytes is str:
+        f = open(filename, 'rb')
+    else:
+        f = io.open(filename, encoding='utf-8', newline='')
+    with f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        try:
+            cols = [header.index(name) for name in FIELDS]
+        except ValueError:
+            raise ExportError('%s: missing columns, expected %s' % (filename, ', '.join(FIELDS)))
+        for row in reader:
+            if row:
+                yield tuple(int(row[i]) for i in cols)
+
+def _importjsonl(filename):
+    with io.open(filename, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                rec = json.loads(line)
+                yield tuple(int(rec[name]) for name in FIELDS)
+
+def _importnpy(filename):
+    with open(filename, 'rb') as f:
+        if f.read(6) != b'\x93NUMPY':
+            raise ExportError('%s: not a .npy file' % filename)
+        major = ord(f.read(1)[:1])
+        f.read(1)
+        if major == 1:
+            size = struct.unpack('<H', f.read(2))[0]
+        else:
+            size = struct.unpack('<I', f.read(4))[0]
+        header = f.read(size).decode('latin1')
+        if "'<i8'" not in header or 'started_usec' not in header:
+            raise ExportError('%s: unsupported array layout' % filename)
+        while True:
+            data = f.read(NPYROW.size*CHUNK)
+            if not data:
+                break
+            for i in range(0, len(data) - NPYROW.size + 1, NPYROW.size):
+                yield NPYROW.unpack_from(data, i)
+
+def _importarrow(filename):
+    pyarrow = _pyarrow()
+    with pyarrow.OSFile(filename, 'rb') as source:
+        for batch in pyarrow.ipc.open_stream(source):
+            for row in zip(*[batch.column(name).to_pylist() for name in FIELDS]):
+                yield row
+
+def _importparquet(filename):
+    pyarrow = _pyarrow()
+    import pyarrow.parquet
+    for batch in pyarrow.parquet.ParquetFile(filename).iter_batches(
+            batch_size=CHUNK, columns=list(FIELDS)):
+        for row in zip(*[batch.column(name).to_pylist() for name in FIELDS]):
+            yield row
+
+
+def checkrecord(record):
+    # a (started_usec, stopped_usec, elapsed_ns) tuple of ints, raises
+    # ValueError if it can't be a finished session
+    started, stopped, elapsed = [int(v) for v in record]
+    if started < 0 or stopped < started or elapsed < 0:
+        raise ValueError('not a session: %r' % (record,))
+    return started, stopped, elapsed
+
+def merge(records, store, listeners=(), known=None):
+    # appends sessions from records that store doesn't have yet, keyed on
+    # their start time, and calls listener(pomo) for each. Returns the
+    # number of sessions added. known, the set of start times in store, is
+    # updated when given, so callers merging often don't rebuild it.
+    # Every record is read and checked first, a bad one raises ExportError
+    # with nothing added.
+    checked = []
+    row = 1
+    try:
+        for record in records:
+            checked.append(checkrecord(record))
+            row += 1
+    except (ValueError, TypeError, KeyError, IndexError, csv.Error) as e:
+        raise ExportError('record %d: %s' % (row, e))
+
+    if known is None:
+        known = set(int(v) for v in store.startedusec)
+    added = 0
+    for started, stopped, elapsed in checked:
+        if started in known:
+            continue
+        known.add(started)
+        pomo = pomoengine.Pomodoro.fromcolumns(started, stopped, elapsed)
+        store.append(pomo)
+        for listener in listeners:
+            listener(pomo)
+        added += 1
+    return added
@@ -0,0 +1,84 @@
+import pomoengine
+
+# Display text of the timer. Rendered strings are cached per formatter,
+# the display only ever shows a few thousand distinct values so repeated
+# ticks and tray tip requests are a dict lookup.
+
+def _hhmmss(s):
+    return u"%02d:%02d:%02d" % (s // 3600, s // 60 % 60, s % 60)
+
+def _mmss(s):
+    # minutes go past 59 rather than wrapping
+    return u"%02d:%02d" % (s // 60, s % 60)
+
+def _hmm(s):
+    return u"%d:%02d" % (s // 3600, s // 60 % 60)
+
+FORMATS = {
+    'hh:mm:ss': _hhmmss,
+    'mm:ss': _mmss,
+    'h:mm': _hmm,
+}
+DEFAULT_FORMAT = 'hh:mm:ss'
+
+class Formatter:
+    # Formats the display value of an engine. With countdown, a running
+    # pomodoro shows the time left instead, and the time over the timeout
+    # with a leading '+' once it ran out.
+
+    CACHEMAX = 4096
+
+    def __init__(self, format=DEFAULT_FORMAT, countdown=False):
+        self.format = format
+        self.countdown = countdown
+        self._render = FORMATS[format]
+        self._cache = {}
+
+    def text(self, sec):
+        s = self._cache.get(sec)
+        if s is None:
+            if len(self._cache) >= self.CACHEMAX:
+                self._cache.clear()
+            if sec < 0:
+                s = u'+' + self._render(-sec)
+            else:
+                s = self._render(sec)
+            self._cache[sec] = s
+        return s
+
+    def displaysec(self, engine):
+        # seconds to show; negative for time past the timeout in countdown
+        sec = engine.getdisplaysec()
+        if self.countdown and engine.isrunning():
+            # time left rounded up, so that 00:00 shows at the timeout
+            over = engine.cur.getelapsens(engine.clock) - int(engine.timeout*60*pomoengine.NSEC)
+            sec = -(over // pomoengine.NSEC)
+        return sec
+
+    def display(self, engine, cycle=None):
+        # breaks of a pomocycle.CycleEngine always count down
+        if cycle is not None:
+            rest = cycle.getremainingsec()
+            if rest is not None:
+                return self.text(max(rest, 0))
+        return self.text(self.displaysec(engine))
+
+
+class Throttle:
+    # ready() returns True at most once every interval seconds of clock
+
+    _last = None
+
+    def __init__(self, interval, clock=None):
+        self.interval = int(interval*pomoengine.NSEC)
+        self.clock = clock or pomoengine.defaultclock
+
+    def ready(self):
+        now = self.clock.monotonic_ns()
+        if self._last is not None and now - self._last < self.interval:
+            return False
+        self._last = now
+        return True
+
+    def reset(self):
+        self._last = None
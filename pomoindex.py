@@ -0,0 +1,237 @@
+import bisect, datetime
+from array import array
+import pomoengine, pomostore
+
+DAYUSEC = 86400*1000000
+
+def dayno(day):
+    return (day - pomoengine.EPOCH.date()).days
+
+
+class IntervalIndex:
+    # The runs of finished pomodoros, without their pauses, bucketed by
+    # every day they overlap, each bucket a pair of start/stop usec arrays
+    # sorted by start time. Running pomodoros are kept aside until they
+    # stop, since their end is not known yet.
+
+    _engine = None
+
+    # bumped whenever a finished interval is added
+    generation = 0
+
+    def __init__(self):
+        self._days = {}
+        self._active = []
+
+    def extend(self, pomos):
+        for pomo in pomos:
+            self.add(pomo)
+
+    def add(self, pomo):
+        if pomo.stoppedusec is None:
+            if pomo not in self._active:
+                self._active.append(pomo)
+            return
+
+        if pomo in self._active:
+            self._active.remove(pomo)
+        for start, stop in pomo.runs():
+            self.addinterval(start, stop)
+
+    def addinterval(self, start, stop):
+        day = start // DAYUSEC
+        # an interval stopping exactly at midnight doesn't touch the next day
+        last = max(day, (stop-1) // DAYUSEC)
+        self.generation += 1
+        while day <= last:
+            bucket = self._days.get(day)
+            if bucket is None:
+                bucket = self._days[day] = (array(pomostore.TYPECODE),
+                    array(pomostore.TYPECODE))
+            starts, stops = bucket
+            if not starts or start >= starts[-1]:
+                starts.append(start)
+                stops.append(stop)
+            else:
+                pos = bisect.bisect_right(starts, start)
+                starts.insert(pos, start)
+                stops.insert(pos, stop)
+            day += 1
+
+    def getstate(self):
+        # finished intervals only, see pomosnap
+        return dict((day, (pomostore.tobytes(starts), pomostore.tobytes(stops)))
+            for day, (starts, stops) in self._days.items())
+
+    def setstate(self, state):
+        self._days = dict((day, (array(pomostore.TYPECODE, starts),
+            array(pomostore.TYPECODE, stops))) for day, (starts, stops) in state.items())
+        self.generation += 1
+
+    def attach(self, engine):
+        self._engine = engine
+        engine.subscribe(self.__onEngine)
+
+    def detach(self):
+        if self._engine:
+            self._engine.unsubscribe(self.__onEngine)
+            self._engine = None
+
+    def __onEngine(self, engine, event):
+        if event in ('start', 'stop'):
+            self.add(engine.cur)
+
+    def iterday(self, day, now=None):
+        # yields (from, to) in seconds since the start of day for every
+        # run of a pomodoro overlapping it, clipped to the day. Running
+        # pomodoros end at now.
+        for interval in self.iterfinished(day):
+            yield interval
+        for interval in self.iteractive(day, now):
+            yield interval
+
+    def iterfinished(self, day):
+        day = dayno(day)
+        daystart = day*DAYUSEC
+        dayend = daystart + DAYUSEC
+
+        bucket = self._days.get(day)
+        if bucket:
+            for start, stop in zip(*bucket):
+                yield (int(max(start, daystart) - daystart) // 1000000,
+                       int(min(stop, dayend) - daystart) // 1000000)
+
+    def iteractive(self, day, now=None):
+        if now is None:
+            now = datetime.datetime.now()
+        daystart = dayno(day)*DAYUSEC
+        dayend = daystart + DAYUSEC
+
+        nowusec = pomoengine.dt2usec(now)
+        for pomo in self._active:
+            for start, stop in pomo.runs(nowusec):
+                if stop <= daystart or start >= dayend:
+                    continue
+                yield ((max(start, daystart) - daystart) // 1000000,
+                       (min(stop, dayend) - daystart) // 1000000)
+
+
+DAYMINUTES = 1440
+MINUTEUSEC = 60*1000000
+
+# number of bits set in each byte value
+POPCOUNT = bytearray(bin(i).count('1') for i in range(256))
+
+def _spans(first, last):
+    # (byte offset, mask) pairs covering bits first..last-1
+    while first < last:
+        pos, bit = divmod(first, 8)
+        end = min(last - pos*8, 8)
+        yield pos, ((1 << end) - 1) & ~((1 << bit) - 1)
+        first = pos*8 + end
+
+
+class Occupancy:
+    # Minute resolution bitmap of the time run by finished pomodoros,
+    # pauses excluded, 1440 bits per day, and the number of minutes set for
+    # each day. A minute counts if any run touches it. Kept up to date as
+    # sessions stop, so that views spanning months only read these arrays.
+    # Adding the same interval twice doesn't change anything, so bulk loads
+    # are deferred until the first query.
+
+    _engine = None
+    generation = 0
+
+    def __init__(self):
+        self._bits = {}
+        self._minutes = {}
+        self._pending = []
+
+    def extend(self, pomos):
+        self._pending.append(pomos)
+        self.generation += 1
+
+    def __settle(self):
+        # extend() already accounted for these in generation
+        generation = self.generation
+        while self._pending:
+            for pomo in self._pending.pop(0):
+                self.add(pomo)
+        self.generation = generation
+
+    def add(self, pomo):
+        if pomo.stoppedusec is not None:
+            for start, stop in pomo.runs():
+                self.addinterval(start, stop)
+
+    def addinterval(self, start, stop):
+        first = int(start // MINUTEUSEC)
+        last = max(int(-(-stop // MINUTEUSEC)), first+1)
+        self.generation += 1
+        while first < last:
+            day, minute = divmod(first, DAYMINUTES)
+            end = min(last - day*DAYMINUTES, DAYMINUTES)
+            bits = self._bits.get(day)
+            if bits is None:
+                bits = self._bits[day] = bytearray(DAYMINUTES // 8)
+            pos, bit = divmod(minute, 8)
+            lastpos, lastbit = divmod(end-1, 8)
+            mask = 0xff & ~((1 << bit) - 1)
+            added = 0
+            while pos < lastpos:
+                added += POPCOUNT[mask & ~bits[pos]]
+                bits[pos] |= mask
+                mask = 0xff
+                pos += 1
+            mask &= (2 << lastbit) - 1
+            added += POPCOUNT[mask & ~bits[pos]]
+            bits[pos] |= mask
+            self._minutes[day] = self._minutes.get(day, 0) + added
+            first = day*DAYMINUTES + end
+
+    def getstate(self):
+        self.__settle()
+        return (dict((day, bytes(bits)) for day, bits in self._bits.items()),
+            self._minutes)
+
+    def setstate(self, state):
+        bits, minutes = state
+        self._bits = dict((day, bytearray(data)) for day, data in bits.items())
+        self._minutes = dict(minutes)
+        self.generation += 1
+
+    def attach(self, engine):
+        self._engine = engine
+        engine.subscribe(self.__onEngine)
+
+    def detach(self):
+        if self._engine:
+            self._engine.unsubscribe(self.__onEngine)
+            self._engine = None
+
+    def __onEngine(self, engine, event):
+        if event == 'stop':
+            self.add(engine.cur)
+
+    def minutes(self, day):
+        # minutes covered on day, a dayno
+        self.__settle()
+        return self._minutes.get(day, 0)
+
+    def count(self, day, first, last):
+        # minutes covered on day between minute first and last
+        self.__settle()
+        bits = self._bits.get(day)
+        if bits is None:
+            return 0
+        return sum(POPCOUNT[bits[pos] & mask] for pos, mask in _spans(first, last))
+
+    def hourly(self, day):
+        # minutes covered in each hour of day
+        return [self.count(day, h*60, h*60+60) for h in range(24)]
+
+    def daily(self, first, last):
+        # minutes covered on each day from first to last inclusive
+        self.__settle()
+        get = self._minutes.get
+        return array('H', [get(day, 0) for day in range(first, last+1)])
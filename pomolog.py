@@ -0,0 +1,203 @@
+import os, time
+from array import array
+import pomoengine
+
+# Append-only session log, one record per line:
+#
+#   S <usec>            start
+#   P <usec> <elapsens> pause
+#   R <usec>            resume
+#   E <usec> <elapsens> stop
+#   I <started> <stopped> <elapsens>
+#                       finished session imported from elsewhere
+#   T <task>            task selected, applies to the open session too
+#   N <task> <name>     name of a task ID, utf-8
+#
+# <usec> is local wall clock time in microseconds (pomoengine.dt2usec) and
+# <elapsens> the accumulated running time in nanoseconds. Each record is
+# written through to the OS immediately, fsync is batched. A torn record
+# at the end of the file (from a crash) is ignored on load.
+
+ARITY = {'S': 1, 'P': 2, 'R': 1, 'E': 2, 'I': 3, 'T': 1}
+
+def iterrecords(f):
+    # yields (kind, [int values]), and ('N', [task, name]) for names
+    for line in f:
+        if not line.endswith(b'\n'):
+            # torn write
+            return
+        fields = line.split()
+        if not fields:
+            continue
+        kind = fields[0].decode('ascii', 'replace')
+        if kind == 'N':
+            fields = line.split(None, 2)
+            if len(fields) == 3 and fields[1].isdigit():
+                yield kind, [int(fields[1]), fields[2].strip().decode('utf-8', 'replace')]
+            continue
+        if ARITY.get(kind) != len(fields)-1:
+            continue
+        try:
+            values = [int(v) for v in fields[1:]]
+        except ValueError:
+            continue
+        yield kind, values
+
+def iterpomodoros(f, tasks=None, task=0):
+    # rebuilds finished Pomodoro objects from a stream of records. A session
+    # left open by a crash is closed at the time of its last record. Task
+    # names and selections go to tasks, a pomotask.TaskTable, task is the
+    # one selected where the stream starts.
+    pomo = last = None
+    for kind, values in iterrecords(f):
+        if kind == 'N':
+            if tasks is not None:
+                tasks.define(*values)
+            continue
+        if kind == 'T':
+            task = values[0]
+            if tasks is not None:
+                tasks.select(task)
+            if pomo:
+                pomo.task = task
+            continue
+        if kind == 'I':
+            # doesn't belong to the open session, if any
+            yield pomoengine.Pomodoro.fromcolumns(*values)
+            continue
+        if kind == 'S':
+            if pomo:
+                yield _close(pomo, bounds, last)
+            pomo = pomoengine.Pomodoro.fromcolumns(values[0], None, 0, task=task)
+            # run segments, see pomoengine.Pomodoro
+            bounds = [values[0]]
+        elif pomo is None:
+            continue
+        elif kind == 'P':
+            pomo.elapsens = values[1]
+            if len(bounds) % 2:
+                bounds.append(values[0])
+        elif kind == 'R':
+            if not len(bounds) % 2:
+                bounds.append(values[0])
+        elif kind == 'E':
+            yield _close(pomo, bounds, values[0], values[1])
+            pomo = None
+        last = values[0]
+
+    if pomo:
+        yield _close(pomo, bounds, last)
+
+def _close(pomo, bounds, usec, elapsens=None):
+    if elapsens is None:
+        elapsens = pomo.elapsens
+    segments = None
+    if len(bounds) > 1:
+        if len(bounds) % 2:
+            bounds.append(usec)
+        segments = array(pomoengine.TYPECODE, bounds)
+    return pomoengine.Pomodoro.fromcolumns(pomo.startedusec, usec, elapsens,
+        segments, pomo.task)
+
+
+class SessionLog:
+    SYNC_RECORDS = 32
+    SYNC_INTERVAL = 30
+
+    _f = None
+    _engine = None
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._pending = 0
+        self._lastsync = time.time()
+
+    def load(self, tasks=None, offset=0):
+        # offset, from size(), skips what a snapshot already holds
+        if not os.path.exists(self.filename):
+            return
+        with open(self.filename, 'rb') as f:
+            f.seek(offset)
+            task = tasks.current if tasks is not None else 0
+            for pomo in iterpomodoros(f, tasks, task):
+                yield pomo
+
+    def size(self):
+        # bytes written so far, a record boundary
+        self._f.flush()
+        return os.fstat(self._f.fileno()).st_size
+
+    def open(self):
+        if self._f is None:
+            dirname = os.path.dirname(self.filename)
+            if dirname and not os.path.exists(dirname):
+                os.makedirs(dirname)
+            self._f = open(self.filename, 'ab')
+            self.__repair()
+
+    def __repair(self):
+        # drops a torn record at the end, as load() did. Terminating it
+        # instead could turn the fragment into a valid record.
+        size = end = os.fstat(self._f.fileno()).st_size
+        with open(self.filename, 'rb') as f:
+            while end > 0:
+                start = max(end - 4096, 0)
+                f.seek(start)
+                pos = f.read(end - start).rfind(b'\n')
+                if pos >= 0:
+                    end = start + pos + 1
+                    break
+                end = start
+        if end != size:
+            self._f.truncate(end)
+
+    def close(self):
+        if self._engine:
+            self._engine.unsubscribe(self.__onEngine)
+            self._engine = None
+        if self._f is not None:
+            self.sync()
+            self._f.close()
+            self._f = None
+
+    def attach(self, engine):
+        self.open()
+        self._engine = engine
+        engine.subscribe(self.__onEngine)
+
+    def __onEngine(self, engine, event):
+        pomo = engine.cur
+        if event == 'start':
+            self.append('S', pomo.startedusec)
+        elif event == 'pause':
+            self.append('P', pomo.pausedusec, pomo.elapsens)
+        elif event == 'resume':
+            self.append('R', pomo.resumedusec)
+        elif event == 'stop':
+            self.append('E', pomo.stoppedusec, pomo.elapsens)
+        elif event == 'task':
+            self.append('T', engine.task)
+
+    def appendname(self, task, name):
+        # synced at once, sessions tagged later refer to it
+        self._f.write(('N %d ' % task).encode('ascii') + name.encode('utf-8') + b'\n')
+        self._pending += 1
+        self.sync()
+
+    def append(self, kind, *values):
+        fields = [kind]
+        fields.extend(str(v) for v in values)
+        self._f.write((u' '.join(fields) + u'\n').encode('ascii'))
+        self._f.flush()
+
+        self._pending += 1
+        if (self._pending >= self.SYNC_RECORDS or
+                time.time() - self._lastsync >= self.SYNC_INTERVAL):
+            self.sync()
+
+    def sync(self):
+        if self._f is not None and self._pending:
+            self._f.flush()
+            os.fsync(self._f.fileno())
+        self._pending = 0
+        self._lastsync = time.time()
@@ -0,0 +1,189 @@
+import bisect, threading
+import pomoengine
+
+# Timing histograms, counters and gauges of the hot paths. Disabled by
+# default, when start() returns None and observe()/inc() return at once,
+# so instrumented code pays about one attribute lookup and a call.
+#
+#   t = metrics.start()
+#   ...
+#   metrics.observe('chart_paint', t)
+#
+# Exported as Prometheus text or JSON, and over HTTP on localhost with
+# serve(). Times are measured in ns on the real monotonic clock and
+# exported in seconds. serve() exports from a thread of its own, so new
+# names are added, and the tables copied for export, under a lock.
+
+PREFIX = 'pomotimer_'
+
+# histogram bucket upper bounds in ns, 100 usec to 1 sec
+BUCKETS = (100000, 500000, 1000000, 5000000, 10000000, 50000000,
+    100000000, 500000000, 1000000000)
+
+HELP = {
+    'wake': 'Time spent handling a scheduler wakeup',
+    'tick_lateness': 'How late scheduler wakeups fire after their deadline',
+    'chart_paint': 'Time spent painting the chart',
+    'digit_paint': 'Time spent painting the digits',
+    'chart_layer_builds': 'Number of times the static chart layer was rebuilt',
+    'history_sessions': 'Number of sessions in the history',
+}
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0]*(len(buckets)+1)
+        self.count = 0
+        self.sumns = 0
+        self.maxns = 0
+
+    def observe(self, ns):
+        self.counts[bisect.bisect_left(self.buckets, ns)] += 1
+        self.count += 1
+        self.sumns += ns
+        if ns > self.maxns:
+            self.maxns = ns
+
+
+class Metrics:
+    enabled = False
+    _server = None
+
+    def __init__(self):
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+        self._lock = threading.Lock()
+
+    def start(self):
+        if not self.enabled:
+            return None
+        return pomoengine.monotonic_ns()
+
+    def observe(self, name, start):
+        # records the time since start, a value returned by start()
+        if start is not None:
+            self.observens(name, pomoengine.monotonic_ns() - start)
+
+    def observens(self, name, ns):
+        if not self.enabled:
+            return
+        hist = self.histograms.get(name)
+        if hist is None:
+            with self._lock:
+                hist = self.histograms.setdefault(name, Histogram())
+        hist.observe(ns)
+
+    def inc(self, name, n=1):
+        if self.enabled:
+            if name in self.counters:
+                self.counters[name] += n
+            else:
+                with self._lock:
+                    self.counters[name] = self.counters.get(name, 0) + n
+
+    def gauge(self, name, f):
+        # f() is called for the value on export
+        with self._lock:
+            self.gauges[name] = f
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+    def _tables(self):
+        # sorted copies of (histograms, counters, gauges)
+        with self._lock:
+            return (sorted(self.histograms.items()), sorted(self.counters.items()),
+                sorted(self.gauges.items()))
+
+    def snapshot(self):
+        ret = {}
+        histograms, counters, gauges = self._tables()
+        for name, hist in histograms:
+            ret[name] = {
+                'count': hist.count,
+                'sum': hist.sumns / 1e9,
+                'max': hist.maxns / 1e9,
+                'buckets': [[b / 1e9, c] for b, c in zip(BUCKETS, hist.counts)],
+                'over': hist.counts[-1],
+            }
+        for name, value in counters:
+            ret[name] = value
+        for name, f in gauges:
+            ret[name] = f()
+        return ret
+
+    def json(self):
+        import json
+        return json.dumps(self.snapshot(), indent=1, sort_keys=True)
+
+    def prometheus(self):
+        lines = []
+        def header(name, metric, kind):
+            if name in HELP:
+                lines.append('# HELP %s%s %s' % (PREFIX, metric, HELP[name]))
+            lines.append('# TYPE %s%s %s' % (PREFIX, metric, kind))
+
+        histograms, counters, gauges = self._tables()
+        for name, hist in histograms:
+            metric = name + '_seconds'
+            header(name, metric, 'histogram')
+            total = 0
+            for bound, count in zip(hist.buckets, hist.counts):
+                total += count
+                lines.append('%s%s_bucket{le="%g"} %d' % (PREFIX, metric, bound / 1e9, total))
+            lines.append('%s%s_bucket{le="+Inf"} %d' % (PREFIX, metric, hist.count))
+            lines.append('%s%s_sum %.9f' % (PREFIX, metric, hist.sumns / 1e9))
+            lines.append('%s%s_count %d' % (PREFIX, metric, hist.count))
+        for name, value in counters:
+            header(name, name + '_total', 'counter')
+            lines.append('%s%s_total %d' % (PREFIX, name, value))
+        for name, f in gauges:
+            header(name, name, 'gauge')
+            lines.append('%s%s %s' % (PREFIX, name, f()))
+        return '\n'.join(lines) + '\n'
+
+    def serve(self, port, host='127.0.0.1'):
+        # serves /metrics (Prometheus) and /metrics.json from a thread
+        import threading
+        try:
+            from http.server import HTTPServer, BaseHTTPRequestHandler
+        except ImportError:
+            from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+
+        metrics = self
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == '/metrics':
+                    body, ctype = metrics.prometheus(), 'text/plain; version=0.0.4'
+                elif self.path == '/metrics.json':
+                    body, ctype = metrics.json(), 'application/json'
+                else:
+                    self.send_error(404)
+                    return
+                body = body.encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', ctype)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.enabled = True
+        self._server = HTTPServer((host, port), Handler)
+        thread = threading.Thread(target=self._server.serve_forever, name='pomometrics')
+        thread.daemon = True
+        thread.start()
+        return self._server.server_address[1]
+
+    def close(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+metrics = Metrics()
@@ -0,0 +1,680 @@
+import os
+from pymfc import app, wnd, traynotify, gdi, menu, metric, layout
+from pymfc import iconbtn, winconst, shellapi
+import pomoengine, pomosched, pomochart, pomoindex, pomofmt, pomocycle, pomotask
+from pomometrics import metrics
+
+# Windows GUI backend on top of pymfc. The control frame is only created
+# the first time it is shown, and icons are loaded on first use.
+
+APPNAME = u"PomoTimer"
+ICON_POMOTIMER = u"pomotimer.ico"
+ICON_PAUSE = u"pomotimer_pause.ico"
+ICON_RUN = u"pomotimer_run.ico"
+ICON_TIMEOUT = u"pomotimer_timeout.ico"
+
+STATEICONS = {
+    pomoengine.STOPPED: ICON_POMOTIMER,
+    pomoengine.PAUSED: ICON_PAUSE,
+    pomoengine.TIMEOUT: ICON_TIMEOUT,
+    pomoengine.RUNNING: ICON_RUN,
+}
+
+BREAKTITLES = {
+    pomocycle.SHORTBREAK: u"Break",
+    pomocycle.LONGBREAK: u"Long break",
+}
+
+_icons = {}
+
+def geticon(filename):
+    icon = _icons.get(filename)
+    if icon is None:
+        icon = _icons[filename] = gdi.Icon(filename=filename, cx=16, cy=16)
+    return icon
+
+class ConfigDialog(wnd.Dialog):
+    CONTEXT=True
+    TITLE = APPNAME
+
+    def _prepare(self, kwargs):
+        super(ConfigDialog, self)._prepare(kwargs)
+        
+        self._layout = layout.Table(parent=self, adjustparent=True,
+            pos=(10,5), margin_bottom=5, margin_right=10, rowgap=5)
+
+        row = self._layout.addRow()
+        cell = row.addCell()
+        cell.add(u"Pomodoro")
+        cell.add(None)
+
+        cell = row.addCell()
+        cell.add(wnd.NumEdit, title=unicode(pomotimer.engine.timeout), width=10, name="edit")
+        cell.add(u" minutes")
+
+        row = self._layout.addRow()
+        cell = row.addCell()
+        cell.add(u"Sound file")
+        cell.add(None)
+        
+        cell = row.addCell(fillhorz=True)
+        cell.add(wnd.Edit, width=40, title=pomotimer.soundfile, name="soundfilename", extendright=True)
+        cell.add(None)
+        cell.add(wnd.Button, title=u"Browse", name='browse')
+
+        row = self._layout.addRow()
+        cell = row.addCell(colspan=2, alignright=True)
+
+        cell.add(wnd.OkButton, title=u"OK", name='ok')
+        cell.add(None)
+        cell.add(wnd.CancelButton, title=u"Cancel", name='cancel')
+
+        self._layout.ctrls.edit.msglistener.CHANGE = self.__checkNum
+        self._layout.ctrls.browse.msglistener.CLICKED = self.__selectfile
+        self.setDefaultValue(None)
+        
+    def __checkNum(self, msg=None):
+        text = self._layout.ctrls.edit.getText()
+        ret = None
+        try:
+            ret = int(text)
+        except:
+            self._layout.ctrls.ok.enableWindow(False)
+        else:
+            if ret < 1:
+                self._layout.ctrls.ok.enableWindow(False)
+            else:
+                self._layout.ctrls.ok.enableWindow(True)
+
+        return ret
+
+    def __selectfile(self, msg):
+        mediadir = os.path.join(
+            shellapi.shGetSpecialFolderPath(None, shellapi.CSIDL.windows, create=False),
+            u"Media")
+
+        dlg = wnd.FileDialog(
+            title=u'Select sound file', initdir=mediadir, 
+            filter=((u'wav file', ('*.wav',)),), nochangedir=True, readonly=True, 
+            filemustexist=True)
+        
+        ret = dlg.openDlg()
+        if ret:
+            self._layout.ctrls.soundfilename.setText(ret[0])
+        
+
+    def onOk(self, msg=None):
+        num = self.__checkNum()
+        filename = self._layout.ctrls.soundfilename.getText().strip()
+        
+        self.setResultValue((num, filename))
+        self.endDialog(self.IDOK)
+
+    def onCancel(self, msg=None):
+        self.setResultValue(None)
+        self.endDialog(self.IDCANCEL)
+
+
+class TaskDialog(wnd.Dialog):
+    CONTEXT=True
+    TITLE = APPNAME
+
+    def _prepare(self, kwargs):
+        super(TaskDialog, self)._prepare(kwargs)
+
+        self._layout = layout.Table(parent=self, adjustparent=True,
+            pos=(10,5), margin_bottom=5, margin_right=10, rowgap=5)
+
+        row = self._layout.addRow()
+        cell = row.addCell()
+        cell.add(u"Task")
+        cell.add(None)
+
+        cell = row.addCell(fillhorz=True)
+        cell.add(wnd.Edit, width=40, name="taskname", extendright=True,
+            title=pomotimer.tasks.name(pomotimer.engine.task))
+
+        row = self._layout.addRow()
+        cell = row.addCell(colspan=2, alignright=True)
+
+        cell.add(wnd.OkButton, title=u"OK", name='ok')
+        cell.add(None)
+        cell.add(wnd.CancelButton, title=u"Cancel", name='cancel')
+
+        self._layout.ctrls.taskname.msglistener.CHANGE = self.__checkName
+        self.setDefaultValue(None)
+
+    def __checkName(self, msg=None):
+        name = self._layout.ctrls.taskname.getText().strip()
+        self._layout.ctrls.ok.enableWindow(bool(name))
+        return name
+
+    def onOk(self, msg=None):
+        name = self.__checkName()
+        if not name:
+            return
+        self.setResultValue(name)
+        self.endDialog(self.IDOK)
+
+    def onCancel(self, msg=None):
+        self.setResultValue(None)
+        self.endDialog(self.IDCANCEL)
+
+
+class Chart(wnd.Wnd):
+    WNDCLASS_BACKGROUNDCOLOR = 0xffffff
+    WNDCLASS_CURSOR = gdi.Cursor(arrow=True)
+
+    CHARTBRUSH = gdi.Brush(color=0x905000)
+    CHARTPEN = gdi.Pen(color=0xe0e0e0)
+
+    PIECOLOR = 0x0050ff
+    PIEBRUSH = gdi.Brush(color=PIECOLOR)
+    HEATCOLOR = 0xf0f0f0
+    PIEPEN = gdi.Pen(color=0xf08080, width=0)
+    
+    def _prepare(self, kwargs):
+        super(Chart, self)._prepare(kwargs)
+        self.msgproc.PAINT = self.__onPaint
+        
+        # clock face and finished pomodoros, redrawn on resize, day change
+        # or when a pomodoro finishes.
+        self._static = pomochart.LayerCache(self.__makeStatic, self.__releaseLayer)
+        # offscreen buffer the running pomodoro is drawn over the static layer
+        self._back = pomochart.LayerCache(self.__makeLayer, self.__releaseLayer)
+    
+    def __makeLayer(self, key, dc):
+        w, h = key[:2]
+        pdc = dc.createCompatibleDC()
+        bmp = dc.createCompatibleBitmap(w, h)
+        orgbmp = pdc.selectObject(bmp)
+        return pdc, bmp, orgbmp
+
+    def __releaseLayer(self, layer):
+        pdc, bmp, orgbmp = layer
+        pdc.selectObject(orgbmp)
+
+    def __makeStatic(self, key, dc):
+        w, h, day, view = key[:4]
+        metrics.inc('chart_layer_builds')
+        layer = self.__makeLayer(key, dc)
+        pdc = layer[0]
+
+        pdc.fillSolidRect((0, 0, w, h), self.WNDCLASS_BACKGROUNDCOLOR)
+        if view != 'day':
+            grid, cells, maximum = pomochart.HEATVIEWS[view](w, h,
+                pomotimer.occupancy, pomoindex.dayno(day))
+            for rect, value in cells:
+                pdc.fillSolidRect(rect, pomochart.shade(value, maximum,
+                    self.HEATCOLOR, self.PIECOLOR))
+            return layer
+
+        dial = pomochart.Dial(w, h)
+        pdc.selectObject(self.CHARTPEN)
+        pdc.selectObject(self.CHARTBRUSH)
+        pdc.ellipse(dial.circle)
+
+        self.__drawPies(pdc, dial, pomotimer.index.iterfinished(day))
+        return layer
+
+    def __drawPies(self, pdc, dial, intervals):
+        pdc.selectObject(self.PIEPEN)
+        pdc.selectObject(self.PIEBRUSH)
+        for kind, args in dial.wedges(intervals):
+            if kind == 'pie':
+                pdc.pie(*args)
+            else:
+                center, tpos = args
+                pdc.moveTo(center)
+                pdc.lineTo(tpos)
+
+    def __onPaint(self, msg):
+        started = metrics.start()
+        dc = gdi.PaintDC(msg.wnd)
+
+        try:
+            l, t, r, b = self.getClientRect()
+            w = r-l
+            h = b-t
+
+            now = pomotimer.clock.now()
+            day = now.date()
+            view = pomotimer.chartview
+            if view == 'day':
+                generation = pomotimer.index.generation
+            else:
+                generation = pomotimer.occupancy.generation
+            sdc = self._static.get((w, h, day, view, generation), dc)[0]
+
+            active = []
+            if view == 'day':
+                active = list(pomotimer.index.iteractive(day, now))
+            if active:
+                pdc = self._back.get((w, h), dc)[0]
+                pdc.bitBlt((0, 0, w, h), sdc, (0, 0), srccopy=True)
+                self.__drawPies(pdc, pomochart.Dial(w, h), active)
+                dc.bitBlt((0, 0, w, h), pdc, (0, 0), srccopy=True)
+            else:
+                dc.bitBlt((0, 0, w, h), sdc, (0, 0), srccopy=True)
+        finally:
+            dc.endPaint()
+            metrics.observe('chart_paint', started)
+    
+
+class Digit(wnd.Wnd):
+    WNDCLASS_BACKGROUNDCOLOR = 0xffffff
+    WNDCLASS_CURSOR = gdi.Cursor(arrow=True)
+    FONT = gdi.Font(face=u"Arial Black", point=18)
+    
+    def _prepare(self, kwargs):
+        super(Digit, self)._prepare(kwargs)
+        
+        self._text = u''
+        self._color = 0
+        self.msgproc.PAINT = self.__onPaint
+    
+    def __onPaint(self, msg):
+        started = metrics.start()
+        dc = gdi.PaintDC(msg.wnd)
+        try:
+
+            l, t, r, b = self.getClientRect()
+            w = r-l
+            h = b-t
+
+            pdc = dc.createCompatibleDC()
+            bmp = dc.createCompatibleBitmap(w, h)
+            orgbmp = pdc.selectObject(bmp)
+            
+            pdc.fillSolidRect((l, t, r, b), self.WNDCLASS_BACKGROUNDCOLOR)
+            pdc.setTextColor(self._color)
+            pdc.selectObject(self.FONT)
+
+            pdc.drawText(self._text, (l, t, r, b), noprefix=True, singleline=True, center=True, vcenter=True)
+            dc.bitBlt((0, 0, w, h), pdc, (0, 0), srccopy=True)
+        finally:
+            dc.endPaint()
+            metrics.observe('digit_paint', started)
+    
+    def setText(self, text):
+        if text != self._text:
+            self._text = text
+            self.invalidateRect(None, erase=False)
+    
+    def setColor(self, color):
+        if color != self._color:
+            self._color = color
+            self.invalidateRect(None, erase=False)
+        
+class PFrame(wnd.FrameWnd):
+    STYLE = wnd.FrameWnd.STYLE(visible=False, popup=True, overlapped=False, 
+        sysmenu=False, caption=False, border=False, thickframe=False, toolwindow=True)
+    WNDCLASS_CURSOR = gdi.Cursor(arrow=True)
+
+    CONTEXT=True
+    ROLE="frame"
+    TITLE = APPNAME
+    WNDCLASS_BACKGROUNDCOLOR = 0xf08080
+    
+    DIGITCOLORS = {
+        pomoengine.STOPPED: 0xc0c0c0,
+        pomoengine.PAUSED: 0x808080,
+        pomoengine.TIMEOUT: 0x0050ff,
+        pomoengine.RUNNING: 0x905000,
+    }
+
+    BORDERPEN = gdi.Pen(color=0x000000, width=1)
+    
+    def _prepare(self, kwargs):
+        super(PFrame, self)._prepare(kwargs)
+        
+        fullscreen = (metric.CXFULLSCREEN, metric.CYFULLSCREEN + metric.CYCAPTION)
+        self._size = (300, 200)
+        self._pos = (fullscreen[0] - self._size[0]-5, fullscreen[1] - self._size[1]-5)
+        
+        self._layout = layout.Table(parent=self, pos=(2, 2), margin_right=2, margin_bottom=2,
+            extendright=True, extendbottom=True, rowgap=0)
+
+        row = self._layout.addRow(fillvert=True)
+        cell = row.addCell()
+        self._digits = cell.add(Digit, width=20, extendbottom=True)
+        self._digits.ctrl.msgproc.NCHITTEST = self.__onChildNCHitTest
+        
+        self._chart = cell.add(Chart, extendright=True, extendbottom=True)
+        self._chart.ctrl.msgproc.NCHITTEST = self.__onChildNCHitTest
+        
+        row = self._layout.addRow()
+        cell = row.addCell()
+
+        self._buttons = iconbtn.HorzIconButtonBar(parent=self)
+        self._btnstart = iconbtn.IconButton(
+            title=u'Start', tooltipmsg=u'Start', 
+            icon=geticon(u'start.ico'), 
+            bgcolor=None, onclick=self.__onStart)
+
+        self._btnpause = iconbtn.IconButton(
+            title=u'Pause', tooltipmsg=u'Pause', 
+            icon=geticon(u'pause.ico'), 
+            bgcolor=None, onclick=self.__onPause)
+
+        self._btnstop = iconbtn.IconButton(
+            title=u'Stop', tooltipmsg=u'Stop', 
+            icon=geticon(u'stop.ico'), 
+            bgcolor=None, onclick=self.__onStop)
+
+        self._btnclose = iconbtn.IconButton(
+            title=u'Close', tooltipmsg=u'Close', 
+            icon=geticon(u'close.ico'), 
+            bgcolor=None, onclick=self.__onClose)
+
+        self._buttons.setButtons([self._btnstart, self._btnpause, self._btnstop, None, self._btnclose])
+        row = self._layout.addRow()
+        cell = row.addCell()
+        cell.add(self._buttons, height=1.4, extendright=True)
+        
+        self.msglistener.CREATE = self.__onCreate
+        self.msglistener.SIZE = self.__onSize
+        self.msgproc.CLOSE = self.__onClose
+        self.msglistener.ACTIVATE = self.__onActivate
+        self.msgproc.NCHITTEST = self.__onNCHitTest
+
+    def wndReleased(self):
+        super(PFrame, self).wndReleased()
+        self._layout = None
+        
+    def _updatergn(self):
+        l, t, r, b = self.getClientRect()
+        wnddc = gdi.WindowDC(self)
+
+        dc = wnddc.createCompatibleDC()
+        bmp = dc.createCompatibleBitmap(r-l, b-t)
+        orgbmp = dc.selectObject(bmp)
+        dc.selectObject(self.BORDERPEN)
+       
+        self._rgn = gdi.RoundRectRgn((l, t, r+1, b+1), (5, 5))
+        self.setWindowRgn(self._rgn)
+
+    def __onCreate(self, msg):
+        # redraws only, a burst of changes is drawn once
+        pomotimer.engine.subscribe(self.__onEngine, coalesce=True)
+        pomotimer.cycle.subscribe(self.__onEngine, coalesce=True)
+        self._updatergn()
+        
+    def __onSize(self, msg):
+        self._updatergn()
+        
+    def __onClose(self, msg):
+        self.__hide()
+        
+    def __onActivate(self, msg):
+        if msg.inactive:
+            if self.getHwnd():
+                self.__hide()
+
+    def __onChildNCHitTest(self, msg):
+        return winconst.HITTEST.HTTRANSPARENT
+
+    def __onNCHitTest(self, msg):
+        return winconst.HITTEST.HTCAPTION
+
+    def onWake(self):
+        if self.getWindowStyle().visible:
+            self.__updateDigits()
+            self._chart.ctrl.invalidateRect(None, erase=False)
+
+    def __onEngine(self, source, event):
+        self.__updateDigits()
+        self.__updatebtn()
+        if event == 'phase':
+            self._chart.ctrl.invalidateRect(None, erase=False)
+
+    def __onStart(self, wnd, btn):
+        pomotimer.engine.start()
+            
+    def __onPause(self, wnd, btn):
+        pomotimer.engine.togglepause()
+    
+    def __onStop(self, wnd, btn):
+        pomotimer.engine.stop()
+        
+    def __onClose(self, wnd, btn):
+        self.__hide()
+        
+    
+    def setVisible(self):
+        if self.getHwnd():
+            pomotimer.reloadconfig()
+            self.__updateDigits()
+            self.__updatebtn()
+
+            self.enableWindow(False)
+            self.showWindow(shownoactivate=True)
+            self.setWindowPos(activate=False, placetopmost=True)
+            self.enableWindow(True)
+            self._setVisible = True
+            pomotimer.scheduler.setvisible(True)
+
+    def __hide(self):
+        self.showWindow(hide=True)
+        pomotimer.scheduler.setvisible(False)
+
+    
+    def __updateDigits(self):
+        self._digits.ctrl.setText(pomotimer.displaytext())
+        self._digits.ctrl.setColor(self.DIGITCOLORS[pomotimer.engine.state()])
+        
+    def __updatebtn(self):
+        if not self.getHwnd():
+            return
+
+        btnchanged = False
+        state = pomotimer.engine.state()
+        if state == pomoengine.STOPPED:
+            btnchanged |= self._btnstart.setDisabled(False)
+            btnchanged |= self._btnpause.setDisabled(True)
+            btnchanged |= self._btnpause.pushed(False)
+            btnchanged |= self._btnstop.setDisabled(True)
+        else:
+            btnchanged |= self._btnstart.setDisabled(True)
+            btnchanged |= self._btnpause.setDisabled(False)
+            btnchanged |= self._btnpause.pushed(state == pomoengine.PAUSED)
+            btnchanged |= self._btnstop.setDisabled(False)
+        
+        if btnchanged:
+            self._buttons.layout()
+
+# recent tasks in the tray menu
+TASKMENUSIZE = 8
+# characters of a tray tip, szTip of NOTIFYICONDATA
+TIPLENGTH = 127
+
+class Notify(traynotify.TrayNotify):
+    TIPINTERVAL = 0.5
+
+    __running = False
+    __tip = None
+    __tipthrottle = None
+    __icon = ICON_POMOTIMER
+
+    def onRBtnUp(self, msg):
+        if self.__running:
+            return
+        self.__running = True
+        try:
+            popup = menu.PopupMenu(u"popup")
+            for view in pomochart.VIEWS:
+                popup.append(menu.MenuItem(u"view_" + view, u"%s" % view.capitalize(),
+                    checked=(view == pomotimer.chartview)))
+            # recent tasks, and a new one named in a dialog
+            task = pomotimer.engine.task
+            for id, name in pomotimer.tasks.recentnames(TASKMENUSIZE):
+                popup.append(menu.MenuItem(u"task_%d" % id, name,
+                    checked=(id == task)))
+            popup.append(menu.MenuItem(u"newtask", u"New task..."))
+            if pomotimer.tasks:
+                popup.append(menu.MenuItem(u"task_0", u"No task",
+                    checked=(task == pomotask.NOTASK)))
+            popup.append(menu.MenuItem(u"config", u"Config"))
+            popup.append(menu.MenuItem(u"quit", u"Quit"))
+            popup.create()
+            
+            msg.wnd.setForegroundWindow()
+            pos = msg.wnd.getCursorPos()
+            pos =msg.wnd.clientToScreen(pos)
+            item = popup.trackPopup(pos, msg.wnd, nonotify=True, returncmd=True)
+            
+            if item:
+                if item.menuid == u"quit":
+                    quit()
+                elif item.menuid == u"config":
+                    showConfig()
+                elif item.menuid == u"newtask":
+                    showTask()
+                elif item.menuid.startswith(u"view_"):
+                    pomotimer.chartview = str(item.menuid[5:])
+                    if pomotimer.pframe:
+                        pomotimer.pframe.onWake()
+                elif item.menuid.startswith(u"task_"):
+                    task = int(item.menuid[5:])
+                    pomotimer.settask(pomotimer.tasks.name(task))
+        finally:
+            self.__running = False
+            
+    def onLBtnUp(self, msg):
+        pframe = getFrame()
+        pframe.setForegroundWindow()
+        pframe.setVisible()
+        pframe.setWindowPos(activate=True)
+        
+    def updateIcon(self):
+        icon = STATEICONS[pomotimer.engine.state()]
+        if icon != self.__icon:
+            self.__icon = icon
+            self.setIcon(icon=geticon(icon))
+        
+    def onMouseMove(self, msg):
+        # mouse moves over the icon come in bursts, the tip is updated at
+        # most every TIPINTERVAL and only when its text changed
+        if self.__tipthrottle is None:
+            self.__tipthrottle = pomofmt.Throttle(self.TIPINTERVAL, pomotimer.clock)
+        if not self.__tipthrottle.ready():
+            return
+
+        pomotimer.reloadconfig()
+        state = pomotimer.engine.state()
+        phase = pomotimer.cycle.phase
+        if phase in pomocycle.BREAKS:
+            tip = u"%s - %s" % (BREAKTITLES[phase], pomotimer.displaytext())
+        elif state == pomoengine.STOPPED:
+            tip = APPNAME
+        else:
+            s = pomotimer.displaytext()
+            if state == pomoengine.PAUSED:
+                tip = u"Paused - "+s
+            else:
+                tip = APPNAME + u" - "+s
+        errors = pomotimer.configerrors()
+        if errors:
+            # bad values are ignored, say so until they are fixed
+            tip = (u"%s\nConfig: %s" % (tip, errors[0]))[:TIPLENGTH]
+        if tip != self.__tip:
+            self.__tip = tip
+            self.setIcon(tip=tip)
+
+def getFrame():
+    if pomotimer.pframe is None:
+        pomotimer.pframe = PFrame()
+        pomotimer.pframe.create()
+    return pomotimer.pframe
+
+def showConfig():
+    pomotimer.reloadconfig()
+    ret = ConfigDialog().doModal()
+    if ret:
+        timeout, soundfile = ret
+        pomotimer.setconfig(timeout, soundfile)
+
+def showTask():
+    name = TaskDialog().doModal()
+    if name:
+        pomotimer.settask(name)
+
+def setTimer(msec, f):
+    def onTimer():
+        timer.unRegister()
+        f()
+    timer = wnd.TimerProc(msec, onTimer)
+    return timer
+
+def cancelTimer(timer):
+    timer.unRegister()
+
+def quit():
+    if pomotimer.pframe:
+        pomotimer.pframe.destroy()
+    pomotimer.notifyframe.destroy()
+
+# posted to the notify frame when a control connection is waiting
+WM_APP = 0x8000
+CONTROLMSG = WM_APP + 0x100
+
+def onControl(msg):
+    if pomotimer.control is not None:
+        pomotimer.control.poll()
+
+def onWake():
+    pomotimer.reloadconfig()
+    if pomotimer.pframe:
+        pomotimer.pframe.onWake()
+
+def onStateChange(engine, event):
+    pomotimer.notify.updateIcon()
+
+def onTimeout(engine, event):
+    getFrame().setVisible()
+    pomotimer.sound.play()
+
+def onCycle(cycle, event):
+    if cycle.expired:
+        # break over, time for the next pomodoro
+        getFrame().setVisible()
+        pomotimer.sound.play()
+
+def run(pomoapp):
+    global pomotimer
+    pomotimer = pomoapp
+    
+    pomotimer.pframe = None
+    pomotimer.chartview = 'day'
+    pomotimer.notifyframe = wnd.FrameWnd(style=wnd.FrameWnd.STYLE(visible=False))
+    pomotimer.notify = Notify(pomotimer.notifyframe, geticon(ICON_POMOTIMER), APPNAME)
+    pomotimer.notifyframe.create()
+    
+    pomotimer.scheduler = pomosched.DeadlineScheduler(pomotimer.engine,
+        setTimer, cancelTimer, onWake)
+    # coalesced listeners are flushed from a zero delay timer
+    defer = lambda f: setTimer(0, f)
+    pomotimer.engine.bus.setdeferrer(defer)
+    pomotimer.cycle.bus.setdeferrer(defer)
+    pomotimer.engine.subscribe(onStateChange, coalesce=True)
+    pomotimer.engine.subscribe(onTimeout, events=('timeout',))
+    for source in pomotimer.sources:
+        pomotimer.scheduler.addsource(source)
+    pomotimer.cycle.subscribe(onCycle, events=('phase',))
+    pomotimer.scheduler.reschedule()
+    if pomotimer.control is not None:
+        pomotimer.control.onquit = quit
+        pomotimer.notifyframe.msgproc[CONTROLMSG] = onControl
+        pomotimer.control.asyncselect(pomotimer.notifyframe.getHwnd(), CONTROLMSG)
+    
+    try:
+        app.run()
+    finally:
+        if pomotimer.control is not None:
+            pomotimer.control.onquit = None
+        pomotimer.scheduler.close()
+        pomotimer.engine.unsubscribe(onStateChange)
+        pomotimer.engine.unsubscribe(onTimeout)
+        pomotimer.cycle.unsubscribe(onCycle)
+        pomotimer.engine.bus.setdeferrer(None)
+        pomotimer.cycle.bus.setdeferrer(None)
@@ -0,0 +1,277 @@
+import bisect, datetime, itertools
+from array import array
+import pomoengine, pomostore
+from pomostats import _importnumpy, NUMPY_MIN
+
+# Queries over the finished sessions of a pomostore.SessionStore: a start
+# time range, filtered on duration and tags, in start order, streamed or a
+# page at a time. Sessions are tagged with their task ID, see pomotask.
+#
+# The primary index is the store's rows sorted by start time, so a time
+# range is two bisects. Durations and tags have secondary indexes, a query
+# whose duration or tag matches far fewer sessions than its time range
+# reads the candidates from there instead of walking the range. Indexes
+# are built on the first query and kept up to date from the store as it
+# grows, the duration index only once a query needs it.
+#
+# Pages are continued with a cursor naming the last session returned, so
+# paging stays correct while sessions are added.
+
+ROWCODE = 'l'
+PAGESIZE = 50
+
+# a secondary index is read when it has fewer candidates than the time
+# range by this factor
+SELECTIVITY = 8
+
+# candidates are filtered with numpy, if available, from this many
+NUMPY_CANDIDATES = 4096
+
+def _usec(t):
+    if t is None or isinstance(t, (int, float)):
+        return t
+    if not isinstance(t, datetime.datetime):
+        t = datetime.datetime(t.year, t.month, t.day)
+    return pomoengine.dt2usec(t)
+
+def encodecursor(started, row):
+    return '%d.%d' % (started, row)
+
+def decodecursor(cursor):
+    try:
+        started, row = cursor.split('.')
+        return int(started), int(row)
+    except (AttributeError, ValueError):
+        raise ValueError('bad cursor: %r' % (cursor,))
+
+def _contains(rows, row):
+    # rows is sorted
+    pos = bisect.bisect_left(rows, row)
+    return pos < len(rows) and rows[pos] == row
+
+
+class QueryIndex:
+    def __init__(self, store):
+        self.store = store
+        self.starts = array(pomostore.TYPECODE)
+        self.rows = array(ROWCODE)
+        self.tags = {}
+        self._durations = None
+        self._durrows = None
+        self._indexed = 0
+        self._open = []
+
+    def refresh(self):
+        # indexes sessions finished since the last call
+        store = self.store
+        store.settle()
+        stopped = store.stoppedusec
+        rows = self._open
+        self._open = []
+        if not self._indexed and len(store) >= NUMPY_MIN and _importnumpy():
+            self.__buildnumpy()
+        else:
+            rows.extend(range(self._indexed, len(store)))
+        for row in rows:
+            if stopped[row] < 0:
+                self._open.append(row)
+            else:
+                self.__insert(row)
+        self._indexed = len(store)
+
+    def __buildnumpy(self):
+        numpy = _importnumpy()
+        store = self.store
+        dtype = numpy.int64 if pomostore.TYPECODE == 'q' else numpy.float64
+        started = numpy.frombuffer(store.startedusec, dtype=dtype)
+        stopped = numpy.frombuffer(store.stoppedusec, dtype=dtype)
+        self._open.extend(int(row) for row in numpy.flatnonzero(stopped < 0))
+        rowtype = 'i%d' % array(ROWCODE).itemsize
+        done = numpy.flatnonzero(stopped >= 0).astype(rowtype)
+        rows = done[numpy.argsort(started[done], kind='mergesort')]
+        self.starts = array(pomostore.TYPECODE, started[rows].tobytes())
+        self.rows = array(ROWCODE, rows.tobytes())
+
+        tasks = numpy.frombuffer(store.tasks, dtype='i%d' % store.tasks.itemsize)[done]
+        tagged = numpy.flatnonzero(tasks)
+        if len(tagged):
+            # rows of each task in row order
+            order = tagged[numpy.argsort(tasks[tagged], kind='mergesort')]
+            keys = tasks[order]
+            bounds = numpy.flatnonzero(numpy.concatenate(([True], keys[1:] != keys[:-1])))
+            for task, rows in zip(keys[bounds], numpy.split(done[order], bounds[1:])):
+                self.tags[int(task)] = array(ROWCODE, rows.tobytes())
+
+    def __insert(self, row):
+        store = self.store
+        start = store.startedusec[row]
+        starts = self.starts
+        if not starts or start >= starts[-1]:
+            starts.append(start)
+            self.rows.append(row)
+        else:
+            pos = bisect.bisect_right(starts, start)
+            starts.insert(pos, start)
+            self.rows.insert(pos, row)
+        task = store.tasks[row]
+        if task:
+            self.addtag(row, task)
+        if self._durations is not None:
+            elapsens = store.elapsens[row]
+            pos = bisect.bisect_right(self._durations, elapsens)
+            self._durations.insert(pos, elapsens)
+            self._durrows.insert(pos, row)
+
+    def __durationindex(self):
+        if self._durations is None:
+            elapsens = self.store.elapsens
+            numpy = len(self.rows) >= NUMPY_MIN and _importnumpy()
+            if numpy:
+                dtype = numpy.int64 if pomostore.TYPECODE == 'q' else numpy.float64
+                rows = numpy.frombuffer(self.rows, dtype='i%d' % self.rows.itemsize)
+                values = numpy.frombuffer(elapsens, dtype=dtype)[rows]
+                order = numpy.argsort(values, kind='mergesort')
+                self._durations = array(pomostore.TYPECODE, values[order].tobytes())
+                self._durrows = array(ROWCODE, rows[order].tobytes())
+            else:
+                rows = sorted(self.rows, key=elapsens.__getitem__)
+                self._durations = array(pomostore.TYPECODE, (elapsens[row] for row in rows))
+                self._durrows = array(ROWCODE, rows)
+        return self._durations, self._durrows
+
+    def addtag(self, row, tag):
+        rows = self.tags.get(tag)
+        if rows is None:
+            rows = self.tags[tag] = array(ROWCODE)
+        if not rows or row > rows[-1]:
+            rows.append(row)
+        elif not _contains(rows, row):
+            rows.insert(bisect.bisect_left(rows, row), row)
+
+    def removetag(self, row, tag):
+        rows = self.tags.get(tag)
+        if rows is not None and _contains(rows, row):
+            del rows[bisect.bisect_left(rows, row)]
+
+    def __position(self, started, row):
+        # position in the primary index right after (started, row)
+        starts, rows = self.starts, self.rows
+        pos = bisect.bisect_left(starts, started)
+        while pos < len(starts) and starts[pos] == started and rows[pos] <= row:
+            pos += 1
+        return pos
+
+    def iterrows(self, first=None, last=None, minsec=None, maxsec=None,
+            tag=None, after=None):
+        # yields rows of the sessions started in [first, last) usec that
+        # ran for minsec..maxsec seconds and have tag, in start order. after
+        # is a (started, row) key to continue after.
+        self.refresh()
+        store = self.store
+        starts = self.starts
+        lo = 0 if first is None else bisect.bisect_left(starts, first)
+        hi = len(starts) if last is None else bisect.bisect_left(starts, last)
+        if after is not None:
+            lo = max(lo, self.__position(*after))
+        if lo >= hi:
+            return
+
+        minns = None if minsec is None else minsec*pomoengine.NSEC
+        maxns = None if maxsec is None else maxsec*pomoengine.NSEC
+        tagged = None
+        if tag is not None:
+            tagged = self.tags.get(tag)
+            if not tagged:
+                return
+
+        # the smallest source of candidates
+        candidates = None
+        if tagged is not None and len(tagged)*SELECTIVITY < hi-lo:
+            candidates = tagged
+        if (minns is not None or maxns is not None) and hi-lo > NUMPY_MIN:
+            durations, durrows = self.__durationindex()
+            dlo = 0 if minns is None else bisect.bisect_left(durations, minns)
+            dhi = len(durations) if maxns is None else bisect.bisect_right(durations, maxns)
+            if (dhi-dlo)*SELECTIVITY < min(hi-lo, len(candidates or starts)):
+                candidates = durrows[dlo:dhi]
+
+        elapsens = store.elapsens
+        def match(row):
+            value = elapsens[row]
+            if minns is not None and value < minns:
+                return False
+            if maxns is not None and value > maxns:
+                return False
+            return tagged is None or _contains(tagged, row)
+
+        if candidates is None:
+            rows = self.rows
+            for pos in range(lo, hi):
+                row = rows[pos]
+                if match(row):
+                    yield row
+            return
+
+        startlo, starthi = starts[lo], starts[hi-1]
+        if len(candidates) >= NUMPY_CANDIDATES and _importnumpy():
+            keys = self.__selectnumpy(candidates, startlo, starthi, minns, maxns,
+                tagged)
+        else:
+            startedusec, stoppedusec = store.startedusec, store.stoppedusec
+            keys = []
+            for row in candidates:
+                started = startedusec[row]
+                if (startlo <= started <= starthi and stoppedusec[row] >= 0
+                        and match(row)):
+                    keys.append((started, row))
+            keys.sort()
+        if after is not None:
+            keys = keys[bisect.bisect_right(keys, after):]
+        for started, row in keys:
+            yield row
+
+    def __selectnumpy(self, candidates, startlo, starthi, minns, maxns, tagged):
+        # sorted (started, row) of the candidates that match, vectorized
+        numpy = _importnumpy()
+        store = self.store
+        dtype = numpy.int64 if pomostore.TYPECODE == 'q' else numpy.float64
+        rowtype = 'i%d' % candidates.itemsize
+        rows = numpy.frombuffer(candidates, dtype=rowtype)
+        started = numpy.frombuffer(store.startedusec, dtype=dtype)[rows]
+        mask = (started >= startlo) & (started <= starthi)
+        mask &= numpy.frombuffer(store.stoppedusec, dtype=dtype)[rows] >= 0
+        if minns is not None or maxns is not None:
+            elapsens = numpy.frombuffer(store.elapsens, dtype=dtype)[rows]
+            if minns is not None:
+                mask &= elapsens >= minns
+            if maxns is not None:
+                mask &= elapsens <= maxns
+        if tagged is not None and tagged is not candidates:
+            tagrows = numpy.frombuffer(tagged, dtype=rowtype)
+            pos = numpy.minimum(numpy.searchsorted(tagrows, rows), len(tagrows)-1)
+            mask &= tagrows[pos] == rows
+        rows, started = rows[mask], started[mask]
+        order = numpy.lexsort((rows, started))
+        return list(zip(started[order].tolist(), rows[order].tolist()))
+
+    def iterquery(self, first=None, last=None, minsec=None, maxsec=None,
+            tag=None, cursor=None):
+        # yields Pomodoros. first and last are datetimes, dates or usec.
+        after = None if cursor is None else decodecursor(cursor)
+        for row in self.iterrows(_usec(first), _usec(last), minsec, maxsec,
+                tag, after):
+            yield self.store[row]
+
+    def query(self, first=None, last=None, minsec=None, maxsec=None,
+            tag=None, cursor=None, limit=PAGESIZE):
+        # returns ([Pomodoro], cursor of the next page or None)
+        after = None if cursor is None else decodecursor(cursor)
+        rows = list(itertools.islice(self.iterrows(_usec(first), _usec(last),
+            minsec, maxsec, tag, after), limit+1))
+        more = len(rows) > limit
+        rows = rows[:limit]
+        next = None
+        if more and rows:
+            row = rows[-1]
+            next = encodecursor(int(self.store.startedusec[row]), row)
+        return [self.store[row] for row in rows], next
@@ -0,0 +1,150 @@
+import datetime
+import pomoengine, pomobus
+from pomometrics import metrics
+
+def _seconds(delta):
+    return delta.days*86400 + delta.seconds + delta.microseconds/1000000.0
+
+def nextdeadline(engine, visible, now=None, sources=()):
+    # seconds until something observable changes, or None if nothing will
+    # change until the user does something.
+    if now is None:
+        now = datetime.datetime.now()
+
+    deadlines = []
+    for source in sources:
+        deadline = source.getdeadlinein()
+        if deadline is not None:
+            deadlines.append(deadline)
+
+    timeoutin = engine.gettimeoutin()
+    if timeoutin is not None:
+        deadlines.append(timeoutin)
+
+    if visible:
+        tickin = engine.getnexttickin()
+        if tickin is not None:
+            deadlines.append(tickin)
+
+        tomorrow = now.replace(hour=0, minute=0, second=0, microsecond=0) + \
+            datetime.timedelta(days=1)
+        deadlines.append(_seconds(tomorrow - now))
+
+    if not deadlines:
+        return None
+    return max(min(deadlines), 0)
+
+
+class Periodic:
+    # Deadline source calling f() every interval seconds while active()
+    # is true, for work that has no deadline of its own. Inactive, it
+    # doesn't wake the scheduler at all; call restart() when it may have
+    # become active.
+
+    def __init__(self, clock, interval, f, active=None):
+        self.clock = clock
+        self.intervalns = int(interval*pomoengine.NSEC)
+        self.f = f
+        self.active = active
+        self.bus = pomobus.EventBus()
+        self._due = clock.monotonic_ns() + self.intervalns
+
+    def subscribe(self, listener, **kw):
+        return self.bus.subscribe(listener, **kw)
+
+    def unsubscribe(self, listener):
+        self.bus.unsubscribe(listener)
+
+    def restart(self):
+        self._due = self.clock.monotonic_ns() + self.intervalns
+        self.bus.publish(self, 'restart')
+
+    def getdeadlinein(self):
+        if self.active is not None and not self.active():
+            return None
+        rest = self._due - self.clock.monotonic_ns()
+        return float(max(rest, 0)) / pomoengine.NSEC
+
+    def check(self):
+        now = self.clock.monotonic_ns()
+        if now < self._due:
+            return False
+        self._due = now + self.intervalns
+        if self.active is not None and not self.active():
+            return False
+        self.f()
+        return True
+
+
+class DeadlineScheduler:
+    # Arms a single one-shot timer for the next deadline instead of polling.
+    #
+    # settimer(msec, callback) must arm a one-shot timer and return a handle,
+    # canceltimer(handle) must disarm it. onwake() is called on every wakeup
+    # while visible so the front end can redraw.
+    #
+    # Other deadline sources can be added with addsource(). They must have
+    # getdeadlinein() returning seconds or None, check() called on every
+    # wakeup, and subscribe()/unsubscribe() like the engine.
+
+    _handle = None
+    _visible = False
+
+    def __init__(self, engine, settimer, canceltimer, onwake=None):
+        self.engine = engine
+        self._settimer = settimer
+        self._canceltimer = canceltimer
+        self._onwake = onwake
+        self._sources = []
+        engine.subscribe(self.__onEngine)
+
+    def close(self):
+        self.engine.unsubscribe(self.__onEngine)
+        for source in self._sources:
+            source.unsubscribe(self.__onEngine)
+        self._sources = []
+        self.cancel()
+
+    def addsource(self, source):
+        self._sources.append(source)
+        source.subscribe(self.__onEngine)
+        self.reschedule()
+
+    def __onEngine(self, engine, event):
+        self.reschedule()
+
+    def setvisible(self, visible):
+        visible = bool(visible)
+        if visible != self._visible:
+            self._visible = visible
+            self.reschedule()
+
+    def cancel(self):
+        if self._handle is not None:
+            self._canceltimer(self._handle)
+            self._handle = None
+
+    def reschedule(self):
+        self.cancel()
+        delay = nextdeadline(self.engine, self._visible, self.engine.clock.now(),
+            self._sources)
+        if delay is not None:
+            # round up so we never wake just before the deadline
+            msec = int(delay*1000) + 1
+            self._due = self.engine.clock.monotonic_ns() + msec*1000000
+            self._handle = self._settimer(msec, self.__onTimer)
+
+    def __onTimer(self):
+        t = metrics.start()
+        if t is not None:
+            metrics.observens('tick_lateness',
+                max(self.engine.clock.monotonic_ns() - self._due, 0))
+        self._handle = None
+        self.engine.check()
+        for source in self._sources:
+            source.check()
+        if self._visible and self._onwake:
+            self._onwake()
+        if self._handle is None:
+            self.reschedule()
+        metrics.observe('wake', t)
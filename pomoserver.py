@@ -0,0 +1,185 @@
+import argparse, asyncio, heapq, itertools, json
+import pomoengine
+
+# Shared timer service, Python 3 only. Each named timer is a PomoEngine of
+# its own; timeouts of all timers are kept in one heap and a single loop
+# callback is armed for the earliest one.
+#
+# Clients send one JSON object per line and get one JSON object back:
+#
+#   {"cmd": "start", "timer": "alice"}
+#   {"cmd": "timeout", "timer": "alice", "minutes": 50}
+#   {"cmd": "status", "timer": "alice"}
+#   {"cmd": "watch"}    -- then receives {"event": "timeout", ...} lines
+
+DEFAULT_PORT = 8425
+COMMANDS = ('start', 'pause', 'resume', 'stop', 'status', 'timeout', 'list')
+# timeouts are 0 < minutes <= MAXMINUTES
+MAXMINUTES = 24*60
+
+
+class TimerServer:
+    def __init__(self, timeout=25, loop=None):
+        self.timeout = timeout
+        self.timers = {}
+        self._loop = loop
+        self._heap = []
+        self._seq = itertools.count()
+        self._versions = {}
+        self._handle = None
+        self._armedat = None
+        self._watchers = set()
+        self.timeouts = 0
+
+    @property
+    def loop(self):
+        if self._loop is None:
+            self._loop = asyncio.get_event_loop()
+        return self._loop
+
+    def gettimer(self, name, create=False):
+        engine = self.timers.get(name)
+        if engine is None and create:
+            engine = self.timers[name] = pomoengine.PomoEngine(self.timeout)
+        return engine
+
+    # deadline heap: entries are (when, seq, name, version). A timer's
+    # version changes whenever its deadline does, older entries are stale
+    # and dropped when they reach the top.
+
+    def _schedule(self, name, engine):
+        version = self._versions.get(name, 0) + 1
+        self._versions[name] = version
+        timeoutin = engine.gettimeoutin()
+        if timeoutin is None:
+            return
+        when = self.loop.time() + timeoutin
+        heapq.heappush(self._heap, (when, next(self._seq), name, version))
+        if self._armedat is None or when < self._armedat:
+            self._arm()
+
+    def _arm(self):
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        self._armedat = None
+        if self._heap:
+            self._armedat = self._heap[0][0]
+            self._handle = self.loop.call_at(self._armedat, self._ontimer)
+
+    def _ontimer(self):
+        self._handle = None
+        now = self.loop.time()
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            when, seq, name, version = heapq.heappop(heap)
+            if self._versions.get(name) != version:
+                continue
+            engine = self.timers[name]
+            if engine.check():
+                self.timeouts += 1
+                self._notify(name, engine)
+            elif engine.gettimeoutin() is not None:
+                # woke a little early
+                self._schedule(name, engine)
+        self._arm()
+
+    def _notify(self, name, engine):
+        if not self._watchers:
+            return
+        line = json.dumps({'event': 'timeout', 'timer': name,
+            'elapsed': engine.getdisplaysec()}).encode('utf-8') + b'\n'
+        for writer in list(self._watchers):
+            writer.write(line)
+
+    def status(self, name, engine):
+        return {'ok': True, 'timer': name, 'state': engine.state(),
+            'elapsed': engine.getdisplaysec(), 'timeout': engine.timeout}
+
+    def handle(self, req):
+        cmd = req.get('cmd')
+        if cmd not in COMMANDS:
+            return {'ok': False, 'error': 'unknown command: %r' % (cmd,)}
+        if cmd == 'list':
+            return {'ok': True, 'timers': sorted(self.timers)}
+
+        name = req.get('timer')
+        if not name:
+            return {'ok': False, 'error': 'timer name required'}
+        if not isinstance(name, str):
+            # timers are sorted and hashed by name
+            return {'ok': False, 'error': 'timer name must be a string: %r' % (name,)}
+        if cmd == 'timeout':
+            try:
+                minutes = float(req['minutes'])
+            except (KeyError, TypeError, ValueError):
+                return {'ok': False, 'error': 'minutes required'}
+            # also false for nan
+            if not 0 < minutes <= MAXMINUTES:
+                return {'ok': False, 'error': 'minutes must be in (0, %d]: %r' % (
+                    MAXMINUTES, req['minutes'])}
+        engine = self.gettimer(name, create=(cmd in ('start', 'timeout')))
+        if engine is None:
+            return {'ok': False, 'error': 'no such timer: %s' % name}
+
+        if cmd == 'timeout':
+            engine.settimeout(minutes)
+        elif cmd != 'status':
+            getattr(engine, cmd)()
+
+        if cmd != 'status':
+            self._schedule(name, engine)
+        return self.status(name, engine)
+
+    async def _client(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    req = json.loads(line.decode('utf-8'))
+                    if not isinstance(req, dict):
+                        raise ValueError(req)
+                except ValueError:
+                    resp = {'ok': False, 'error': 'invalid request'}
+                else:
+                    if req.get('cmd') == 'watch':
+                        self._watchers.add(writer)
+                        resp = {'ok': True}
+                    else:
+                        resp = self.handle(req)
+                writer.write(json.dumps(resp).encode('utf-8') + b'\n')
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self._watchers.discard(writer)
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=DEFAULT_PORT, path=None):
+        if path:
+            server = await asyncio.start_unix_server(self._client, path=path)
+        else:
+            server = await asyncio.start_server(self._client, host, port)
+        async with server:
+            await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='PomoTimer timer server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--unix', metavar='PATH', help='listen on a unix socket')
+    parser.add_argument('--minutes', type=float, default=25,
+        help='default timeout of new timers')
+    args = parser.parse_args(argv)
+
+    server = TimerServer(args.minutes)
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+import datetime, heapq, itertools
+import pomoengine, pomolog, pomosched
+
+# Simulated time for tests and stress runs. SimClock stands in for
+# pomoengine.SystemClock and also provides the settimer/canceltimer pair
+# the DeadlineScheduler arms, so an engine and its scheduler can be run
+# through weeks of activity without waiting.
+
+# a Monday
+START = datetime.datetime(2020, 1, 6)
+
+class SimClock:
+    # Wall clock and monotonic time move together, and only when advanced.
+    # Timers due on the way fire in order, each seeing the clock at its
+    # deadline.
+
+    def __init__(self, start=START):
+        self.ns = 0
+        self.startusec = pomoengine.dt2usec(start)
+        self._timers = []
+        self._seq = itertools.count()
+
+    def monotonic_ns(self):
+        return self.ns
+
+    def nowusec(self):
+        return self.startusec + self.ns // 1000
+
+    def now(self):
+        return pomoengine.usec2dt(self.nowusec())
+
+    def settimer(self, msec, f):
+        entry = [self.ns + int(msec)*1000000, next(self._seq), f]
+        heapq.heappush(self._timers, entry)
+        return entry
+
+    def canceltimer(self, entry):
+        entry[2] = None
+
+    def advance(self, sec):
+        self.advancens(int(sec*pomoengine.NSEC))
+
+    def advanceto(self, usec):
+        self.advancens((usec - self.nowusec())*1000)
+
+    def advancens(self, ns):
+        target = self.ns + max(ns, 0)
+        timers = self._timers
+        while timers and timers[0][0] <= target:
+            when, seq, f = heapq.heappop(timers)
+            if f is not None:
+                self.ns = max(self.ns, when)
+                f()
+        self.ns = target
+
+
+class Simulation:
+    # An engine and its scheduler on a SimClock. Timeouts are detected by
+    # the scheduler exactly as in the real front ends.
+
+    def __init__(self, timeout=25, hist=None, clock=None, visible=False):
+        self.clock = clock or SimClock()
+        self.engine = pomoengine.PomoEngine(timeout, hist, self.clock)
+        self.scheduler = pomosched.DeadlineScheduler(self.engine,
+            self.clock.settimer, self.clock.canceltimer)
+        self.scheduler.setvisible(visible)
+        self.scheduler.reschedule()
+
+    def close(self):
+        self.scheduler.close()
+
+    def workday(self, pomodoros=10, starthour=9, breakmin=5, pausemin=0):
+        # runs pomodoros back to back from starthour, each stopped at its
+        # timeout, and the clock on to the next midnight
+        engine, clock = self.engine, self.clock
+        day = clock.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        clock.advanceto(pomoengine.dt2usec(day + datetime.timedelta(hours=starthour)))
+
+        def ontimeout(engine, event):
+            if event == 'timeout':
+                engine.stop()
+        engine.subscribe(ontimeout)
+        try:
+            for i in range(pomodoros):
+                engine.start()
+                if pausemin:
+                    clock.advance(engine.timeout*30)
+                    engine.pause()
+                    clock.advance(pausemin*60)
+                    engine.resume()
+                clock.advance(engine.gettimeoutin() or 0)
+                clock.advance(breakmin*60)
+        finally:
+            engine.unsubscribe(ontimeout)
+        clock.advanceto(pomoengine.dt2usec(day + datetime.timedelta(days=1)))
+
+    def run(self, days, **kw):
+        for i in range(days):
+            self.workday(**kw)
+
+
+def replay(records, engine, clock):
+    # drives engine with the records of a session log (pomolog.iterrecords),
+    # moving clock to the time of each one first. Imported sessions aren't
+    # engine activity and are skipped.
+    actions = {'S': engine.start, 'P': engine.pause, 'R': engine.resume,
+               'E': engine.stop}
+    for kind, values in records:
+        action = actions.get(kind)
+        if action is None:
+            continue
+        clock.advanceto(values[0])
+        action()
+
+def replaylog(filename, engine, clock):
+    with open(filename, 'rb') as f:
+        replay(pomolog.iterrecords(f), engine, clock)
@@ -0,0 +1,50 @@
+import marshal, os, sys
+import pomostore
+from pomoconfig import _replace
+
+# Snapshot of the history and what is derived from it (session columns,
+# task table, IntervalIndex, Occupancy and Stats) as of an offset in the
+# session log, so that startup only replays the log written after it.
+# marshal keeps loading fast; the snapshot is only a cache and anything
+# that doesn't match the log, the Python version or the array layout is
+# dropped in favour of a full replay.
+#
+# The offset must be a record boundary with no session open, since the
+# parts only hold finished sessions. The last MARKSIZE bytes of the log
+# before the offset are kept to tell a log that was replaced or truncated.
+
+VERSION = 1
+MARKSIZE = 64
+# parts in the order of the tuple passed to save()
+PARTS = ('store', 'tasks', 'index', 'occupancy', 'stats')
+
+def _key():
+    return (VERSION, pomostore.TYPECODE, pomostore.TASKCODE) + tuple(
+        sys.version_info[:2])
+
+def _mark(logfilename, offset):
+    with open(logfilename, 'rb') as f:
+        start = max(offset - MARKSIZE, 0)
+        f.seek(start)
+        return f.read(offset - start)
+
+def save(filename, logfilename, offset, parts):
+    # parts is a tuple of getstate() results, see PARTS
+    data = marshal.dumps((_key(), offset, _mark(logfilename, offset), parts), 2)
+    tmpname = filename + u'.tmp'
+    with open(tmpname, 'wb') as f:
+        f.write(data)
+    _replace(tmpname, filename)
+
+def load(filename, logfilename):
+    # (offset, parts), or None to replay the whole log
+    try:
+        with open(filename, 'rb') as f:
+            key, offset, mark, parts = marshal.loads(f.read())
+        if key != _key() or len(parts) != len(PARTS):
+            return None
+        if os.path.getsize(logfilename) < offset or _mark(logfilename, offset) != mark:
+            return None
+    except (IOError, OSError, EOFError, ValueError, TypeError):
+        return None
+    return offset, parts
@@ -0,0 +1,156 @@
+import io, os, sys, threading, wave
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+# Timeout sound. The configured .wav is read into memory and validated
+# when the config is applied, again whenever its mtime or size changes,
+# and played from memory by a worker thread through a pluggable sink, so
+# notifying never touches the disk or blocks the caller. A copy rather
+# than a mapping, which would keep the file locked on Windows and fault
+# if it was truncated underneath.
+
+class SoundError(Exception):
+    pass
+
+
+def getstat(filename):
+    # what load() compares to tell an edited file, None if there is none
+    try:
+        st = os.stat(filename)
+    except OSError:
+        return None
+    return st.st_mtime, st.st_size
+
+
+class SoundBuffer:
+    def __init__(self, filename):
+        self.filename = filename
+        try:
+            with open(filename, 'rb') as f:
+                self.data = f.read()
+        except (IOError, OSError) as e:
+            raise SoundError('%s: %s' % (filename, e))
+
+        # checks the bytes that will be played
+        try:
+            w = wave.open(io.BytesIO(self.data), 'rb')
+            try:
+                self.params = w.getparams()
+            finally:
+                w.close()
+        except (EOFError, wave.Error):
+            raise SoundError('%s: not a valid .wav file' % filename)
+
+    def close(self):
+        self.data = None
+
+
+class NullSink:
+    # discards sounds, counting them
+    plays = 0
+
+    def play(self, buf):
+        self.plays += 1
+
+
+class FileSink:
+    # writes every played sound to a file, for testing
+    def __init__(self, filename):
+        self.filename = filename
+
+    def play(self, buf):
+        with open(self.filename, 'wb') as f:
+            f.write(buf.data)
+
+
+class WinsoundSink:
+    def __init__(self):
+        import winsound
+        self._winsound = winsound
+
+    def play(self, buf):
+        # SND_MEMORY can't be asynchronous, we are on a worker thread anyway
+        self._winsound.PlaySound(buf.data, self._winsound.SND_MEMORY)
+
+def defaultsink():
+    if sys.platform == 'win32':
+        return WinsoundSink()
+    return NullSink()
+
+
+class Notifier:
+    buffer = None
+    error = None
+    _thread = None
+    # (filename, getstat()) of the last load
+    _loaded = None
+
+    def __init__(self, sink=None):
+        if sink is None:
+            sink = defaultsink()
+        self.sink = sink
+        self._queue = queue.Queue()
+        self._busy = False
+
+    def load(self, filename):
+        # preloads filename, or unloads with an empty filename. A file that
+        # can't be played leaves no sound loaded and the reason in error.
+        # Nothing is read again unless the name or the file changed.
+        loaded = (filename, getstat(filename) if filename else None)
+        if loaded == self._loaded:
+            return
+        self._loaded = loaded
+        self.error = None
+        old, self.buffer = self.buffer, None
+        if filename:
+            try:
+                self.buffer = SoundBuffer(filename)
+            except SoundError as e:
+                self.error = str(e)
+        if old is not None:
+            if self._thread is None:
+                old.close()
+            else:
+                # released by the worker once it's done with it
+                self._queue.put((None, old))
+
+    def play(self):
+        # queues the loaded sound. Ignored while the previous one is still
+        # playing, a burst of notifications plays once.
+        if self.buffer is None or self._busy:
+            return False
+        self._busy = True
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.__worker, name='pomosound')
+            self._thread.daemon = True
+            self._thread.start()
+        self._queue.put((self.sink, self.buffer))
+        return True
+
+    def close(self):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        if self.buffer is not None:
+            self.buffer.close()
+            self.buffer = None
+
+    def __worker(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            sink, buf = item
+            if sink is None:
+                buf.close()
+                continue
+            try:
+                sink.play(buf)
+            except Exception as e:
+                self.error = '%s: %s' % (buf.filename, e)
+            finally:
+                self._busy = False
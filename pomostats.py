@@ -0,0 +1,177 @@
+import datetime
+import pomoengine, pomostore
+
+# numpy is optional and only imported for histories large enough to pay
+# for its import time, see Stats.extend
+numpy = None
+NUMPY_MIN = 20000
+
+def _importnumpy():
+    global numpy
+    if numpy is None:
+        try:
+            import numpy
+        except ImportError:
+            numpy = False
+    return numpy
+
+# Rollups of finished sessions by day, by week, by hour of day and by task.
+# Each session counts towards the day/hour it started in. The rollups are built
+# once from the session store (vectorized when numpy is available) and then
+# updated as pomodoros stop, so queries never rescan the history.
+
+DAYUSEC = 86400*1000000
+HOURUSEC = 3600*1000000
+
+def dayno(day):
+    return (day - pomoengine.EPOCH.date()).days
+
+def noday(n):
+    return pomoengine.EPOCH.date() + datetime.timedelta(days=n)
+
+def weekno(n):
+    # 1970-01-01 was a Thursday, weeks start on Monday
+    return (n+3) // 7
+
+def weekmonday(week):
+    return noday(week*7-3)
+
+def _groupsum(keys, values):
+    # distinct keys, number of items and int64 sum of values per key
+    order = numpy.argsort(keys, kind='mergesort')
+    keys = keys[order]
+    values = values[order]
+    starts = numpy.flatnonzero(numpy.concatenate(([True], keys[1:] != keys[:-1])))
+    counts = numpy.diff(numpy.append(starts, len(keys)))
+    return keys[starts], counts, numpy.add.reduceat(values, starts)
+
+
+class Stats:
+    _engine = None
+
+    def __init__(self):
+        self.days = {}
+        self.weeks = {}
+        self.hours = [[0, 0] for i in range(24)]
+        self.tasks = {}
+        self.count = 0
+        self.focusns = 0
+
+    def attach(self, engine):
+        self._engine = engine
+        engine.subscribe(self.__onEngine)
+
+    def detach(self):
+        if self._engine:
+            self._engine.unsubscribe(self.__onEngine)
+            self._engine = None
+
+    def __onEngine(self, engine, event):
+        if event == 'stop':
+            pomo = engine.cur
+            self.add(pomo.startedusec, pomo.elapsens, task=pomo.task)
+
+    def add(self, startedusec, elapsens, count=1, task=0):
+        day = startedusec // DAYUSEC
+        hour = (startedusec % DAYUSEC) // HOURUSEC
+        for table, key in ((self.days, day), (self.weeks, weekno(day)),
+                (self.tasks, task)):
+            rec = table.get(key)
+            if rec is None:
+                rec = table[key] = [0, 0]
+            rec[0] += count
+            rec[1] += elapsens
+        self.hours[hour][0] += count
+        self.hours[hour][1] += elapsens
+        self.count += count
+        self.focusns += elapsens
+
+    def getstate(self):
+        return (self.days, self.weeks, self.hours, self.tasks, self.count,
+            self.focusns)
+
+    def setstate(self, state):
+        days, weeks, hours, tasks, self.count, self.focusns = state
+        # lists, the rollups are updated in place
+        self.days = dict((key, list(rec)) for key, rec in days.items())
+        self.weeks = dict((key, list(rec)) for key, rec in weeks.items())
+        self.tasks = dict((key, list(rec)) for key, rec in tasks.items())
+        self.hours = [list(rec) for rec in hours]
+
+    def extend(self, store, first=0):
+        # bulk load finished sessions of a SessionStore from row first on
+        store.settle()
+        if len(store) - first >= NUMPY_MIN and _importnumpy():
+            self.__extendnumpy(store, first)
+        else:
+            for pomo in store.since(first):
+                if pomo.stoppedusec is not None:
+                    self.add(pomo.startedusec, pomo.elapsens, task=pomo.task)
+
+    def __extendnumpy(self, store, first):
+        dtype = numpy.int64 if pomostore.TYPECODE == 'q' else numpy.float64
+        started = numpy.frombuffer(store.startedusec, dtype=dtype)[first:]
+        stopped = numpy.frombuffer(store.stoppedusec, dtype=dtype)[first:]
+        elapsens = numpy.frombuffer(store.elapsens, dtype=dtype)[first:]
+
+        tasks = numpy.frombuffer(store.tasks, dtype='i%d' % store.tasks.itemsize)[first:]
+
+        done = stopped >= 0
+        started = started[done].astype(numpy.int64)
+        elapsens = elapsens[done].astype(numpy.int64)
+        tasks = tasks[done]
+        if not len(started):
+            return
+
+        days = started // DAYUSEC
+        hours = (started % DAYUSEC) // HOURUSEC
+        for table, keys in ((self.days, days), (self.weeks, (days+3) // 7),
+                (self.tasks, tasks)):
+            for key, count, ns in zip(*_groupsum(keys, elapsens)):
+                rec = table.setdefault(int(key), [0, 0])
+                rec[0] += int(count)
+                rec[1] += int(ns)
+
+        for hour, count, ns in zip(*_groupsum(hours, elapsens)):
+            self.hours[hour][0] += int(count)
+            self.hours[hour][1] += int(ns)
+
+        self.count += len(started)
+        self.focusns += int(elapsens.sum())
+
+    def perday(self, first, last):
+        # [(date, count, focused seconds)] for first..last inclusive
+        ret = []
+        for n in range(dayno(first), dayno(last)+1):
+            count, ns = self.days.get(n, (0, 0))
+            ret.append((noday(n), count, ns // pomoengine.NSEC))
+        return ret
+
+    def perweek(self, first, last):
+        # [(monday, count, focused seconds)] for weeks containing first..last
+        ret = []
+        for n in range(weekno(dayno(first)), weekno(dayno(last))+1):
+            count, ns = self.weeks.get(n, (0, 0))
+            ret.append((weekmonday(n), count, ns // pomoengine.NSEC))
+        return ret
+
+    def perhour(self):
+        # [(hour, count, focused seconds)] for hours of day 0..23
+        return [(hour, count, ns // pomoengine.NSEC)
+            for hour, (count, ns) in enumerate(self.hours)]
+
+    def pertask(self):
+        # [(task, count, focused seconds)] of tasks worked on, most time
+        # first. Task 0 is sessions without one.
+        ret = [(task, count, ns // pomoengine.NSEC)
+            for task, (count, ns) in self.tasks.items()]
+        ret.sort(key=lambda r: (-r[2], r[0]))
+        return ret
+
+    def task(self, task):
+        # (count, focused seconds) of task
+        count, ns = self.tasks.get(task, (0, 0))
+        return count, ns // pomoengine.NSEC
+
+    def total(self):
+        return self.count, self.focusns // pomoengine.NSEC
@@ -0,0 +1,102 @@
+from array import array
+import pomoengine
+
+TYPECODE = pomoengine.TYPECODE
+TASKCODE = 'i'
+
+def tobytes(a):
+    # array.tostring() of Python 2, array(typecode, data) reads it back
+    return a.tobytes() if hasattr(a, 'tobytes') else a.tostring()
+
+
+class SessionStore(object):
+    # List-like history of Pomodoro sessions stored in three parallel
+    # columns (start/stop wall clock usec and elapsed nsec). Only sessions
+    # still running are kept as objects, items of finished sessions are
+    # rebuilt from the columns on access. The run segments of sessions
+    # that were paused are kept by row in segments, task IDs in their own
+    # column.
+
+    def __init__(self, pomos=()):
+        self.startedusec = array(TYPECODE)
+        self.stoppedusec = array(TYPECODE)
+        self.elapsens = array(TYPECODE)
+        self.tasks = array(TASKCODE)
+        self.segments = {}
+        self._open = {}
+        self.extend(pomos)
+
+    def __len__(self):
+        return len(self.startedusec)
+
+    def append(self, pomo):
+        if pomo.stoppedusec is None:
+            self._open[len(self.startedusec)] = pomo
+            self.startedusec.append(pomo.startedusec)
+            self.stoppedusec.append(-1)
+            self.elapsens.append(0)
+            self.tasks.append(pomo.task)
+        else:
+            if pomo.segments is not None:
+                self.segments[len(self.startedusec)] = pomo.segments
+            self.startedusec.append(pomo.startedusec)
+            self.stoppedusec.append(pomo.stoppedusec)
+            self.elapsens.append(pomo.elapsens)
+            self.tasks.append(pomo.task)
+
+    def extend(self, pomos):
+        for pomo in pomos:
+            self.append(pomo)
+
+    def __settle(self, row):
+        pomo = self._open[row]
+        if pomo.stoppedusec is not None:
+            self.stoppedusec[row] = pomo.stoppedusec
+            self.elapsens[row] = pomo.elapsens
+            self.tasks[row] = pomo.task
+            if pomo.segments is not None:
+                self.segments[row] = pomo.segments
+            del self._open[row]
+        return pomo
+
+    def __getitem__(self, row):
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError(row)
+        if row in self._open:
+            return self.__settle(row)
+        return pomoengine.Pomodoro.fromcolumns(int(self.startedusec[row]),
+            int(self.stoppedusec[row]), int(self.elapsens[row]),
+            self.segments.get(row), self.tasks[row])
+
+    def __iter__(self):
+        return self.since(0)
+
+    def since(self, first):
+        # the sessions from row first on
+        for row in range(first, len(self)):
+            yield self[row]
+
+    def settle(self):
+        # folds sessions stopped since they were appended into the columns
+        for row in list(self._open):
+            self.__settle(row)
+
+    def getstate(self):
+        # the columns as bytes, see pomosnap. Sessions still running are
+        # left out, so take it with none open.
+        self.settle()
+        return (tobytes(self.startedusec), tobytes(self.stoppedusec),
+            tobytes(self.elapsens), tobytes(self.tasks),
+            dict((row, tobytes(segments)) for row, segments in self.segments.items()))
+
+    def setstate(self, state):
+        started, stopped, elapsens, tasks, segments = state
+        self.startedusec = array(TYPECODE, started)
+        self.stoppedusec = array(TYPECODE, stopped)
+        self.elapsens = array(TYPECODE, elapsens)
+        self.tasks = array(TASKCODE, tasks)
+        self.segments = dict((row, array(TYPECODE, data))
+            for row, data in segments.items())
+        self._open = {}
@@ -0,0 +1,307 @@
+import os, uuid, zlib
+from array import array
+import pomostore
+from pomoconfig import _replace
+
+# Replication of finished sessions between instances. Every session gets
+# an event ID (replica, seq): the replica ID of the instance it finished
+# on and a per-replica sequence number. The set of events only grows and
+# an event never changes, so merging is a set union, and a replica's
+# progress is the vector of the highest contiguous seq it has from each
+# replica. Peers exchange vectors and ship only the events past them.
+#
+# The events known here are kept in a journal, one per line:
+#
+#   <replica> <seq> <startedusec> <stoppedusec> <elapsens>
+#
+# Batches on the wire are the same lines, zlib compressed.
+
+REPLICAFILE = u'replica'
+JOURNALFILE = u'sync.journal'
+
+class SyncError(Exception):
+    pass
+
+def encode(events):
+    return zlib.compress(b''.join(
+        ('%s %d %d %d %d\n' % event).encode('ascii') for event in events))
+
+def decode(data):
+    try:
+        data = zlib.decompress(data)
+    except zlib.error as e:
+        raise SyncError('corrupt batch: %s' % e)
+    return list(_parse(data.splitlines(True)))
+
+def _parse(lines):
+    for line in lines:
+        if not line.endswith(b'\n'):
+            # torn write
+            return
+        fields = line.split()
+        if len(fields) != 5:
+            continue
+        try:
+            yield (fields[0].decode('ascii'),) + tuple(int(v) for v in fields[1:])
+        except ValueError:
+            continue
+
+
+class Replica:
+    # events of one replica, columns ordered by seq starting at 1
+    def __init__(self):
+        self.startedusec = array(pomostore.TYPECODE)
+        self.stoppedusec = array(pomostore.TYPECODE)
+        self.elapsens = array(pomostore.TYPECODE)
+
+    def __len__(self):
+        return len(self.startedusec)
+
+    def append(self, started, stopped, elapsed):
+        self.startedusec.append(started)
+        self.stoppedusec.append(stopped)
+        self.elapsens.append(elapsed)
+
+    def since(self, seq):
+        # (seq, started, stopped, elapsed) of events after seq
+        for i in range(max(seq, 0), len(self)):
+            yield (i+1, int(self.startedusec[i]), int(self.stoppedusec[i]),
+                int(self.elapsens[i]))
+
+
+class SyncState:
+    # the events known to this instance, persisted in dirname
+
+    _f = None
+
+    def __init__(self, dirname):
+        self.dirname = dirname
+        self.replicas = {}
+        if not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        self.replica = self.__loadreplica()
+        self.load()
+
+    def __loadreplica(self):
+        filename = os.path.join(self.dirname, REPLICAFILE)
+        if os.path.exists(filename):
+            with open(filename, 'rb') as f:
+                replica = f.read().decode('ascii').strip()
+            if replica:
+                return replica
+        replica = uuid.uuid4().hex[:16]
+        with open(filename, 'wb') as f:
+            f.write(replica.encode('ascii'))
+        return replica
+
+    def load(self):
+        filename = os.path.join(self.dirname, JOURNALFILE)
+        if os.path.exists(filename):
+            with open(filename, 'rb') as f:
+                for event in _parse(f):
+                    self.__add(event)
+
+    def open(self):
+        if self._f is None:
+            self._f = open(os.path.join(self.dirname, JOURNALFILE), 'ab')
+
+    def close(self):
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+
+    def __add(self, event):
+        # adds the event if it is the next one of its replica
+        replica, seq = event[:2]
+        events = self.replicas.get(replica)
+        if events is None:
+            events = self.replicas[replica] = Replica()
+        if seq != len(events)+1:
+            return False
+        events.append(*event[2:])
+        return True
+
+    def startedset(self):
+        # start times of all known sessions
+        known = set()
+        for events in self.replicas.values():
+            known.update(int(v) for v in events.startedusec)
+        return known
+
+    def vector(self):
+        return dict((replica, len(events)) for replica, events in self.replicas.items())
+
+    def delta(self, vector):
+        # events unknown to a peer at vector, in seq order per replica
+        ret = []
+        for replica, events in sorted(self.replicas.items()):
+            for event in events.since(vector.get(replica, 0)):
+                ret.append((replica,) + event)
+        return ret
+
+    def apply(self, events):
+        # adds the events that continue what we have and returns them.
+        # Events out of order are dropped, a later delta brings them again.
+        added = []
+        for event in sorted(events):
+            if self.__add(event):
+                added.append(event)
+        self.__write(added)
+        return added
+
+    def addlocal(self, sessions):
+        # sessions (started, stopped, elapsed) finished here, returns their
+        # events
+        events = self.replicas.get(self.replica)
+        seq = len(events) if events is not None else 0
+        added = []
+        for session in sessions:
+            seq += 1
+            event = (self.replica, seq) + tuple(session)
+            self.__add(event)
+            added.append(event)
+        self.__write(added)
+        return added
+
+    def __write(self, events):
+        if events:
+            self.open()
+            self._f.write(b''.join(
+                ('%s %d %d %d %d\n' % event).encode('ascii') for event in events))
+            self._f.flush()
+
+
+class DirectoryTransport:
+    # Replicas share a directory, a network or synced folder. Each one
+    # writes batches of its own events to <path>/<replica>/ and reads the
+    # other replicas' batches past its vector. Batch file names give the
+    # seq range they hold, so nothing already known is read.
+
+    SUFFIX = '.batch'
+    # FANOUT batches of a size class are merged into one of the next
+    # class. Batches of MAXBATCH events or more are never rewritten, so a
+    # merged batch holds less than FANOUT*MAXBATCH.
+    FANOUT = 8
+    MAXBATCH = 512
+
+    def __init__(self, path):
+        self.path = path
+
+    def __batches(self, replica):
+        # [(first, last, filename)] sorted
+        dirname = os.path.join(self.path, replica)
+        ret = []
+        if os.path.isdir(dirname):
+            for name in os.listdir(dirname):
+                if not name.endswith(self.SUFFIX):
+                    continue
+                try:
+                    first, last = [int(v) for v in name[:-len(self.SUFFIX)].split('-')]
+                except ValueError:
+                    continue
+                ret.append((first, last, os.path.join(dirname, name)))
+        ret.sort()
+        return ret
+
+    def __write(self, replica, events):
+        dirname = os.path.join(self.path, replica)
+        if not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        name = '%012d-%012d%s' % (events[0][1], events[-1][1], self.SUFFIX)
+        filename = os.path.join(dirname, name)
+        with open(filename + '.tmp', 'wb') as f:
+            f.write(encode(events))
+        _replace(filename + '.tmp', filename)
+
+    def push(self, state):
+        # writes our events not published yet as one batch
+        batches = self.__batches(state.replica)
+        pushed = batches[-1][1] if batches else 0
+        events = state.delta({state.replica: pushed})
+        events = [e for e in events if e[0] == state.replica]
+        if events:
+            self.__write(state.replica, events)
+            self.compact(state)
+        return len(events)
+
+    def pull(self, state):
+        # applies the other replicas' batches past our vector. Returns the
+        # events added.
+        added = []
+        if not os.path.isdir(self.path):
+            return added
+        vector = state.vector()
+        for replica in sorted(os.listdir(self.path)):
+            if replica == state.replica:
+                continue
+            for first, last, filename in self.__batches(replica):
+                if last <= vector.get(replica, 0):
+                    continue
+                try:
+                    with open(filename, 'rb') as f:
+                        events = decode(f.read())
+                except (IOError, OSError, SyncError):
+                    # being compacted or still written, next time
+                    break
+                added.extend(state.apply(events))
+        return added
+
+    def _sizeclass(self, first, last):
+        # 0 below FANOUT events, 1 below FANOUT**2, ...
+        size, n = last - first + 1, 0
+        while size >= self.FANOUT:
+            size //= self.FANOUT
+            n += 1
+        return n
+
+    def compact(self, state):
+        # merges our newest small batches, so that there are fewer than
+        # FANOUT batches of each size class below MAXBATCH and a peer a few
+        # events behind reads only the small batches past its vector.
+        # Readers may see both the batches and the merged one for a
+        # moment, which apply() tolerates.
+        while True:
+            batches = self.__batches(state.replica)
+            if not batches:
+                return
+            tail = []
+            cls = self._sizeclass(*batches[-1][:2])
+            for batch in reversed(batches):
+                first, last = batch[:2]
+                if (last - first + 1 >= self.MAXBATCH
+                        or self._sizeclass(first, last) != cls):
+                    break
+                tail.append(batch)
+            if len(tail) < self.FANOUT:
+                return
+            tail.reverse()
+            first, last = tail[0][0], tail[-1][1]
+            events = [e for e in state.delta({state.replica: first-1})
+                if e[0] == state.replica and e[1] <= last]
+            self.__write(state.replica, events)
+            keep = '%012d-%012d%s' % (first, last, self.SUFFIX)
+            for first, last, filename in tail:
+                if os.path.basename(filename) != keep:
+                    os.remove(filename)
+
+
+def exchange(state, rfile, wfile):
+    # symmetric sync over a stream, a socket's makefile() or a pipe: both
+    # sides send their vector and then the delta for the other's vector.
+    # Returns the events added.
+    vector = state.vector()
+    line = ' '.join('%s:%d' % item for item in sorted(vector.items()))
+    wfile.write(line.encode('ascii') + b'\n')
+    wfile.flush()
+
+    peer = {}
+    for item in rfile.readline().split():
+        replica, seq = item.decode('ascii').split(':')
+        peer[replica] = int(seq)
+
+    data = encode(state.delta(peer))
+    wfile.write(('%d\n' % len(data)).encode('ascii') + data)
+    wfile.flush()
+
+    size = int(rfile.readline())
+    return state.apply(decode(rfile.read(size)))
@@ -0,0 +1,73 @@
+# Names of the tasks pomodoros are tagged with. Sessions only carry the
+# task's integer ID, the names are interned here once. ID 0 is no task.
+# The table is kept in the session log as N records, see pomolog.
+
+NOTASK = 0
+
+class TaskTable:
+    # selected last
+    current = NOTASK
+
+    def __init__(self):
+        self.names = [u'']
+        self.ids = {}
+        # most recently selected last
+        self.recent = []
+
+    def __len__(self):
+        return len(self.names) - 1
+
+    def define(self, task, name):
+        # adds a name read back from the log
+        while len(self.names) <= task:
+            self.names.append(u'')
+        self.names[task] = name
+        self.ids[name] = task
+
+    def lookup(self, name):
+        # the ID of name, NOTASK if unknown
+        return self.ids.get(name, NOTASK)
+
+    def intern(self, name):
+        # returns (ID, True if name is new)
+        task = self.ids.get(name)
+        if task is not None:
+            return task, False
+        task = len(self.names)
+        self.define(task, name)
+        return task, True
+
+    def name(self, task):
+        if 0 < task < len(self.names):
+            return self.names[task]
+        return u''
+
+    def select(self, task):
+        self.current = task
+        if task == NOTASK:
+            return
+        if task in self.recent:
+            self.recent.remove(task)
+        self.recent.append(task)
+
+    def getstate(self):
+        return (self.names, self.recent, self.current)
+
+    def setstate(self, state):
+        names, recent, self.current = state
+        for task, name in enumerate(names):
+            if task:
+                self.define(task, name)
+        self.recent = list(recent)
+
+    def recentnames(self, count):
+        # [(task, name)] of the last count tasks used, latest first
+        return [(task, self.names[task]) for task in reversed(self.recent[-count:])]
+
+
+def checkname(name):
+    # task names are one line in the log
+    name = u' '.join(name.split())
+    if not name:
+        raise ValueError('empty task name')
+    return name
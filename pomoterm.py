@@ -0,0 +1,257 @@
+import heapq, itertools, os, select, sys, time
+import pomoengine, pomosched, pomocycle
+
+# Terminal and headless backends for POSIX systems. Commands are read from
+# stdin one per line; the terminal backend keeps a status line updated,
+# the headless one only reports events. On Windows, where select() only
+# takes sockets, the headless backend is the instance pomoctl starts and
+# is driven through the control channel alone.
+
+COMMANDS = {
+    'start': 'start', 's': 'start',
+    'pause': 'togglepause', 'p': 'togglepause',
+    'resume': 'resume', 'r': 'resume',
+    'stop': 'stop', 'x': 'stop',
+}
+
+# commands for the CycleEngine
+CYCLECOMMANDS = {
+    'skip': 'skip', 'k': 'skip',
+    'reset': 'reset',
+}
+
+def _now():
+    return pomoengine.monotonic_ns() / float(pomoengine.NSEC)
+
+
+class SelectLoop:
+    # minimal event loop: one-shot timers in a heap plus readable files.
+
+    running = False
+
+    def __init__(self):
+        self._timers = []
+        self._seq = itertools.count()
+        self._readers = {}
+
+    def settimer(self, msec, f):
+        entry = [_now() + msec/1000.0, next(self._seq), f]
+        heapq.heappush(self._timers, entry)
+        return entry
+
+    def canceltimer(self, entry):
+        entry[2] = None
+
+    def addreader(self, f, callback):
+        self._readers[f] = callback
+
+    def removereader(self, f):
+        self._readers.pop(f, None)
+
+    def stop(self):
+        self.running = False
+
+    def run(self):
+        self.running = True
+        timers = self._timers
+        while self.running:
+            while timers and timers[0][2] is None:
+                heapq.heappop(timers)
+            timeout = None
+            if timers:
+                timeout = max(timers[0][0] - _now(), 0)
+            elif not self._readers:
+                break
+
+            readable = select.select(list(self._readers), [], [], timeout)[0]
+            for f in readable:
+                self._readers[f](f)
+
+            now = _now()
+            while timers and timers[0][0] <= now:
+                f = heapq.heappop(timers)[2]
+                if f is not None:
+                    f()
+
+
+class TerminalFrontend:
+    def __init__(self, pomoapp, visible, out=sys.stdout):
+        self.app = pomoapp
+        self.out = out
+        self.visible = visible
+        self._input = b''
+        self.loop = SelectLoop()
+        self.scheduler = pomosched.DeadlineScheduler(pomoapp.engine,
+            self.loop.settimer, self.loop.canceltimer, self.onwake)
+
+    def run(self, inp=sys.stdin):
+        engine = self.app.engine
+        engine.subscribe(self.onengine)
+        self.app.cycle.subscribe(self.oncycle, events=('phase',))
+        for source in self.app.sources:
+            self.scheduler.addsource(source)
+        if inp is not None:
+            self.loop.addreader(inp, self.oninput)
+        self.app.onconfigerrors = self.onconfigerrors
+        if self.app.configerrors():
+            self.onconfigerrors(self.app.configerrors())
+        control = self.app.control
+        if control is not None:
+            control.onquit = self.loop.stop
+            self.loop.addreader(control, self.oncontrol)
+        self.scheduler.setvisible(self.visible)
+        self.scheduler.reschedule()
+        self.showstatus()
+        try:
+            self.loop.run()
+        finally:
+            self.scheduler.close()
+            if control is not None:
+                self.loop.removereader(control)
+                control.onquit = None
+            self.app.onconfigerrors = None
+            engine.unsubscribe(self.onengine)
+            self.app.cycle.unsubscribe(self.oncycle)
+            if self.visible:
+                self.out.write('\n')
+                self.out.flush()
+
+    def status(self):
+        return self.app.statustext()
+
+    def showstatus(self):
+        if self.visible:
+            self.out.write('\r%s\x1b[K' % self.status())
+            self.out.flush()
+
+    def report(self, message):
+        if self.visible:
+            self.out.write('\r%s\x1b[K\n' % message)
+        else:
+            self.out.write('%s %s\n' % (time.strftime('%H:%M:%S'), message))
+        self.out.flush()
+        self.showstatus()
+
+    def showlisteners(self):
+        # time spent in each listener, to find slow ones
+        for bus in (self.app.engine.bus, self.app.cycle.bus):
+            for name, calls, totalns, maxns in bus.stats():
+                self.report('%-32s %6d calls %9.3f msec max %9.3f msec total' % (
+                    name, calls, maxns/1e6, totalns/1e6))
+
+    def onwake(self):
+        self.app.reloadconfig()
+        self.showstatus()
+
+    def onengine(self, engine, event):
+        if event == 'timeout':
+            if not self.app.sound.play():
+                self.out.write('\a')
+            self.report('timeout')
+        elif event not in ('config', 'task'):
+            # task() reports the task itself
+            self.report(event)
+
+    def oncycle(self, cycle, event):
+        if cycle.phase in pomocycle.BREAKS:
+            self.report('%s, %d min' % (cycle.phase, cycle.plan[cycle.position][1]))
+        elif cycle.expired:
+            if not self.app.sound.play():
+                self.out.write('\a')
+            self.report('%s over' % cycle.previous)
+
+    def onconfigerrors(self, errors):
+        for error in errors:
+            self.report('config: %s' % error)
+        if not errors:
+            self.report('config: ok')
+
+    def oncontrol(self, control):
+        control.poll()
+        self.showstatus()
+
+    def oninput(self, f):
+        # read the fd directly, a buffered readline could leave lines
+        # behind that select() doesn't know about
+        data = os.read(f.fileno(), 4096)
+        if not data:
+            # stdin closed. keep going while there is something scheduled
+            self.loop.removereader(f)
+            data = b'\n'
+        self._input += data
+        while b'\n' in self._input:
+            line, self._input = self._input.split(b'\n', 1)
+            self.command(line.decode('utf-8', 'replace').strip())
+
+    def command(self, line):
+        # the verb is case insensitive, task names are not
+        cmd, _, arg = line.partition(u' ')
+        cmd = cmd.lower()
+        if cmd == 'task':
+            self.task(arg.strip())
+            return
+        if cmd in ('q', 'quit'):
+            self.loop.stop()
+        elif cmd in COMMANDS:
+            getattr(self.app.engine, COMMANDS[cmd])()
+        elif cmd in CYCLECOMMANDS:
+            getattr(self.app.cycle, CYCLECOMMANDS[cmd])()
+        elif not cmd:
+            pass
+        elif cmd == 'status':
+            self.report(self.status())
+        elif cmd == 'listeners':
+            self.showlisteners()
+        elif cmd == 'history':
+            # today's sessions
+            text = self.app.historytext(first=self.app.clock.now().date())
+            for line in text.splitlines() or ['no sessions today']:
+                self.report(line)
+        elif cmd == 'tasks':
+            for line in self.app.taskstext().splitlines() or ['no sessions']:
+                self.report(line)
+        elif cmd in ('export', 'import'):
+            self.transfer(cmd, arg.strip())
+        elif cmd == 'sync':
+            if self.app.sync is None:
+                self.report('sync is off, set syncdir in the config')
+            else:
+                self.report('sync: %d new sessions' % self.app.syncnow())
+        else:
+            self.report('unknown command: %s' % cmd)
+
+    def transfer(self, cmd, filename):
+        # 'export FILE' and 'import FILE', the format from the extension
+        import pomoexport
+        if not filename:
+            self.report('%s takes a file name' % cmd)
+            return
+        try:
+            if cmd == 'export':
+                self.report('exported %d sessions' % self.app.exporthistory(filename))
+            else:
+                self.report('imported %d new sessions' % self.app.importhistory(filename))
+        except pomoexport.ExportError as e:
+            self.report(str(e))
+        except EnvironmentError as e:
+            self.report('%s: %s' % (filename, e.strerror or e))
+
+    def task(self, name):
+        # 'task' shows the current task, 'task NAME' sets it and 'task
+        # --none' clears it, as with pomoctl
+        app = self.app
+        if name:
+            try:
+                app.settask(u'' if name == u'--none' else name)
+            except ValueError as e:
+                self.report(str(e))
+                return
+        self.report(u'task: %s' % (app.tasks.name(app.engine.task) or u'none'))
+
+
+def run(pomoapp):
+    TerminalFrontend(pomoapp, os.isatty(sys.stdout.fileno())).run()
+
+def runheadless(pomoapp):
+    TerminalFrontend(pomoapp, False).run(
+        None if sys.platform == 'win32' else sys.stdin)
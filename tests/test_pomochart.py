@@ -0,0 +1,87 @@
+import os, sys, unittest
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import pomochart
+
+HOUR = 3600
+
+
+class DialTest(unittest.TestCase):
+    def setUp(self):
+        # r = 50
+        self.dial = pomochart.Dial(105, 105)
+
+    def test_circle(self):
+        dial = self.dial
+        self.assertEqual((dial.cx, dial.cy, dial.r), (52, 52, 50))
+        self.assertEqual(dial.circle, (2, 2, 102, 102))
+        # the smaller side sets the radius, centered in the larger one
+        wide = pomochart.Dial(205, 105)
+        self.assertEqual((wide.cx, wide.cy, wide.r), (102, 52, 50))
+
+    def assertNear(self, pos, want):
+        # within the pixel the float math rounds to
+        self.assertTrue(abs(pos[0]-want[0]) <= 1 and abs(pos[1]-want[1]) <= 1,
+            (pos, want))
+
+    def test_pos_clockwise_from_nine(self):
+        pos = self.dial.pos
+        self.assertNear(pos(0), (2, 52))
+        self.assertNear(pos(6*HOUR), (52, 2))
+        self.assertNear(pos(12*HOUR), (102, 52))
+        self.assertNear(pos(18*HOUR), (52, 102))
+        # on the circle
+        x, y = pos(4*HOUR)
+        self.assertTrue(x < 52 and y < 52)
+        self.assertAlmostEqual(((x-52)**2 + (y-52)**2)**0.5, 50, delta=1.5)
+
+    def test_pos_wraps_every_day(self):
+        pos = self.dial.pos
+        for sec in (0, 1234, 3*HOUR, 23*HOUR + 59*60):
+            self.assertNear(pos(sec), pos(sec + 24*HOUR))
+        self.assertNotEqual(pos(HOUR), pos(13*HOUR))
+
+    def test_sec2rad(self):
+        pi = pomochart.math.pi
+        self.assertAlmostEqual(pomochart.sec2rad(0), pi)
+        self.assertAlmostEqual(pomochart.sec2rad(6*HOUR), pi/2)
+        self.assertAlmostEqual(pomochart.sec2rad(pomochart.DIALSEC), 0)
+        self.assertAlmostEqual(pomochart.sec2rad(24*HOUR), -pi)
+
+    def test_wedge(self):
+        dial = self.dial
+        kind, (circle, tpos, fpos) = dial.wedge(9*HOUR, 9*HOUR + 25*60)
+        self.assertEqual(kind, 'pie')
+        self.assertEqual(circle, dial.circle)
+        # drawn counterclockwise from the end to the start
+        self.assertEqual(fpos, dial.pos(9*HOUR))
+        self.assertEqual(tpos, dial.pos(9*HOUR + 25*60))
+
+    def test_wedge_across_midnight(self):
+        kind, (circle, tpos, fpos) = self.dial.wedge(23*HOUR + 50*60, 24*HOUR + 15*60)
+        self.assertEqual(kind, 'pie')
+        self.assertNear(tpos, self.dial.pos(15*60))
+        self.assertNear(fpos, self.dial.pos(23*HOUR + 50*60))
+
+    def test_thin_wedge_is_a_line(self):
+        dial = self.dial
+        self.assertEqual(dial.wedge(3*HOUR, 3*HOUR + 5),
+            ('line', ((dial.cx, dial.cy), dial.pos(3*HOUR + 5))))
+
+    def test_wedges(self):
+        intervals = [(0, 25*60), (HOUR, HOUR + 1), (13*HOUR, 13*HOUR + 25*60)]
+        wedges = self.dial.wedges(intervals)
+        self.assertEqual([w[0] for w in wedges], ['pie', 'line', 'pie'])
+        self.assertEqual(wedges, [self.dial.wedge(f, t) for f, t in intervals])
+
+
+class ShadeTest(unittest.TestCase):
+    def test_ends(self):
+        self.assertEqual(pomochart.shade(0, 60, 0xffffff, 0x905000), 0xffffff)
+        self.assertEqual(pomochart.shade(60, 60, 0xffffff, 0x905000), 0x905000)
+        self.assertEqual(pomochart.shade(120, 60, 0xffffff, 0x905000), 0x905000)
+        self.assertEqual(pomochart.shade(5, 0, 0xffffff, 0x905000), 0xffffff)
+
+
+if __name__ == '__main__':
+    unittest.main()
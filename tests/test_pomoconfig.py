@@ -0,0 +1,71 @@
+import os, shutil, sys, tempfile, unittest
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import pomoconfig
+
+def configtext(**values):
+    return '[CONFIG]\n' + ''.join('%s = %s\n' % item for item in values.items())
+
+
+class ParseTest(unittest.TestCase):
+    def test_defaults(self):
+        config, errors = pomoconfig.parse('')
+        self.assertEqual(config, pomoconfig.Config())
+        self.assertEqual(errors, [])
+
+    def test_bad_value_is_an_error(self):
+        previous = pomoconfig.Config(timeout=50)
+        for text in (configtext(minutes='abc'), configtext(minutes='0'),
+                configtext(minutes='-5')):
+            config, errors = pomoconfig.parse(text, previous)
+            self.assertEqual(len(errors), 1, (text, errors))
+            self.assertEqual(config.timeout, 50)
+
+    def test_each_bad_value_reported(self):
+        config, errors = pomoconfig.parse(configtext(minutes='x', format='nope',
+            longevery='0', countdown='maybe', soundfile='/no/such.wav'))
+        self.assertEqual(len(errors), 5, errors)
+        self.assertEqual(config, pomoconfig.Config())
+
+    def test_syntax_error(self):
+        config, errors = pomoconfig.parse('minutes = 5\n')
+        self.assertEqual(len(errors), 1)
+
+
+class ConfigFileTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmp, 'pomotimer.config')
+        self.file = pomoconfig.ConfigFile(self.filename)
+        self.mtime = 1000000000
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def write(self, text):
+        with open(self.filename, 'w') as f:
+            f.write(text)
+        # a new mtime even on coarse file systems
+        self.mtime += 10
+        os.utime(self.filename, (self.mtime, self.mtime))
+
+    def test_errors_follow_the_file(self):
+        self.write(configtext(minutes='30'))
+        self.assertTrue(self.file.reload())
+        self.assertEqual(self.file.errors, [])
+        self.write(configtext(minutes='thirty'))
+        self.assertFalse(self.file.reload())
+        self.assertEqual(len(self.file.errors), 1)
+        self.assertEqual(self.file.get().timeout, 30)
+        self.write(configtext(minutes='45'))
+        self.assertTrue(self.file.reload())
+        self.assertEqual(self.file.errors, [])
+
+    def test_save_rejects_bad_timeout(self):
+        self.assertRaises(pomoconfig.ConfigError, self.file.save,
+            pomoconfig.Config(timeout=0))
+        self.assertFalse(os.path.exists(self.filename))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+import os, sys, unittest
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import pomoengine, pomosched, pomosim, pomocycle
+
+MINUTE = 60*pomoengine.NSEC
+
+
+class CycleTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = pomosim.SimClock()
+        self.engine = pomoengine.PomoEngine(25, clock=self.clock)
+        self.cycle = pomocycle.CycleEngine(self.engine, 5, 15, 4)
+        self.scheduler = pomosched.DeadlineScheduler(self.engine,
+            self.clock.settimer, self.clock.canceltimer)
+        self.scheduler.addsource(self.cycle)
+        self.events = []
+        self.engine.subscribe(lambda engine, event: self.events.append(
+            (self.clock.ns // MINUTE, 'engine', event)))
+        self.cycle.subscribe(lambda cycle, event: self.events.append(
+            (self.clock.ns // MINUTE, cycle.phase, event)))
+
+    def tearDown(self):
+        self.scheduler.close()
+        self.cycle.close()
+
+    def test_deadlines(self):
+        self.engine.start()
+        self.assertEqual([d[0] for d in self.cycle.deadlines],
+            [phase for phase, minutes in self.cycle.plan])
+        self.assertEqual(self.cycle.deadlines[:2],
+            [(pomocycle.WORK, 25*MINUTE), (pomocycle.SHORTBREAK, 30*MINUTE)])
+
+    def test_break_ends_at_deadline(self):
+        self.engine.start()
+        self.clock.advance(25*60)
+        self.engine.stop()
+        self.assertEqual(self.cycle.phase, pomocycle.SHORTBREAK)
+        self.assertEqual(self.cycle.getdeadlinein(), 5*60)
+        self.clock.advance(5*60 - 1)
+        self.assertEqual(self.cycle.phase, pomocycle.SHORTBREAK)
+        # timers are rounded up a msec
+        self.clock.advance(1.01)
+        self.assertEqual(self.cycle.phase, pomocycle.IDLE)
+        self.assertTrue(self.cycle.expired)
+
+    def test_configure_during_break(self):
+        self.engine.start()
+        self.clock.advance(25*60)
+        self.engine.stop()
+        self.clock.advance(60)
+        self.cycle.configure(10, 15, 4)
+        self.assertEqual(self.cycle.deadlines[0], (pomocycle.SHORTBREAK, 35*MINUTE))
+        self.assertEqual(self.cycle.getdeadlinein(), 9*60)
+        self.clock.advance(5*60)
+        self.assertEqual(self.cycle.phase, pomocycle.SHORTBREAK)
+        self.clock.advance(4*60 + 0.01)
+        self.assertEqual(self.cycle.phase, pomocycle.IDLE)
+
+    def test_shorter_break_during_break(self):
+        self.engine.start()
+        self.clock.advance(25*60)
+        self.engine.stop()
+        self.clock.advance(60)
+        self.cycle.configure(2, 15, 4)
+        self.clock.advance(60 + 0.01)
+        self.assertEqual(self.cycle.phase, pomocycle.IDLE)
+        self.assertTrue(self.cycle.expired)
+
+    def test_configure_fires_config(self):
+        self.cycle.configure(10, 15, 4)
+        self.assertEqual(self.events[-1], (0, pomocycle.IDLE, 'config'))
+
+    def test_pause_moves_deadlines(self):
+        self.engine.start()
+        self.clock.advance(10*60)
+        self.engine.pause()
+        self.clock.advance(3*60)
+        self.engine.resume()
+        self.assertEqual(self.cycle.deadlines[0], (pomocycle.WORK, 28*MINUTE))
+
+    def test_auto_stop_after_timeout(self):
+        self.cycle.configure(5, 15, 4, auto=True)
+        self.engine.start()
+        self.clock.advance(25*60 + 0.01)
+        # listeners subscribed after the cycle see the timeout first
+        engine = [e for e in self.events if e[1] == 'engine']
+        self.assertEqual(engine[1:], [(25, 'engine', 'timeout'), (25, 'engine', 'stop')])
+        self.assertEqual(self.cycle.phase, pomocycle.SHORTBREAK)
+        self.clock.advance(5*60 + 0.01)
+        self.assertTrue(self.engine.isrunning())
+        self.assertEqual(self.cycle.phase, pomocycle.WORK)
+
+
+class PeriodicTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = pomosim.SimClock()
+        self.engine = pomoengine.PomoEngine(25, clock=self.clock)
+        self.scheduler = pomosched.DeadlineScheduler(self.engine,
+            self.clock.settimer, self.clock.canceltimer)
+        self.addCleanup(self.scheduler.close)
+        self.active = False
+        self.calls = []
+        self.periodic = pomosched.Periodic(self.clock, 60,
+            lambda: self.calls.append(self.clock.ns // MINUTE),
+            lambda: self.active)
+        self.scheduler.addsource(self.periodic)
+
+    def test_idle_while_inactive(self):
+        self.clock.advance(10*60)
+        self.assertEqual(self.calls, [])
+
+    def test_runs_every_interval_while_active(self):
+        self.active = True
+        self.periodic.restart()
+        self.clock.advance(3*60 + 0.01)
+        self.assertEqual(self.calls, [1, 2, 3])
+        self.active = False
+        self.clock.advance(3*60)
+        self.assertEqual(self.calls, [1, 2, 3])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import os, sys, unittest
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import pomoengine, pomosim
+
+SEC = 1000000
+MINUTE = 60*SEC
+
+
+class PomodoroTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = pomosim.SimClock()
+        self.pomo = pomoengine.Pomodoro(clock=self.clock)
+        self.t0 = self.pomo.startedusec
+
+    def advance(self, minutes):
+        self.clock.advance(minutes*60)
+
+    def at(self, minutes):
+        return self.t0 + int(minutes*MINUTE)
+
+    def test_single_run(self):
+        self.advance(25)
+        self.pomo.stop(self.clock)
+        self.assertEqual(self.pomo.segments, None)
+        self.assertEqual(self.pomo.runs(), [(self.t0, self.at(25))])
+        self.assertEqual(self.pomo.focusedat(self.at(-1)), 0)
+        self.assertEqual(self.pomo.focusedat(self.at(10)), 10*MINUTE)
+        self.assertEqual(self.pomo.focusedat(self.at(30)), 25*MINUTE)
+
+    def test_paused_then_stopped(self):
+        # runs 0-10 and 15-25
+        self.advance(10)
+        self.pomo.pause(self.clock)
+        self.advance(5)
+        self.pomo.resume(self.clock)
+        self.advance(10)
+        self.pomo.stop(self.clock)
+        self.assertEqual(self.pomo.runs(),
+            [(self.t0, self.at(10)), (self.at(15), self.at(25))])
+        self.assertEqual(self.pomo.elapsens, 20*60*pomoengine.NSEC)
+        self.assertEqual(self.pomo.focusedat(self.at(25)), 20*MINUTE)
+        self.assertEqual(self.pomo.focusedusec(self.at(5), self.at(20)), 10*MINUTE)
+
+    def test_stopped_while_paused(self):
+        self.advance(10)
+        self.pomo.pause(self.clock)
+        self.advance(5)
+        self.pomo.stop(self.clock)
+        self.assertEqual(self.pomo.runs(), [(self.t0, self.at(10))])
+        self.assertEqual(self.pomo.stoppedusec, self.at(15))
+        self.assertEqual(self.pomo.elapsens, 10*60*pomoengine.NSEC)
+        self.assertEqual(self.pomo.focusedat(self.at(15)), 10*MINUTE)
+
+    def test_focusedat_inside_a_pause(self):
+        self.advance(10)
+        self.pomo.pause(self.clock)
+        self.advance(5)
+        self.pomo.resume(self.clock)
+        self.advance(10)
+        self.pomo.stop(self.clock)
+        for minutes in (10, 12, 15):
+            self.assertEqual(self.pomo.focusedat(self.at(minutes)), 10*MINUTE)
+        self.assertEqual(self.pomo.focusedusec(self.at(11), self.at(14)), 0)
+
+    def test_focusedat_inside_the_open_run(self):
+        self.advance(10)
+        self.pomo.pause(self.clock)
+        self.advance(5)
+        self.pomo.resume(self.clock)
+        self.advance(3)
+        self.assertEqual(self.pomo.runs(self.at(18)),
+            [(self.t0, self.at(10)), (self.at(15), self.at(18))])
+        self.assertEqual(self.pomo.focusedat(self.at(17)), 12*MINUTE)
+        self.assertEqual(self.pomo.focusedat(self.at(18)), 13*MINUTE)
+
+    def test_focusedat_while_paused(self):
+        self.advance(10)
+        self.pomo.pause(self.clock)
+        self.advance(5)
+        self.assertEqual(self.pomo.runs(self.at(15)), [(self.t0, self.at(10))])
+        self.assertEqual(self.pomo.focusedat(self.at(15)), 10*MINUTE)
+
+    def test_fromcolumns_matches(self):
+        self.advance(10)
+        self.pomo.pause(self.clock)
+        self.advance(5)
+        self.pomo.resume(self.clock)
+        self.advance(10)
+        self.pomo.stop(self.clock)
+        pomo = pomoengine.Pomodoro.fromcolumns(self.pomo.startedusec,
+            self.pomo.stoppedusec, self.pomo.elapsens, self.pomo.segments)
+        self.assertEqual(pomo.runs(), self.pomo.runs())
+        for minutes in range(-1, 27, 2):
+            self.assertEqual(pomo.focusedat(self.at(minutes)),
+                self.pomo.focusedat(self.at(minutes)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import os, shutil, sys, tempfile, unittest
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import pomoengine, pomoexport, pomostore
+
+T0 = 1700000000000000
+SEC = 1000000
+
+def session(i):
+    started = T0 + i*3600*SEC
+    return (started, started + 1500*SEC, 1500*SEC*1000)
+
+def makestore(count):
+    return pomostore.SessionStore(pomoengine.Pomodoro.fromcolumns(*session(i))
+        for i in range(count))
+
+def rows(store):
+    return list(zip(*[[int(v) for v in col]
+        for col in (store.startedusec, store.stoppedusec, store.elapsens)]))
+
+
+class ExportTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def roundtrip(self, ext):
+        filename = os.path.join(self.tmp, 'history' + ext)
+        store = makestore(5)
+        # a running session isn't exported
+        store.append(pomoengine.Pomodoro.fromcolumns(session(5)[0], None, 0))
+        self.assertEqual(pomoexport.export(store, filename), 5)
+        self.assertEqual(list(pomoexport.iterimport(filename)), [session(i) for i in range(5)])
+
+    def test_csv(self):
+        self.roundtrip('.csv')
+
+    def test_jsonl(self):
+        self.roundtrip('.jsonl')
+
+    def test_npy(self):
+        self.roundtrip('.npy')
+
+    def test_arrow(self):
+        try:
+            import pyarrow
+        except ImportError:
+            self.skipTest('needs pyarrow')
+        self.roundtrip('.arrow')
+        self.roundtrip('.parquet')
+
+    def test_merge_skips_known(self):
+        store = makestore(3)
+        added = []
+        records = [session(i) for i in range(1, 5)] + [session(4)]
+        self.assertEqual(pomoexport.merge(records, store, [added.append]), 2)
+        self.assertEqual(rows(store), [session(i) for i in range(5)])
+        self.assertEqual([pomo.startedusec for pomo in added], [session(3)[0], session(4)[0]])
+        self.assertEqual(pomoexport.merge(records, store), 0)
+
+    def test_bad_record_adds_nothing(self):
+        filename = os.path.join(self.tmp, 'history.csv')
+        with open(filename, 'w') as f:
+            f.write('started_usec,stopped_usec,elapsed_ns\n')
+            f.write('%d,%d,%d\n' % session(0))
+            f.write('%d,x,%d\n' % session(1)[::2])
+        store = makestore(0)
+        with self.assertRaises(pomoexport.ExportError) as cm:
+            pomoexport.merge(pomoexport.iterimport(filename), store)
+        self.assertTrue('record 2' in str(cm.exception))
+        self.assertEqual(len(store), 0)
+
+    def test_backwards_session_is_rejected(self):
+        started, stopped, elapsed = session(1)
+        store = makestore(0)
+        self.assertRaises(pomoexport.ExportError, pomoexport.merge,
+            [session(0), (stopped, started, elapsed)], store)
+        self.assertEqual(len(store), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
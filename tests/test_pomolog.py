@@ -0,0 +1,175 @@
+import os, shutil, sys, tempfile, unittest
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import pomoengine, pomolog, pomosim, pomotask
+
+T0 = 1700000000000000
+SEC = 1000000
+
+
+class LogTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmp, 'pomotimer.log')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def write(self, data):
+        with open(self.filename, 'wb') as f:
+            f.write(data)
+
+    def read(self):
+        with open(self.filename, 'rb') as f:
+            return f.read()
+
+    def load(self, tasks=None):
+        return list(pomolog.SessionLog(self.filename).load(tasks))
+
+    def reopen(self):
+        log = pomolog.SessionLog(self.filename)
+        log.open()
+        return log
+
+    def test_torn_stop_is_dropped(self):
+        self.write(b'S %d\nE %d 15' % (T0, T0 + 150*SEC))
+        pomos = self.load()
+        self.assertEqual(len(pomos), 1)
+        # closed at its last whole record
+        self.assertEqual((pomos[0].stoppedusec, pomos[0].elapsens), (T0, 0))
+
+        log = self.reopen()
+        self.assertEqual(self.read(), b'S %d\n' % T0)
+        log.append('S', T0 + 200*SEC)
+        log.append('E', T0 + 300*SEC, 100*pomoengine.NSEC)
+        log.close()
+        pomos = self.load()
+        self.assertEqual([(p.startedusec, p.elapsens) for p in pomos],
+            [(T0, 0), (T0 + 200*SEC, 100*pomoengine.NSEC)])
+
+    def test_torn_task_records_are_dropped(self):
+        self.write(b'N 1 Write report\nT 1\nN 2 Rev')
+        tasks = pomotask.TaskTable()
+        self.load(tasks)
+        self.assertEqual((len(tasks), tasks.current), (1, 1))
+        self.reopen().close()
+        self.assertEqual(self.read(), b'N 1 Write report\nT 1\n')
+
+        self.write(b'N 1 Write report\nT 1\nT 2')
+        tasks = pomotask.TaskTable()
+        self.load(tasks)
+        self.assertEqual(tasks.current, 1)
+        self.reopen().close()
+        self.assertEqual(self.read(), b'N 1 Write report\nT 1\n')
+
+    def test_whole_log_untouched(self):
+        data = b'S %d\nE %d 15\n' % (T0, T0 + 150*SEC)
+        self.write(data)
+        self.reopen().close()
+        self.assertEqual(self.read(), data)
+
+    def test_names_are_synced(self):
+        synced = []
+        fsync = pomolog.os.fsync
+        pomolog.os.fsync = synced.append
+        try:
+            log = self.reopen()
+            log.appendname(1, u'Write report')
+            self.assertEqual(len(synced), 1)
+            log.close()
+        finally:
+            pomolog.os.fsync = fsync
+        tasks = pomotask.TaskTable()
+        self.load(tasks)
+        self.assertEqual(tasks.name(1), u'Write report')
+
+    def test_single_torn_record(self):
+        self.write(b'S 17000')
+        self.assertEqual(self.load(), [])
+        self.reopen().close()
+        self.assertEqual(self.read(), b'')
+
+
+class SegmentTest(unittest.TestCase):
+    # run segments rebuilt from the log, see pomolog._close
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmp, 'pomotimer.log')
+        self.clock = pomosim.SimClock()
+        self.engine = pomoengine.PomoEngine(25, clock=self.clock)
+        self.log = pomolog.SessionLog(self.filename)
+        self.log.attach(self.engine)
+
+    def tearDown(self):
+        self.log.close()
+        shutil.rmtree(self.tmp)
+
+    def advance(self, minutes):
+        self.clock.advance(minutes*60)
+
+    def load(self):
+        self.log.close()
+        return list(pomolog.SessionLog(self.filename).load())
+
+    def assertSameRuns(self, pomo, live):
+        self.assertEqual((pomo.startedusec, pomo.stoppedusec, pomo.elapsens),
+            (live.startedusec, live.stoppedusec, live.elapsens))
+        self.assertEqual(pomo.runs(), live.runs())
+        for usec in range(pomo.startedusec - SEC, pomo.stoppedusec + SEC, 60*SEC):
+            self.assertEqual(pomo.focusedat(usec), live.focusedat(usec))
+
+    def test_paused_then_stopped(self):
+        self.engine.start()
+        self.advance(10)
+        self.engine.pause()
+        self.advance(5)
+        self.engine.resume()
+        self.advance(10)
+        self.engine.stop()
+        pomos = self.load()
+        self.assertEqual(len(pomos[0].runs()), 2)
+        self.assertSameRuns(pomos[0], self.engine.cur)
+
+    def test_stopped_while_paused(self):
+        self.engine.start()
+        self.advance(10)
+        self.engine.pause()
+        self.advance(5)
+        self.engine.stop()
+        pomos = self.load()
+        self.assertEqual(list(pomos[0].segments),
+            [pomos[0].startedusec, pomos[0].startedusec + 10*60*SEC])
+        self.assertSameRuns(pomos[0], self.engine.cur)
+
+    def test_crash_while_paused(self):
+        self.engine.start()
+        t0 = self.engine.cur.startedusec
+        self.advance(10)
+        self.engine.pause()
+        self.advance(5)
+        pomo, = self.load()
+        # closed where it was paused, the pause didn't run
+        self.assertEqual(pomo.stoppedusec, t0 + 10*60*SEC)
+        self.assertEqual(pomo.runs(), [(t0, t0 + 10*60*SEC)])
+        self.assertEqual(pomo.elapsens, 10*60*pomoengine.NSEC)
+        self.assertEqual(pomo.focusedat(t0 + 20*60*SEC), 10*60*SEC)
+
+    def test_crash_after_resume(self):
+        self.engine.start()
+        t0 = self.engine.cur.startedusec
+        self.advance(10)
+        self.engine.pause()
+        self.advance(5)
+        self.engine.resume()
+        self.advance(5)
+        pomo, = self.load()
+        # closed at the resume, the last record
+        self.assertEqual(pomo.stoppedusec, t0 + 15*60*SEC)
+        self.assertEqual(pomo.runs(), [(t0, t0 + 10*60*SEC),
+            (t0 + 15*60*SEC, t0 + 15*60*SEC)])
+        self.assertEqual(pomo.focusedat(pomo.stoppedusec), 10*60*SEC)
+
+
+if __name__ == '__main__':
+    unittest.main()
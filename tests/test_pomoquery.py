@@ -0,0 +1,77 @@
+import os, sys, unittest
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import pomoengine, pomostore, pomoquery
+
+MINUTE = 60*1000000
+
+def makestore(count):
+    # a session every 30 minutes lasting i % 50 + 1 minutes, every third
+    # one on task 1, plus one started out of order
+    store = pomostore.SessionStore()
+    for i in range(count):
+        started = (i+1)*30*MINUTE
+        length = i % 50 + 1
+        pomo = pomoengine.Pomodoro.fromcolumns(started, started + length*MINUTE,
+            length*60*pomoengine.NSEC, task=1 if i % 3 == 0 else 0)
+        store.append(pomo)
+    store.append(pomoengine.Pomodoro.fromcolumns(45*MINUTE, 46*MINUTE,
+        60*pomoengine.NSEC))
+    return store
+
+
+class QueryTest(unittest.TestCase):
+    def setUp(self):
+        self.store = makestore(500)
+        self.index = pomoquery.QueryIndex(self.store)
+
+    def brute(self, first=None, last=None, minsec=None, maxsec=None, tag=None):
+        store = self.store
+        keys = []
+        for row in range(len(store)):
+            started, elapsed = store.startedusec[row], store.elapsens[row]/pomoengine.NSEC
+            if ((first is None or started >= first) and (last is None or started < last)
+                    and (minsec is None or elapsed >= minsec)
+                    and (maxsec is None or elapsed <= maxsec)
+                    and (tag is None or store.tasks[row] == tag)):
+                keys.append((started, row))
+        return [row for started, row in sorted(keys)]
+
+    def pages(self, limit, **kw):
+        rows, cursor = [], None
+        while True:
+            pomos, cursor = self.index.query(cursor=cursor, limit=limit, **kw)
+            rows.extend(pomo.startedusec for pomo in pomos)
+            if cursor is None:
+                return rows
+
+    def test_filters(self):
+        for kw in ({}, {'first': 100*MINUTE, 'last': 5000*MINUTE},
+                {'minsec': 40*60}, {'maxsec': 5*60}, {'tag': 1},
+                {'first': 1000*MINUTE, 'minsec': 10*60, 'maxsec': 20*60, 'tag': 1}):
+            self.assertEqual(list(self.index.iterrows(**kw)), self.brute(**kw))
+
+    def test_out_of_order_first(self):
+        self.assertEqual(list(self.index.iterrows())[:3], [0, 500, 1])
+
+    def test_paging(self):
+        for limit in (1, 7, 50, 1000):
+            want = [self.store.startedusec[row] for row in self.brute(minsec=10*60)]
+            self.assertEqual(self.pages(limit, minsec=10*60), want)
+
+    def test_paging_while_adding(self):
+        pomos, cursor = self.index.query(limit=100)
+        self.store.append(pomoengine.Pomodoro.fromcolumns(10*MINUTE, 11*MINUTE,
+            60*pomoengine.NSEC))
+        pomos, cursor = self.index.query(cursor=cursor, limit=1)
+        self.assertEqual(pomos[0].startedusec, self.store.startedusec[99])
+
+    def test_zero_limit(self):
+        self.assertEqual(self.index.query(limit=0), ([], None))
+
+    def test_bad_cursor(self):
+        self.assertRaises(ValueError, self.index.query, cursor='x')
+
+
+if __name__ == '__main__':
+    unittest.main()
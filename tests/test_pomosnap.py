@@ -0,0 +1,99 @@
+import os, shutil, sys, tempfile, unittest
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import pomoengine, pomosim, pomosnap, pomotimer
+
+
+class SnapshotTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.names = (pomotimer.CONFIGFILEPATH, pomotimer.CONFIGFILENAME,
+            pomotimer.LOGFILENAME, pomotimer.SNAPFILENAME)
+        pomotimer.CONFIGFILEPATH = self.tmp
+        pomotimer.CONFIGFILENAME = os.path.join(self.tmp, 'pomotimer.config')
+        pomotimer.LOGFILENAME = os.path.join(self.tmp, 'pomotimer.log')
+        pomotimer.SNAPFILENAME = os.path.join(self.tmp, 'pomotimer.snap')
+        self.clock = pomosim.SimClock()
+
+    def tearDown(self):
+        (pomotimer.CONFIGFILEPATH, pomotimer.CONFIGFILENAME,
+            pomotimer.LOGFILENAME, pomotimer.SNAPFILENAME) = self.names
+        shutil.rmtree(self.tmp)
+
+    def app(self):
+        app = pomotimer.PomoTimerApp(self.clock)
+        self.addCleanup(app.log.close)
+        return app
+
+    def work(self, app, count, task=None):
+        if task:
+            app.settask(task)
+        for i in range(count):
+            app.engine.start()
+            self.clock.advance(600)
+            app.engine.pause()
+            self.clock.advance(120)
+            app.engine.resume()
+            self.clock.advance(900)
+            app.engine.stop()
+            self.clock.advance(3600*5)
+
+    def state(self, app):
+        return (app.engine.hist.getstate(), app.tasks.getstate(),
+            app.index.getstate(), app.occupancy.getstate(), app.stats.getstate())
+
+    def test_tail_replayed(self):
+        app = self.app()
+        self.work(app, 3, u'write')
+        self.assertTrue(app.savesnapshot())
+        self.work(app, 2, u'read')
+        app.engine.start()
+        self.clock.advance(60)
+        app.log.close()
+
+        offset, parts = pomosnap.load(pomotimer.SNAPFILENAME, pomotimer.LOGFILENAME)
+        self.assertTrue(offset > 0)
+        restored = self.app()
+        self.assertEqual(len(restored.engine.hist), 6)
+        self.assertEqual(restored.tasks.current, restored.tasks.lookup(u'read'))
+
+        os.remove(pomotimer.SNAPFILENAME)
+        replayed = self.app()
+        self.assertEqual(self.state(restored), self.state(replayed))
+
+    def test_not_taken_while_running(self):
+        app = self.app()
+        app.engine.start()
+        self.assertFalse(app.savesnapshot())
+        self.assertFalse(os.path.exists(pomotimer.SNAPFILENAME))
+
+    def test_taken_every_snapsessions(self):
+        app = self.app()
+        self.work(app, pomotimer.SNAPSESSIONS)
+        offset, parts = pomosnap.load(pomotimer.SNAPFILENAME, pomotimer.LOGFILENAME)
+        self.assertEqual(offset, os.path.getsize(pomotimer.LOGFILENAME))
+
+    def test_replaced_log_is_replayed(self):
+        app = self.app()
+        self.work(app, 3)
+        app.savesnapshot()
+        app.log.close()
+        with open(pomotimer.LOGFILENAME, 'rb') as f:
+            lines = f.readlines()
+        with open(pomotimer.LOGFILENAME, 'wb') as f:
+            f.writelines(lines[:-4])
+        self.assertEqual(pomosnap.load(pomotimer.SNAPFILENAME, pomotimer.LOGFILENAME), None)
+        self.assertEqual(len(self.app().engine.hist), 2)
+
+    def test_bad_snapshot_is_ignored(self):
+        app = self.app()
+        self.work(app, 2)
+        app.savesnapshot()
+        app.log.close()
+        with open(pomotimer.SNAPFILENAME, 'wb') as f:
+            f.write(b'garbage')
+        self.assertEqual(len(self.app().engine.hist), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
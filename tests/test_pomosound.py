@@ -0,0 +1,84 @@
+import os, shutil, sys, tempfile, unittest, wave
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import pomosound
+
+
+class NotifierTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmp, 'bell.wav')
+        self.out = os.path.join(self.tmp, 'played.wav')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def writewav(self, frames):
+        w = wave.open(self.filename, 'wb')
+        w.setnchannels(1)
+        w.setsampwidth(1)
+        w.setframerate(8000)
+        w.writeframes(b'\x80' * frames)
+        w.close()
+        with open(self.filename, 'rb') as f:
+            return f.read()
+
+    def notifier(self, sink):
+        notifier = pomosound.Notifier(sink)
+        self.addCleanup(notifier.close)
+        return notifier
+
+    def played(self, notifier):
+        # waits for the worker
+        self.assertTrue(notifier.play())
+        notifier._queue.put(None)
+        notifier._thread.join()
+        notifier._thread = None
+        with open(self.out, 'rb') as f:
+            return f.read()
+
+    def test_plays_a_copy(self):
+        data = self.writewav(800)
+        notifier = self.notifier(pomosound.FileSink(self.out))
+        notifier.load(self.filename)
+        self.assertEqual(notifier.error, None)
+        # no mapping holds on to the file
+        os.remove(self.filename)
+        self.assertEqual(self.played(notifier), data)
+
+    def test_edited_file_is_reloaded(self):
+        self.writewav(800)
+        notifier = self.notifier(pomosound.FileSink(self.out))
+        notifier.load(self.filename)
+        buf = notifier.buffer
+        notifier.load(self.filename)
+        self.assertTrue(notifier.buffer is buf)
+        data = self.writewav(1600)
+        notifier.load(self.filename)
+        self.assertFalse(notifier.buffer is buf)
+        self.assertEqual(self.played(notifier), data)
+
+    def test_bad_file(self):
+        with open(self.filename, 'wb') as f:
+            f.write(b'RIFF')
+        sink = pomosound.NullSink()
+        notifier = self.notifier(sink)
+        notifier.load(self.filename)
+        self.assertTrue('not a valid .wav file' in notifier.error)
+        self.assertFalse(notifier.play())
+        self.writewav(800)
+        notifier.load(self.filename)
+        self.assertEqual(notifier.error, None)
+        self.assertTrue(notifier.play())
+
+    def test_unload(self):
+        self.writewav(800)
+        notifier = self.notifier(pomosound.NullSink())
+        notifier.load(self.filename)
+        notifier.load(u'')
+        self.assertEqual(notifier.buffer, None)
+        self.assertFalse(notifier.play())
+
+
+if __name__ == '__main__':
+    unittest.main()
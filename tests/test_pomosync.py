@@ -0,0 +1,116 @@
+import io, os, shutil, sys, tempfile, unittest
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import pomosync
+
+def session(i):
+    started = (i+1)*3600*1000000
+    return (started, started + 1500*1000000, 1500*1000000000)
+
+
+class SyncTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.shared = os.path.join(self.tmp, 'shared')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def state(self, name):
+        state = pomosync.SyncState(os.path.join(self.tmp, name))
+        self.addCleanup(state.close)
+        return state
+
+    def test_delta_apply(self):
+        a, b = self.state('a'), self.state('b')
+        a.addlocal([session(i) for i in range(5)])
+        self.assertEqual(b.apply(a.delta(b.vector())), a.delta({}))
+        self.assertEqual(b.vector(), {a.replica: 5})
+        self.assertEqual(a.delta(b.vector()), [])
+        a.addlocal([session(5)])
+        self.assertEqual(a.delta(b.vector()), [(a.replica, 6) + session(5)])
+
+    def test_apply_drops_gaps_and_duplicates(self):
+        a, b = self.state('a'), self.state('b')
+        events = a.addlocal([session(i) for i in range(4)])
+        self.assertEqual(b.apply(events[2:]), [])
+        self.assertEqual(b.apply(events[:2] + events[:2]), events[:2])
+        self.assertEqual(b.apply(events), events[2:])
+
+    def test_reload(self):
+        a = self.state('a')
+        a.addlocal([session(i) for i in range(3)])
+        a.close()
+        again = self.state('a')
+        self.assertEqual(again.replica, a.replica)
+        self.assertEqual(again.delta({}), a.delta({}))
+
+    def test_exchange(self):
+        a, b = self.state('a'), self.state('b')
+        a.addlocal([session(i) for i in range(3)])
+        b.addlocal([session(i) for i in range(10, 12)])
+        # b's half of the conversation, prepared ahead
+        bout = io.BytesIO()
+        bout.write(' '.join('%s:%d' % item for item in b.vector().items()).encode('ascii') + b'\n')
+        data = pomosync.encode(b.delta(a.vector()))
+        bout.write(('%d\n' % len(data)).encode('ascii') + data)
+        aout = io.BytesIO()
+        added = pomosync.exchange(a, io.BytesIO(bout.getvalue()), aout)
+        self.assertEqual(added, b.delta({}))
+        self.assertEqual(sorted(a.startedset()), sorted(s[0] for s in
+            [session(i) for i in (0, 1, 2, 10, 11)]))
+
+    def test_directory(self):
+        a, b = self.state('a'), self.state('b')
+        transport = pomosync.DirectoryTransport(self.shared)
+        a.addlocal([session(i) for i in range(3)])
+        self.assertEqual(transport.push(a), 3)
+        self.assertEqual(transport.push(a), 0)
+        self.assertEqual(len(transport.pull(b)), 3)
+        self.assertEqual(transport.pull(b), [])
+
+    def test_peer_a_few_events_behind(self):
+        a, b = self.state('a'), self.state('b')
+        transport = pomosync.DirectoryTransport(self.shared)
+        for i in range(190):
+            a.addlocal([session(i)])
+            transport.push(a)
+        transport.pull(b)
+        for i in range(190, 200):
+            a.addlocal([session(i)])
+            transport.push(a)
+        batches = os.listdir(os.path.join(self.shared, a.replica))
+        self.assertTrue(len(batches) < 30, batches)
+
+        decoded = []
+        decode = pomosync.decode
+        def counting(data):
+            events = decode(data)
+            decoded.extend(events)
+            return events
+        pomosync.decode = counting
+        try:
+            added = transport.pull(b)
+        finally:
+            pomosync.decode = decode
+        self.assertEqual([e[1] for e in added], list(range(191, 201)))
+        self.assertTrue(len(decoded) <= 2*transport.FANOUT**2, len(decoded))
+        self.assertEqual(b.vector()[a.replica], 200)
+
+    def test_large_batches_not_rewritten(self):
+        a = self.state('a')
+        transport = pomosync.DirectoryTransport(self.shared)
+        transport.MAXBATCH = 16
+        for i in range(300):
+            a.addlocal([session(i)])
+            transport.push(a)
+        sizes = []
+        for name in sorted(os.listdir(os.path.join(self.shared, a.replica))):
+            first, last = [int(v) for v in name.split('.')[0].split('-')]
+            sizes.append(last - first + 1)
+        self.assertEqual(sum(sizes), 300)
+        self.assertTrue(max(sizes) < 16*transport.FANOUT, sizes)
+
+
+if __name__ == '__main__':
+    unittest.main()